@@ -0,0 +1,217 @@
+"""
+Amostragem adaptativa
+Acompanha o quanto cada família de métricas mudou desde o último envio e ajusta o
+intervalo de coleta: alonga até um teto enquanto o host está estável (com heartbeats
+para indicar que o agente continua vivo) e cai para um piso assim que há mudança brusca
+"""
+
+import time
+import threading
+from typing import Dict, Any, Optional, Tuple
+
+# Limites padrão por família: mudança brusca, mudança pequena o bastante para contar
+# como estável e, nas famílias de taxa, se a variação é relativa ao último valor enviado
+DEFAULT_FAMILIES = {
+    "cpu": {"series": ["percent"], "sharp": 25, "stable": 5},
+    "memory": {"series": ["percent"], "sharp": 10, "stable": 2},
+    "network": {"series": ["sent_bps", "recv_bps"], "sharp": 2.0, "stable": 0.5, "relative": True, "min_scale": 65536},
+    "disk": {"series": ["read_bps", "write_bps"], "sharp": 2.0, "stable": 0.5, "relative": True, "min_scale": 65536}
+}
+
+
+class FamilyThresholds:
+    """Limites de variação de uma família de métricas"""
+
+    def __init__(self, name: str, series: Tuple[str, ...], sharp: float, stable: float,
+                 relative: bool = False, min_scale: float = 1.0):
+        """
+        Inicializa os limites
+
+        Args:
+            name: Família (seção das métricas)
+            series: Séries acompanhadas dentro da família
+            sharp: Variação que leva o intervalo imediatamente ao piso
+            stable: Variação abaixo da qual a família é considerada estável
+            relative: Mede a variação relativa ao último valor enviado (taxas)
+            min_scale: Menor base da variação relativa, para taxas próximas de zero
+        """
+        self.name = name
+        self.series = series
+        self.sharp = sharp
+        self.stable = min(stable, sharp)
+        self.relative = relative
+        self.min_scale = max(min_scale, 1e-9)
+
+    def deviation(self, value: float, reference: float) -> float:
+        """Variação do valor em relação à referência, na unidade dos limites"""
+        delta = abs(value - reference)
+        if self.relative:
+            return delta / max(abs(reference), self.min_scale)
+        return delta
+
+
+class AdaptiveController:
+    """Decide o intervalo de coleta a partir da variação das métricas entre envios"""
+
+    def __init__(self, base: float, floor: float, ceiling: float, backoff: float,
+                 heartbeat: float, families: Dict[str, FamilyThresholds]):
+        """
+        Inicializa o controlador
+
+        Args:
+            base: Intervalo normal (general.collection_interval)
+            floor: Menor intervalo, usado após mudanças bruscas
+            ceiling: Maior intervalo, alcançado com o host estável
+            backoff: Fator de alongamento do intervalo a cada envio estável
+            heartbeat: Período dos heartbeats quando o intervalo passa dele (0 = sem heartbeats)
+            families: Limites por família
+        """
+        self.base = float(base)
+        self.floor = min(float(floor), self.base)
+        self.ceiling = max(float(ceiling), self.base)
+        self.backoff = max(1.0, float(backoff))
+        self.heartbeat = max(0.0, float(heartbeat))
+        self.families = families
+
+        self.interval = self.base
+        self.reason = "start"
+        self.sharp_changes = 0
+        self.stretches = 0
+        self.heartbeats = 0
+
+        self._reference: Dict[Tuple[str, str], float] = {}
+        self._latest: Dict[Tuple[str, str], float] = {}
+        self._peak: Dict[str, float] = {}
+        self._urgent = False
+        self._last_activity = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], base: float) -> "AdaptiveController":
+        """
+        Cria o controlador a partir da seção adaptive da configuração
+
+        Args:
+            config: Seção adaptive
+            base: Intervalo normal de coleta
+        """
+        families_config = config.get("families", {}) or {}
+        families = {}
+        for name, defaults in DEFAULT_FAMILIES.items():
+            family_config = dict(defaults)
+            family_config.update(families_config.get(name, {}) or {})
+            if not family_config.get("enabled", True):
+                continue
+            families[name] = FamilyThresholds(
+                name,
+                tuple(family_config["series"]),
+                float(family_config["sharp"]),
+                float(family_config["stable"]),
+                bool(family_config.get("relative", False)),
+                float(family_config.get("min_scale", 1.0))
+            )
+
+        return cls(
+            base,
+            float(config.get("floor", max(1.0, base / 5))),
+            float(config.get("ceiling", base * 6)),
+            float(config.get("backoff", 2)),
+            float(config.get("heartbeat", 30)),
+            families
+        )
+
+    def observe(self, values: Dict[str, Any]) -> bool:
+        """
+        Registra uma amostra (amostras da agregação ou métricas do ciclo)
+
+        Args:
+            values: {família: {série: valor}}; famílias e séries ausentes são ignoradas
+
+        Returns:
+            True na primeira mudança brusca desde o último envio, quando o ciclo deve ser antecipado
+        """
+        with self._lock:
+            sharp = None
+            for family in self.families.values():
+                section = values.get(family.name)
+                if not isinstance(section, dict):
+                    continue
+                for series in family.series:
+                    value = section.get(series)
+                    if not isinstance(value, (int, float)) or isinstance(value, bool):
+                        continue
+                    key = (family.name, series)
+                    self._latest[key] = value
+                    reference = self._reference.setdefault(key, value)
+                    deviation = family.deviation(value, reference)
+                    if deviation > self._peak.get(family.name, 0.0):
+                        self._peak[family.name] = deviation
+                    if deviation >= family.sharp and sharp is None:
+                        sharp = family.name
+
+            if sharp is None or self._urgent:
+                return False
+            self._urgent = True
+            self.sharp_changes += 1
+            self.interval = self.floor
+            self.reason = f"change:{sharp}"
+            return True
+
+    def shipped(self, now: Optional[float] = None) -> float:
+        """
+        Fecha o período desde o último envio e escolhe o próximo intervalo
+
+        Args:
+            now: Instante do envio (padrão: agora)
+
+        Returns:
+            Novo intervalo de coleta
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            sharp = [name for name, family in self.families.items() if self._peak.get(name, 0.0) >= family.sharp]
+            active = [name for name, family in self.families.items() if self._peak.get(name, 0.0) >= family.stable]
+
+            if sharp:
+                self.interval = self.floor
+                self.reason = f"change:{sharp[0]}"
+            elif active:
+                # Ainda mudando: volta ao intervalo normal (gradualmente, se vier do piso)
+                self.interval = min(self.base, self.interval * self.backoff) if self.interval < self.base else self.base
+                self.reason = f"active:{active[0]}"
+            else:
+                interval = min(self.ceiling, self.interval * self.backoff)
+                if interval > self.interval:
+                    self.stretches += 1
+                self.interval = interval
+                self.reason = "stable"
+
+            # As próximas variações são medidas em relação ao que acabou de ser enviado
+            self._reference.update(self._latest)
+            self._peak.clear()
+            self._urgent = False
+            self._last_activity = now
+            return self.interval
+
+    def heartbeat_due(self) -> Optional[float]:
+        """Instante do próximo heartbeat, ou None se o intervalo atual dispensa heartbeats"""
+        if not self.heartbeat or self.interval <= self.heartbeat:
+            return None
+        return self._last_activity + self.heartbeat
+
+    def heartbeat_sent(self, now: Optional[float] = None) -> None:
+        """Registra o envio de um heartbeat"""
+        self.heartbeats += 1
+        self._last_activity = time.time() if now is None else now
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado do controlador para as estatísticas do agente"""
+        return {
+            "interval": self.interval,
+            "reason": self.reason,
+            "floor": self.floor,
+            "ceiling": self.ceiling,
+            "sharp_changes": self.sharp_changes,
+            "stretches": self.stretches,
+            "heartbeats": self.heartbeats
+        }
@@ -17,13 +17,34 @@ import psutil
 import pika
 import requests
 import io
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple, Callable
 from PIL import Image, ImageDraw
 import pystray
 import tempfile
 import webbrowser
 from datetime import datetime
 
+from commands import CommandDispatcher
+from burst import BurstSampler, _cpu_busy_percent
+from aggregation import WindowAggregator
+from history import HistoryBuffer
+from proctable import ProcessTable
+from procmatch import ProcessMatcher
+from sketches import DDSketch, summarize
+from alerts import AlertEvaluator, create_alert_publisher
+from adaptive import AdaptiveController
+from backoff import ReconnectPolicy
+from scheduling import TickScheduler, phase_offset
+from flowcontrol import FlowControl
+from asndb import AsnDatabase
+from netcache import NetworkInfoCache
+from services import ServiceProber, find_install_path
+from telemetry import AgentTelemetry
+from exporter import MetricsServer
+from diagnostics import ProfileSession
+from transports import BatchPublisher, build_transport, PUBLISH_SENT, PUBLISH_QUEUED, PUBLISH_FAILED
+from logpipeline import configure_logging, stop_logging, build_formatter, RateLimitFilter, logging_stats
+
 # Configuração de logging básica até carregar a configuração completa
 logging.basicConfig(
     level=logging.INFO,
@@ -37,6 +58,17 @@ logger = logging.getLogger("MonitoringAgent")
 class MonitoringAgent:
     """Agente de monitoramento que coleta dados do sistema e envia para RabbitMQ"""
     
+    # Seções sempre reamostradas em coletas sob demanda; as demais podem vir do cache
+    FAST_SECTIONS = ("cpu", "memory", "network")
+    
+    # Trechos do nome que identificam o processo do NoIP DUC
+    NOIP_PROCESS_NAMES = ("noip", "duc")
+    
+    # Seções sem estado entre ciclos, que podem ser coletadas fora da thread principal. As demais
+    # (processos, cgroups, agregados...) guardam linhas de base que o ciclo normal consome e
+    # só são servidas a partir do cache
+    LIVE_SECTIONS = ("cpu", "memory", "network", "disk", "temperature")
+    
     def __init__(self, config_path: str = "config.yaml"):
         """
         Inicializa o agente de monitoramento
@@ -45,6 +77,7 @@ class MonitoringAgent:
             config_path: Caminho para o arquivo de configuração YAML
         """
         # Carregar configuração
+        self.config_path = config_path
         self.config = self._load_config(config_path)
         
         # Configurar logging
@@ -59,6 +92,20 @@ class MonitoringAgent:
         self.rabbitmq_vhost = self._get_env_or_config("RABBITMQ_VHOST", rabbitmq_config.get("vhost", "/"))
         self.data_queue = self._get_env_or_config("RABBITMQ_QUEUE_DATA", rabbitmq_config.get("data_queue", "agent_data"))
         self.command_queue = self._get_env_or_config("RABBITMQ_QUEUE_COMMANDS", rabbitmq_config.get("command_queue", "agent_commands"))
+        self.command_exchange = self._get_env_or_config("RABBITMQ_EXCHANGE_COMMANDS", rabbitmq_config.get("command_exchange", "agent_commands.direct"))
+        self.diagnostics_queue = self._get_env_or_config("RABBITMQ_QUEUE_DIAGNOSTICS", rabbitmq_config.get("diagnostics_queue", "agent_diagnostics"))
+        self.alert_queue = self._get_env_or_config("RABBITMQ_QUEUE_ALERTS", rabbitmq_config.get("alert_queue", "agent_alerts"))
+        self.command_workers = int(rabbitmq_config.get("command_workers", 4))
+        self.command_prefetch = int(rabbitmq_config.get("command_prefetch", 8))
+        
+        # Políticas de reconexão (mesmo comportamento para publicação e consumo)
+        reconnect_config = rabbitmq_config.get("reconnect", {})
+        self.publisher_reconnect = ReconnectPolicy.from_config("publisher", reconnect_config)
+        self.consumer_reconnect = ReconnectPolicy.from_config("consumer", reconnect_config)
+        self.alert_reconnect = ReconnectPolicy.from_config("alerts", reconnect_config)
+        
+        # Controle de fluxo: buffer local enquanto o broker bloqueia publicações
+        self.flow_control = FlowControl.from_config(rabbitmq_config.get("flow_control", {}))
         
         # Configurações do Dashboard
         dashboard_config = self.config.get("dashboard", {})
@@ -72,11 +119,105 @@ class MonitoringAgent:
         self.hostname_override = general_config.get("hostname_override")
         self.hostname = self.hostname_override if self.hostname_override else socket.gethostname()
         
+        # Agenda os ciclos em uma grade com fase estável por host, espalhando a frota no intervalo
+        if general_config.get("phase_spreading", True):
+            phase = phase_offset(self.hostname, self.collection_interval)
+        else:
+            phase = time.time() % self.collection_interval
+        self.scheduler = TickScheduler(self.collection_interval, phase)
+        
+        # Amostragem adaptativa: intervalo alongado com o host estável e encurtado em mudanças bruscas
+        adaptive_config = self.config.get("adaptive", {})
+        self.adaptive: Optional[AdaptiveController] = None
+        if adaptive_config.get("enabled", False):
+            self.adaptive = AdaptiveController.from_config(adaptive_config, self.collection_interval)
+        self._wakeup = threading.Event()
+        
+        # Métricas baratas amostradas entre os ciclos e enviadas como resumo da janela (min/max/média/p95)
+        aggregation_config = self.config.get("aggregation", {})
+        self.aggregator = None
+        if aggregation_config.get("enabled", False):
+            self.aggregator = WindowAggregator.from_config(aggregation_config, phase, self._on_fast_sample)
+        
+        # Sem a agregação, as taxas de rede e disco da amostragem adaptativa vêm dos contadores a cada ciclo
+        self._tick_counters: Optional[Tuple[float, Any, Any]] = None
+        if self.adaptive and not self.aggregator:
+            logger.warning("Amostragem adaptativa sem agregação em janelas: mudanças bruscas só são "
+                           "percebidas nos ciclos, sem antecipar a coleta")
+        
+        # Histórico recente das amostras em memória, consultado pelo comando dump_history
+        history_config = self.config.get("history", {})
+        self.history: Optional[HistoryBuffer] = None
+        if history_config.get("enabled", True):
+            self.history = HistoryBuffer.from_config(history_config)
+        
+        # Tabela de processos mantida entre ciclos (no Linux, opcionalmente por eventos do proc connector)
+        self.process_table = ProcessTable.from_config(self.config.get("metrics", {}).get("processes", {}))
+        
         # Armazenamento de dados
         self.public_ip = None
         self.private_ip = None
         self.asn_info = None
         self.force_asn_update = False
+        self.asn_db = self._load_asn_database()
+        
+        # Cache persistente de IP público e ASN, evitando consultas externas após reinícios
+        network_info_config = self.config.get("network_info", {})
+        self.state_dir = self._get_env_or_config("AGENT_STATE_DIR", general_config.get("state_dir", "data"))
+        self.network_cache = NetworkInfoCache(
+            os.path.join(self.state_dir, "network_cache.json"),
+            public_ip_ttl=float(network_info_config.get("public_ip_ttl", 300)),
+            asn_ttl=float(network_info_config.get("update_interval", 3600))
+        )
+        
+        # Transporte dos dados coletados (RabbitMQ por padrão), com lotes e reconexão comuns a todos
+        self.publisher = self._create_publisher()
+        
+        # Regras de alerta avaliadas a cada amostra; eventos publicados na hora em fila prioritária
+        alerts_config = self.config.get("alerts", {})
+        self.alert_evaluator: Optional[AlertEvaluator] = None
+        self.alert_publisher = None
+        if alerts_config.get("enabled", True):
+            self.alert_evaluator = AlertEvaluator.from_config(alerts_config, self.hostname)
+            self.alert_publisher = create_alert_publisher(
+                self.publisher.transport.name, alerts_config, self.config.get("transport", {}),
+                self._connection_parameters, self.alert_queue, self.alert_reconnect,
+                os.path.join(self.state_dir, "outbox")
+            )
+        
+        # Última coleta de cada seção de métricas: {seção: (timestamp, dados)}
+        self._section_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        
+        # Latências por coletor/etapa e consumo de recursos do próprio agente
+        self.telemetry = AgentTelemetry()
+        
+        # Endpoint HTTP local com o último snapshot (/metrics) e o estado do agente (/healthz)
+        http_config = self.config.get("http", {})
+        self._last_payload: Optional[Dict[str, Any]] = None
+        self._last_cycle_at: Optional[float] = None
+        self._started_at = time.time()
+        self.metrics_server = None
+        if http_config.get("enabled", False):
+            self.metrics_server = MetricsServer(
+                http_config.get("host", "127.0.0.1"),
+                int(self._get_env_or_config("AGENT_HTTP_PORT", http_config.get("port", 9101))),
+                lambda: self._last_payload,
+                self.get_health,
+                time.time
+            )
+        
+        # Estado de serviços consultado em segundo plano com TTL; caminhos resolvidos na carga da configuração
+        self.service_prober = ServiceProber()
+        self._noip_install_path: Optional[str] = None
+        self._watched_services: List[Dict[str, Any]] = []
+        self._configure_services()
+        
+        # Despacho de comandos
+        self.dispatcher = CommandDispatcher(self.hostname, self.command_workers, self.command_prefetch)
+        self._register_command_handlers()
+        self._burst_lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+        self._profile_session: Optional[ProfileSession] = None
         
         # Controle de execução
         self.running = False
@@ -122,25 +263,24 @@ class MonitoringAgent:
         return os.environ.get(env_var, config_value)
     
     def _setup_logging(self):
-        """Configura o logging com base nas configurações"""
+        """
+        Configura o logging com base nas configurações
+        
+        Console e arquivo são escritos por uma thread dedicada a partir de uma fila,
+        para que rotação e I/O de disco não atrasem os ciclos de coleta.
+        """
         log_config = self.config.get("logging", {})
         log_level_name = self.config.get("general", {}).get("log_level", "INFO")
         log_level = getattr(logging, log_level_name)
-        
-        # Remover handlers existentes
-        for handler in logger.handlers[:]:
-            logger.removeHandler(handler)
-        
-        # Configurar logger
-        logger.setLevel(log_level)
+        handlers: List[logging.Handler] = []
         
         # Adicionar handler de console
-        if log_config.get("console", {}).get("enabled", True):
+        console_config = log_config.get("console", {})
+        if console_config.get("enabled", True):
             console_handler = logging.StreamHandler()
             console_handler.setLevel(log_level)
-            console_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-            console_handler.setFormatter(console_formatter)
-            logger.addHandler(console_handler)
+            console_handler.setFormatter(build_formatter(console_config.get("format", "text")))
+            handlers.append(console_handler)
         
         # Adicionar handler de arquivo
         file_config = log_config.get("file", {})
@@ -158,23 +298,55 @@ class MonitoringAgent:
                     backupCount=file_config.get("backup_count", 5)
                 )
                 file_handler.setLevel(log_level)
-                file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-                file_handler.setFormatter(file_formatter)
-                logger.addHandler(file_handler)
+                file_handler.setFormatter(build_formatter(file_config.get("format", "text")))
+                handlers.append(file_handler)
             except Exception as e:
                 logger.error(f"Erro ao configurar log em arquivo: {e}")
+        
+        # Limite de mensagens repetidas (ex.: falhas de conexão em sequência)
+        rate_config = log_config.get("rate_limit", {})
+        rate_limit = None
+        if rate_config.get("enabled", True):
+            rate_limit = RateLimitFilter(
+                window=float(rate_config.get("window", 60)),
+                burst=int(rate_config.get("burst", 5)),
+                min_level=getattr(logging, rate_config.get("min_level", "WARNING"))
+            )
+        
+        configure_logging(logger, log_level, handlers, int(log_config.get("queue_size", 10000)), rate_limit)
     
-    def get_cpu_usage(self) -> Dict[str, Any]:
-        """Coleta informações de uso de CPU"""
-        cpu_config = self.config.get("metrics", {}).get("cpu", {})
+    def get_cpu_usage(self, interval: float = 1, live: bool = False) -> Dict[str, Any]:
+        """
+        Coleta informações de uso de CPU
         
-        result = {
-            "percent": psutil.cpu_percent(interval=1)
-        }
+        Args:
+            interval: Janela de amostragem em segundos do percentual de CPU
+            live: Coleta fora do ciclo (collect_now): os percentuais vêm de duas leituras de
+                cpu_times, sem tocar nas referências de psutil.cpu_percent usadas pelo ciclo
+        """
+        cpu_config = self.config.get("metrics", {}).get("cpu", {})
+        collect_per_cpu = cpu_config.get("collect_per_cpu", True)
+        
+        if live:
+            before = psutil.cpu_times()
+            cores_before = psutil.cpu_times(percpu=True) if collect_per_cpu else []
+            time.sleep(interval)
+            result = {"percent": round(_cpu_busy_percent(before, psutil.cpu_times()), 1)}
+            cores_after = psutil.cpu_times(percpu=True) if collect_per_cpu else []
+            per_cpu = [round(_cpu_busy_percent(a, b), 1) for a, b in zip(cores_before, cores_after)]
+        else:
+            result = {
+                "percent": psutil.cpu_percent(interval=interval)
+            }
         
-        # Coletar informações por CPU
-        if cpu_config.get("collect_per_cpu", True):
-            result["per_cpu_percent"] = psutil.cpu_percent(interval=0, percpu=True)
+        # Coletar informações por CPU; com muitos núcleos, só o resumo de quantis é enviado
+        if collect_per_cpu:
+            if not live:
+                per_cpu = psutil.cpu_percent(interval=0, percpu=True)
+            if len(per_cpu) <= cpu_config.get("per_cpu_full_max", 64):
+                result["per_cpu_percent"] = per_cpu
+            if cpu_config.get("per_cpu_summary", True):
+                result["per_cpu_summary"] = summarize(per_cpu)
         
         # Coletar tempos de CPU
         if cpu_config.get("collect_cpu_times", True):
@@ -261,7 +433,7 @@ class MonitoringAgent:
                 }
                 result["partitions"].append(partition_info)
             except (PermissionError, FileNotFoundError) as e:
-                logger.debug(f"Erro ao acessar {partition.mountpoint}: {e}")
+                logger.debug("Erro ao acessar %s: %s", partition.mountpoint, e)
         
         # Coletar contadores de I/O
         if disk_config.get("collect_io_counters", True):
@@ -427,109 +599,44 @@ class MonitoringAgent:
             "zombie": 0
         }
         
-        # Coletar processos com maior uso de CPU/memória
-        if proc_config.get("collect_top_processes", 0) > 0:
-            try:
-                processes = []
-                top_count = proc_config.get("collect_top_processes", 10)
-                
-                for proc in psutil.process_iter(['pid', 'name', 'username', 'status', 'cpu_percent', 'memory_percent']):
-                    try:
-                        pinfo = proc.info
-                        
-                        # Contar por status
-                        if pinfo['status'] == psutil.STATUS_RUNNING:
-                            result["running"] += 1
-                        elif pinfo['status'] == psutil.STATUS_SLEEPING:
-                            result["sleeping"] += 1
-                        elif pinfo['status'] == psutil.STATUS_STOPPED:
-                            result["stopped"] += 1
-                        elif pinfo['status'] == psutil.STATUS_ZOMBIE:
-                            result["zombie"] += 1
-                        
-                        # Atualizar contagem total
-                        result["total"] += 1
-                        
-                        # Coletar informações para top processos
-                        proc.cpu_percent()  # Primeira chamada sempre retorna 0
-                        processes.append(pinfo)
-                    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                        pass
-                
-                # Aguardar um pouco para obter uso de CPU
-                time.sleep(0.1)
-                
-                # Atualizar uso de CPU e ordenar
-                for proc in processes:
-                    try:
-                        p = psutil.Process(proc['pid'])
-                        proc['cpu_percent'] = p.cpu_percent()
-                        proc['memory_percent'] = p.memory_percent()
-                    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                        proc['cpu_percent'] = 0
-                        proc['memory_percent'] = 0
-                
-                # Top processos por CPU
-                top_cpu = sorted(processes, key=lambda p: p['cpu_percent'], reverse=True)[:top_count]
-                result["top_cpu"] = [{
-                    "pid": p['pid'],
-                    "name": p['name'],
-                    "username": p['username'],
-                    "cpu_percent": p['cpu_percent'],
-                    "memory_percent": p['memory_percent']
-                } for p in top_cpu]
-                
-                # Top processos por memória
-                top_memory = sorted(processes, key=lambda p: p['memory_percent'], reverse=True)[:top_count]
-                result["top_memory"] = [{
-                    "pid": p['pid'],
-                    "name": p['name'],
-                    "username": p['username'],
-                    "cpu_percent": p['cpu_percent'],
-                    "memory_percent": p['memory_percent']
-                } for p in top_memory]
-            except Exception as e:
-                logger.warning(f"Erro ao coletar top processos: {e}")
+        # Processos vivos da tabela incremental (CPU médio desde o ciclo anterior)
+        try:
+            processes = self.process_table.sample()
+        except Exception as e:
+            logger.warning(f"Erro ao coletar processos: {e}")
+            processes = []
+        
+        for pinfo in processes:
+            # Contar por status
+            if pinfo['status'] == psutil.STATUS_RUNNING:
+                result["running"] += 1
+            elif pinfo['status'] == psutil.STATUS_SLEEPING:
+                result["sleeping"] += 1
+            elif pinfo['status'] == psutil.STATUS_STOPPED:
+                result["stopped"] += 1
+            elif pinfo['status'] == psutil.STATUS_ZOMBIE:
+                result["zombie"] += 1
+        result["total"] = len(processes)
+        
+        # Nascimentos, mortes e processos de vida curta desde o ciclo anterior
+        result["churn"] = self.process_table.churn
         
-        # Verificar processos específicos
-        watch_processes = proc_config.get("watch_processes", [])
-        if watch_processes:
-            result["watched"] = {}
+        # Coletar processos com maior uso de CPU/memória
+        top_count = proc_config.get("collect_top_processes", 0)
+        if top_count > 0:
+            fields = ("pid", "name", "username", "cpu_percent", "memory_percent")
             
-            for watch in watch_processes:
-                process_name = watch.get("name")
-                if not process_name:
-                    continue
-                
-                try:
-                    found = False
-                    for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                        try:
-                            # Verificar se o nome do processo corresponde
-                            if process_name.lower() in proc.info['name'].lower():
-                                found = True
-                                result["watched"][process_name] = {
-                                    "running": True,
-                                    "pid": proc.info['pid']
-                                }
-                                
-                                # Coletar uso de CPU e memória
-                                try:
-                                    result["watched"][process_name]["cpu_percent"] = proc.cpu_percent(interval=0.1)
-                                    result["watched"][process_name]["memory_percent"] = proc.memory_percent()
-                                except (psutil.NoSuchProcess, psutil.AccessDenied):
-                                    pass
-                                
-                                break
-                        except (psutil.NoSuchProcess, psutil.AccessDenied):
-                            pass
-                    
-                    if not found:
-                        result["watched"][process_name] = {
-                            "running": False
-                        }
-                except Exception as e:
-                    logger.warning(f"Erro ao verificar processo {process_name}: {e}")
+            # Top processos por CPU
+            top_cpu = sorted(processes, key=lambda p: p['cpu_percent'] or 0, reverse=True)[:top_count]
+            result["top_cpu"] = [{key: p[key] for key in fields} for p in top_cpu]
+            
+            # Top processos por memória
+            top_memory = sorted(processes, key=lambda p: p['memory_percent'] or 0, reverse=True)[:top_count]
+            result["top_memory"] = [{key: p[key] for key in fields} for p in top_memory]
+        
+        # Processos monitorados: regras casadas uma vez por pid durante a passada da tabela
+        if proc_config.get("watch_processes"):
+            result["watched"] = self.process_table.watched
         
         return result
     
@@ -549,50 +656,79 @@ class MonitoringAgent:
             "last_update": None
         }
         
-        # Verificar se o NoIP DUC está instalado
-        if noip_config.get("check_installed", True):
-            possible_paths = noip_config.get("possible_paths", [])
-            
-            for path in possible_paths:
-                if os.path.exists(path):
-                    result["installed"] = True
-                    result["install_path"] = path
-                    break
+        # Verificar se o NoIP DUC está instalado (caminho resolvido na carga da configuração)
+        if noip_config.get("check_installed", True) and self._noip_install_path:
+            result["installed"] = True
+            result["install_path"] = self._noip_install_path
         
-        # Verificar se o NoIP DUC está em execução
+        # Verificar se o NoIP DUC está em execução (pela tabela de processos, sem nova varredura)
         if noip_config.get("check_running", True):
             try:
-                for proc in psutil.process_iter(['pid', 'name']):
-                    try:
-                        if "noip" in proc.info['name'].lower() or "duc" in proc.info['name'].lower():
-                            result["running"] = True
-                            break
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
+                # Com a seção de processos desligada, a tabela não é atualizada pelo ciclo
+                if not self.config.get("metrics", {}).get("processes", {}).get("enabled", True):
+                    self.process_table.sample()
+                result["running"] = self.process_table.running(self.NOIP_PROCESS_NAMES)
             except Exception as e:
                 logger.warning(f"Erro ao verificar processo NoIP DUC: {e}")
         
-        # Verificar se o serviço do NoIP DUC está ativo
+        # Verificar se o serviço do NoIP DUC está ativo (estado em cache, consultado em segundo plano)
         if noip_config.get("check_service", True):
-            # No Windows
-            if os.name == 'nt':
-                try:
-                    import subprocess
-                    output = subprocess.check_output(["sc", "query", "NoIPDUC"], text=True)
-                    if "RUNNING" in output:
-                        result["service_active"] = True
-                except Exception as e:
-                    logger.debug(f"Erro ao verificar serviço NoIP DUC no Windows: {e}")
-            # No Linux
-            else:
-                try:
-                    import subprocess
-                    output = subprocess.check_output(["systemctl", "is-active", "noip"], text=True)
-                    if "active" in output:
-                        result["service_active"] = True
-                except Exception as e:
-                    logger.debug(f"Erro ao verificar serviço NoIP DUC no Linux: {e}")
+            status = self.service_prober.status("noip_duc")
+            result["service_active"] = bool(status and status["active"])
+        
+        return result
+    
+    def _configure_services(self) -> None:
+        """
+        Resolve caminhos de instalação e registra os serviços verificados
         
+        Executado na inicialização e a cada recarga da configuração, para que os
+        ciclos de coleta não verifiquem o sistema de arquivos nem disparem processos.
+        """
+        services_config = self.config.get("services", {})
+        self.service_prober.ttl = float(services_config.get("ttl", 60))
+        self.service_prober.timeout = float(services_config.get("timeout", 5))
+        
+        probes: Dict[str, str] = {}
+        
+        # NoIP DUC
+        noip_config = self.config.get("noip_duc", {})
+        self._noip_install_path = None
+        if noip_config.get("enabled", True):
+            if noip_config.get("check_installed", True):
+                self._noip_install_path = find_install_path(noip_config.get("possible_paths", []))
+            if noip_config.get("check_service", True):
+                probes["noip_duc"] = noip_config.get("windows_service", "NoIPDUC") if os.name == 'nt' else noip_config.get("systemd_unit", "noip")
+        
+        # Serviços adicionais
+        self._watched_services = []
+        for service in services_config.get("watch", []) or []:
+            name = service.get("name")
+            if not name:
+                continue
+            system_name = service.get("windows_service" if os.name == 'nt' else "systemd_unit", name)
+            probes[f"service:{name}"] = system_name
+            self._watched_services.append({
+                "name": name,
+                "service": system_name,
+                "install_path": find_install_path(service.get("paths", []))
+            })
+        
+        self.service_prober.set_services(probes)
+    
+    def get_services_status(self) -> Dict[str, Any]:
+        """Retorna o estado dos serviços configurados em services.watch"""
+        result = {}
+        for service in self._watched_services:
+            status = self.service_prober.status(f"service:{service['name']}") or {}
+            result[service["name"]] = {
+                "service": service["service"],
+                "active": status.get("active", False),
+                "state": status.get("state", "unknown"),
+                "installed": service["install_path"] is not None,
+                "install_path": service["install_path"],
+                "checked_at": status.get("checked_at")
+            }
         return result
     
     def check_ports(self) -> Dict[str, Any]:
@@ -603,6 +739,8 @@ class MonitoringAgent:
             return {}
         
         result = {"targets": []}
+        timeout = port_config.get("timeout", 5)
+        probes = max(1, int(port_config.get("probes", 1)))
         
         for target in port_config.get("targets", []):
             host = target.get("host")
@@ -623,35 +761,23 @@ class MonitoringAgent:
             }
             
             try:
-                start_time = time.time()
+                status, elapsed = self._probe_port(host, port, protocol, timeout)
+                target_result["status"] = status
+                target_result["response_time"] = round(elapsed, 2)  # em ms
                 
-                if protocol == "tcp":
-                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    s.settimeout(port_config.get("timeout", 5))
-                    result_code = s.connect_ex((host, port))
-                    s.close()
-                    
-                    if result_code == 0:
-                        target_result["status"] = "open"
-                    else:
-                        target_result["status"] = "closed"
-                
-                elif protocol == "udp":
-                    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                    s.settimeout(port_config.get("timeout", 5))
-                    s.sendto(b"", (host, port))
-                    
-                    try:
-                        s.recvfrom(1024)
-                        target_result["status"] = "open"
-                    except socket.timeout:
-                        # Para UDP, não podemos ter certeza se a porta está fechada ou se o servidor não respondeu
-                        target_result["status"] = "no_response"
-                    
-                    s.close()
-                
-                end_time = time.time()
-                target_result["response_time"] = round((end_time - start_time) * 1000, 2)  # em ms
+                # Sondagens extras só em portas que responderam, para medir a variação da latência
+                if probes > 1 and status == "open":
+                    latencies = DDSketch()
+                    latencies.add(elapsed)
+                    for _ in range(probes - 1):
+                        try:
+                            extra_status, extra_elapsed = self._probe_port(host, port, protocol, timeout)
+                        except OSError:
+                            break
+                        if extra_status != "open":
+                            break
+                        latencies.add(extra_elapsed)
+                    target_result["latency"] = latencies.summary()
             
             except socket.gaierror:
                 target_result["status"] = "dns_error"
@@ -663,6 +789,45 @@ class MonitoringAgent:
         
         return result
     
+    def _probe_port(self, host: str, port: int, protocol: str, timeout: float) -> Tuple[str, float]:
+        """
+        Faz uma sondagem de porta TCP (connect) ou UDP (datagrama vazio)
+        
+        Args:
+            host: Endereço de destino
+            port: Porta de destino
+            protocol: tcp ou udp
+            timeout: Timeout da sondagem em segundos
+            
+        Returns:
+            Tupla (status, tempo de resposta em ms)
+        """
+        start_time = time.perf_counter()
+        status = "unknown"
+        
+        if protocol == "tcp":
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.settimeout(timeout)
+            result_code = s.connect_ex((host, port))
+            s.close()
+            status = "open" if result_code == 0 else "closed"
+        
+        elif protocol == "udp":
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.settimeout(timeout)
+            s.sendto(b"", (host, port))
+            
+            try:
+                s.recvfrom(1024)
+                status = "open"
+            except socket.timeout:
+                # Para UDP, não podemos ter certeza se a porta está fechada ou se o servidor não respondeu
+                status = "no_response"
+            finally:
+                s.close()
+        
+        return status, (time.perf_counter() - start_time) * 1000
+    
     def get_private_ip(self) -> str:
         """Obtém o IP privado da máquina"""
         try:
@@ -694,6 +859,30 @@ class MonitoringAgent:
             logger.error(f"Erro ao obter IP público: {e}")
             return None
     
+    def _load_asn_database(self) -> Optional[AsnDatabase]:
+        """
+        Carrega a base local de prefixos para consulta de ASN sem acesso à rede
+        
+        Returns:
+            Base carregada ou None se desabilitada ou indisponível
+        """
+        asn_db_config = self.config.get("network_info", {}).get("asn_database", {})
+        if not asn_db_config.get("enabled", False):
+            return None
+        
+        path = asn_db_config.get("path")
+        if not path:
+            logger.warning("Base local de ASN habilitada sem caminho configurado")
+            return None
+        
+        try:
+            asn_db = AsnDatabase.open(path, asn_db_config.get("index_path"), asn_db_config.get("format", "auto"))
+            logger.info(f"Base local de ASN carregada: {asn_db.size_v4} intervalos IPv4, {asn_db.size_v6} IPv6")
+            return asn_db
+        except Exception as e:
+            logger.warning(f"Erro ao carregar base local de ASN, usando serviço HTTP: {e}")
+            return None
+    
     def get_asn_info(self, ip: str) -> Optional[Dict[str, str]]:
         """
         Obtém informações de ASN/ORG baseado no IP público
@@ -705,6 +894,16 @@ class MonitoringAgent:
             Dicionário com informações de ASN e organização
         """
         network_info_config = self.config.get("network_info", {})
+        
+        # Consulta local primeiro; o serviço HTTP fica como fallback
+        if self.asn_db:
+            asn_info = self.asn_db.lookup(ip)
+            if asn_info:
+                return asn_info
+            if not network_info_config.get("asn_database", {}).get("http_fallback", True):
+                logger.warning(f"IP {ip} não encontrado na base local de ASN")
+                return None
+        
         service_url_template = network_info_config.get("asn_info_service", "https://ipinfo.io/{ip}/json")
         service_url = service_url_template.replace("{ip}", ip)
         
@@ -742,190 +941,812 @@ class MonitoringAgent:
                 logger.info(f"IP privado atualizado: {current_private_ip}")
                 self.private_ip = current_private_ip
         
-        # Atualizar IP público
+        # Atualizar IP público (reaproveita o cache enquanto o IP privado não muda)
         if network_info_config.get("collect_public_ip", True):
-            current_public_ip = self.get_public_ip()
+            forced = force or self.force_asn_update
+            # Em pods o IP privado muda a cada reinício; nesse caso o cache não é vinculado a ele
+            network_key = self.private_ip if network_info_config.get("public_ip_per_private_ip", True) else None
+            current_public_ip = None if forced else self.network_cache.get_public_ip(network_key)
             if current_public_ip is None:
-                logger.warning("Não foi possível obter o IP público")
-                return
+                current_public_ip = self.get_public_ip()
+                if current_public_ip is None:
+                    logger.warning("Não foi possível obter o IP público")
+                    return
+                self.network_cache.set_public_ip(network_key, current_public_ip)
             
             ip_changed = current_public_ip != self.public_ip
             if ip_changed:
                 logger.info(f"IP público atualizado: {current_public_ip}")
                 self.public_ip = current_public_ip
             
-            # Atualizar ASN apenas se o IP mudou ou se foi forçado
-            if network_info_config.get("collect_asn_info", True):
-                if (ip_changed or force or self.force_asn_update) and self.public_ip:
+            # Atualizar ASN se o IP mudou, se foi forçado ou se o cache expirou (update_interval)
+            if network_info_config.get("collect_asn_info", True) and self.public_ip:
+                cached_asn = None if forced else self.network_cache.get_asn(self.public_ip)
+                if cached_asn:
+                    if ip_changed or cached_asn != self.asn_info:
+                        logger.info(f"ASN obtido do cache: {cached_asn['asn']} - {cached_asn['organization']}")
+                    self.asn_info = cached_asn
+                elif ip_changed or forced or self.asn_info:
                     logger.info("Atualizando informações de ASN...")
-                    self.asn_info = self.get_asn_info(self.public_ip)
+                    asn_info = self.get_asn_info(self.public_ip)
+                    if asn_info:
+                        self.asn_info = asn_info
+                        logger.info(f"ASN atualizado: {asn_info['asn']} - {asn_info['organization']}")
+                    elif ip_changed:
+                        self.asn_info = None
+                    # Em caso de falha, mantém a informação anterior por mais um período
                     if self.asn_info:
-                        logger.info(f"ASN atualizado: {self.asn_info['asn']} - {self.asn_info['organization']}")
-                    self.force_asn_update = False
+                        self.network_cache.set_asn(self.public_ip, self.asn_info)
+            self.force_asn_update = False
     
-    def connect_rabbitmq(self) -> Optional[pika.BlockingConnection]:
-        """Estabelece conexão com o RabbitMQ"""
+    def _connection_parameters(self) -> pika.ConnectionParameters:
+        """Monta os parâmetros de conexão com o RabbitMQ"""
+        rabbitmq_config = self.config.get("rabbitmq", {})
+        return pika.ConnectionParameters(
+            host=self.rabbitmq_host,
+            port=self.rabbitmq_port,
+            virtual_host=self.rabbitmq_vhost,
+            credentials=pika.PlainCredentials(self.rabbitmq_user, self.rabbitmq_password),
+            heartbeat=rabbitmq_config.get("heartbeat", 600),
+            blocked_connection_timeout=rabbitmq_config.get("connection_timeout", 300)
+        )
+    
+    def connect_rabbitmq(self, policy: Optional[ReconnectPolicy] = None) -> Optional[pika.BlockingConnection]:
+        """
+        Estabelece conexão com o RabbitMQ
+        
+        Args:
+            policy: Política de reconexão que registra o resultado da tentativa
+        """
         try:
             self.update_connection_status("connecting")
-            
-            credentials = pika.PlainCredentials(self.rabbitmq_user, self.rabbitmq_password)
-            parameters = pika.ConnectionParameters(
-                host=self.rabbitmq_host,
-                port=self.rabbitmq_port,
-                virtual_host=self.rabbitmq_vhost,
-                credentials=credentials,
-                heartbeat=self.config.get("rabbitmq", {}).get("heartbeat", 600),
-                blocked_connection_timeout=self.config.get("rabbitmq", {}).get("connection_timeout", 300)
-            )
-            connection = pika.BlockingConnection(parameters)
+            connection = pika.BlockingConnection(self._connection_parameters())
             
             self.update_connection_status("connected")
+            if policy:
+                policy.record_success()
             return connection
         except Exception as e:
-            logger.error(f"Erro ao conectar ao RabbitMQ: {e}")
+            if policy:
+                delay = policy.record_failure(e)
+                logger.error(f"Erro ao conectar ao RabbitMQ ({policy.name}): {e}. Nova tentativa em {delay:.1f}s")
+            else:
+                logger.error(f"Erro ao conectar ao RabbitMQ: {e}")
             self.update_connection_status("error", str(e))
             return None
     
-    def send_data_to_rabbitmq(self, data: Dict[str, Any]) -> bool:
+    def _create_publisher(self) -> BatchPublisher:
+        """Cria o transporte de dados configurado e a camada de lotes e reconexão acima dele"""
+        transport_config = self.config.get("transport", {})
+        kind = self._get_env_or_config("AGENT_TRANSPORT", transport_config.get("type", "amqp"))
+        default_directory = os.path.join(self.state_dir, "outbox")
+        try:
+            transport = build_transport(kind, transport_config, self._connection_parameters, self.data_queue,
+                                        self._on_connection_blocked, self._on_connection_unblocked, default_directory)
+        except ValueError as e:
+            logger.error(f"{e}; usando amqp")
+            transport = build_transport("amqp", transport_config, self._connection_parameters, self.data_queue,
+                                        self._on_connection_blocked, self._on_connection_unblocked, default_directory)
+        if transport.name != "amqp":
+            logger.info(f"Dados coletados publicados pelo transporte {transport.name}")
+        
+        return BatchPublisher(
+            transport,
+            self.publisher_reconnect,
+            batch_size=int(transport_config.get("batch_size", 1)),
+            batch_max_delay=float(transport_config.get("batch_max_delay", 0)),
+            retry_on_disconnect=bool(transport_config.get("retry_on_disconnect", True)),
+            on_state=self._on_publisher_state
+        )
+    
+    def _on_publisher_state(self, state: str, error: Optional[str] = None) -> None:
+        """
+        Acompanha o estado do transporte de dados
+        
+        Args:
+            state: connecting, connected, error ou closed
+            error: Mensagem da falha, se houver
+        """
+        if state not in ("connecting", "connected"):
+            # Uma nova conexão começa desbloqueada; o broker avisa novamente se o alarme persistir
+            self.flow_control.set_blocked(False)
+        if state == "closed":
+            state = "disconnected"
+        self.update_connection_status(state, error)
+    
+    def _evaluate_alerts(self, metrics: Dict[str, Any], now: Optional[float] = None) -> None:
+        """
+        Aplica as regras de alerta a uma amostra e publica as mudanças de estado
+        
+        Args:
+            metrics: Métricas no formato do payload (ciclo completo ou amostra da agregação)
+            now: Instante da amostra (padrão: agora)
+        """
+        if not self.alert_evaluator:
+            return
+        for event in self.alert_evaluator.evaluate(metrics, now):
+            self.alert_publisher.submit(event)
+    
+    def _on_fast_sample(self, values: Dict[str, Any], now: float) -> None:
+        """
+        Amostra interna da agregação: avalia os alertas e antecipa o ciclo em mudanças bruscas
+        
+        Args:
+            values: {família: {série: valor}}
+            now: Instante da amostra
+        """
+        self._evaluate_alerts(values, now)
+        if self.adaptive and self.adaptive.observe(values):
+            logger.info(f"Mudança brusca ({self.adaptive.reason}): antecipando a coleta")
+            self._wakeup.set()
+    
+    def _observe_tick(self, metrics: Dict[str, Any]) -> None:
+        """
+        Registra as métricas do ciclo na amostragem adaptativa
+        
+        As séries de taxa (sent_bps, recv_bps, read_bps, write_bps) só existem nas amostras
+        da agregação; sem ela, são calculadas aqui pela diferença dos contadores entre ciclos.
+        
+        Args:
+            metrics: Métricas do ciclo
+        """
+        values = metrics
+        if not self.aggregator:
+            values = dict(metrics)
+            values.update(self._tick_rates(time.time()))
+        if self.adaptive.observe(values):
+            logger.info(f"Mudança brusca ({self.adaptive.reason}) no ciclo: próximo intervalo no piso")
+    
+    def _tick_rates(self, now: float) -> Dict[str, Any]:
+        """Taxas de rede e disco (bytes/s) desde o ciclo anterior, pelos contadores totais do psutil"""
+        try:
+            net = psutil.net_io_counters()
+            disk = psutil.disk_io_counters()
+        except Exception as e:
+            logger.debug(f"Erro ao ler contadores para a amostragem adaptativa: {e}")
+            return {}
+        previous, self._tick_counters = self._tick_counters, (now, net, disk)
+        if previous is None or now <= previous[0]:
+            return {}
+        
+        elapsed = now - previous[0]
+        rates = {}
+        # Contadores reiniciados (interface recriada) viram taxa zero em vez de negativa
+        if net is not None and previous[1] is not None:
+            rates["network"] = {
+                "sent_bps": max(0, net.bytes_sent - previous[1].bytes_sent) / elapsed,
+                "recv_bps": max(0, net.bytes_recv - previous[1].bytes_recv) / elapsed
+            }
+        if disk is not None and previous[2] is not None:
+            rates["disk"] = {
+                "read_bps": max(0, disk.read_bytes - previous[2].read_bytes) / elapsed,
+                "write_bps": max(0, disk.write_bytes - previous[2].write_bytes) / elapsed
+            }
+        return rates
+    
+    def _on_connection_blocked(self, connection, method_frame) -> None:
+        """Callback do pika para connection.blocked: pausa as publicações"""
+        reason = getattr(method_frame.method, "reason", None)
+        logger.warning(f"Broker bloqueou publicações ({reason}); guardando amostras localmente")
+        self.flow_control.set_blocked(True, reason)
+    
+    def _on_connection_unblocked(self, connection, method_frame) -> None:
+        """Callback do pika para connection.unblocked: retoma as publicações"""
+        logger.info(f"Broker liberou publicações; {self.flow_control.pending()} amostras aguardando reenvio")
+        self.flow_control.set_blocked(False)
+    
+    def _wait_until(self, deadline: float) -> None:
+        """
+        Aguarda até o deadline, reenviando em ritmo controlado as amostras guardadas durante bloqueios
+        
+        Com a amostragem adaptativa, envia heartbeats enquanto o intervalo está alongado
+        e retorna antes do deadline quando uma mudança brusca antecipa o ciclo.
+        
+        Args:
+            deadline: Instante (time.time) em que o próximo ciclo deve começar
+        """
+        while self.running:
+            now = time.time()
+            if now >= deadline or self._wakeup.is_set():
+                return
+            
+            self.publisher.poll()
+            wake_at = deadline
+            heartbeat_at = self.adaptive.heartbeat_due() if self.adaptive else None
+            if heartbeat_at is not None:
+                if now >= heartbeat_at:
+                    self._send_heartbeat(deadline)
+                    continue
+                wake_at = min(deadline, heartbeat_at)
+            
+            wait = self.flow_control.seconds_until_drain(now)
+            if wait is None:
+                self._wakeup.wait(wake_at - now)
+                continue
+            if wait > 0:
+                self._wakeup.wait(min(wait, wake_at - now))
+                continue
+            
+            data = self.flow_control.next_to_drain(now)
+            if data is None:
+                continue
+            
+            if self.send_data_to_rabbitmq(data) != PUBLISH_FAILED:
+                self.flow_control.mark_drained()
+            else:
+                # Publicação indisponível: tenta de novo apenas no próximo intervalo
+                self.flow_control.requeue(data)
+                self._wakeup.wait(max(0.0, deadline - time.time()))
+                return
+    
+    def _send_heartbeat(self, next_deadline: float) -> None:
+        """
+        Envia um heartbeat mínimo enquanto o intervalo adaptativo está alongado
+        
+        Args:
+            next_deadline: Instante previsto da próxima amostra completa
+        """
+        self.adaptive.heartbeat_sent()
+        if self.flow_control.blocked:
+            return
+        self.send_data_to_rabbitmq({
+            "type": "heartbeat",
+            "timestamp": time.time(),
+            "hostname": self.hostname,
+            "metrics": {},
+            "interval": self.scheduler.interval,
+            "next_sample_at": round(next_deadline, 3)
+        })
+    
+    def _next_deadline(self, deadline: float) -> float:
+        """
+        Calcula o deadline do próximo ciclo
+        
+        Com a amostragem adaptativa, aplica o intervalo escolhido ao fim do ciclo; um
+        ciclo antecipado ou uma troca de intervalo realinha a agenda à nova grade.
+        
+        Args:
+            deadline: Deadline do ciclo que acabou de rodar
+        """
+        if self.adaptive:
+            self._wakeup.clear()
+            interval = self.adaptive.shipped()
+            if interval != self.scheduler.interval or time.time() < deadline:
+                if interval != self.scheduler.interval:
+                    logger.info(f"Intervalo de coleta: {self.scheduler.interval:g}s -> {interval:g}s ({self.adaptive.reason})")
+                self.scheduler.retune(interval)
+                return self.scheduler.next_deadline()
+        return self.scheduler.advance(deadline)
+    
+    def send_data_to_rabbitmq(self, data: Dict[str, Any]) -> str:
         """
-        Envia dados para o RabbitMQ
+        Envia dados pelo transporte configurado (RabbitMQ por padrão)
         
         Args:
             data: Dicionário com os dados a serem enviados
             
         Returns:
-            True se o envio foi bem-sucedido, False caso contrário
+            PUBLISH_SENT (enviado), PUBLISH_QUEUED (aguardando o lote) ou PUBLISH_FAILED
         """
+        with self.telemetry.timed("publish"):
+            return self._publish_data(data)
+    
+    def _publish_data(self, data: Dict[str, Any]) -> str:
+        """Serializa o payload e o entrega ao transporte, contabilizando tamanho e falhas"""
         try:
-            connection = self.connect_rabbitmq()
-            if not connection:
-                return False
+            message = self.publisher.encode(data)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Erro ao serializar dados: {e}")
+            self.telemetry.record_publish(None, False)
+            return PUBLISH_FAILED
+        
+        status = self.publisher.publish(message)
+        if status == PUBLISH_SENT:
+            self.last_data_sent = datetime.now()
+        # O transporte em memória pode entregar o próprio dicionário, sem tamanho serializado
+        self.telemetry.record_publish(len(message) if isinstance(message, (str, bytes)) else None,
+                                      status != PUBLISH_FAILED)
+        return status
+    
+    def _register_command_handlers(self) -> None:
+        """Registra os handlers de comandos suportados pelo agente"""
+        self.dispatcher.register("update_asn", self._handle_update_asn)
+        self.dispatcher.register("collect_now", self._handle_collect_now)
+        self.dispatcher.register("burst", self._handle_burst)
+        self.dispatcher.register("reload", self._handle_reload)
+        self.dispatcher.register("profile", self._handle_profile)
+        self.dispatcher.register("dump_history", self._handle_dump_history)
+    
+    def _handle_update_asn(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Agenda a atualização de ASN para o próximo ciclo de coleta
+        
+        Args:
+            params: Parâmetros do comando
             
-            channel = connection.channel()
-            channel.queue_declare(queue=self.data_queue, durable=True)
+        Returns:
+            Dicionário com o resultado do comando
+        """
+        logger.info("Comando para atualizar ASN recebido")
+        self.force_asn_update = True
+        return {"scheduled": True}
+    
+    def _handle_collect_now(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Coleta um snapshot imediato e o devolve como resultado do comando
+        
+        O snapshot é respondido apenas na fila de reply_to e não passa pela fila de dados.
+        
+        Args:
+            params: Parâmetros do comando ('sections' e 'max_age' opcionais)
             
-            message = json.dumps(data)
-            channel.basic_publish(
-                exchange='',
-                routing_key=self.data_queue,
-                body=message,
-                properties=pika.BasicProperties(
-                    delivery_mode=2,  # Mensagem persistente
-                    content_type='application/json'
-                )
-            )
+        Returns:
+            Payload do snapshot
+        """
+        return self.collect_snapshot(params.get("sections"), params.get("max_age"))
+    
+    def _handle_burst(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Executa uma janela de amostragem em alta frequência
+        
+        O ciclo normal de coleta continua durante o burst; ao final, o lote
+        comprimido é devolvido como resultado do comando.
+        
+        Args:
+            params: Parâmetros do comando ('collectors', 'interval_ms' e 'duration' opcionais)
             
-            connection.close()
-            self.last_data_sent = datetime.now()
-            return True
+        Returns:
+            Lote colunar comprimido com as amostras
+        """
+        burst_config = self.config.get("burst", {})
+        collectors = params.get("collectors") or burst_config.get("collectors", ["cpu", "memory"])
+        interval_ms = max(
+            float(params.get("interval_ms", burst_config.get("interval_ms", 100))),
+            float(burst_config.get("min_interval_ms", 50))
+        )
+        duration = min(
+            float(params.get("duration", burst_config.get("duration", 60))),
+            float(burst_config.get("max_duration", 300))
+        )
+        
+        if not self._burst_lock.acquire(blocking=False):
+            raise RuntimeError("Já existe um burst em andamento")
+        
+        try:
+            sampler = BurstSampler(collectors, interval_ms / 1000, duration)
+            logger.info(f"Burst iniciado: {', '.join(sampler.collectors)} a cada {interval_ms}ms por {duration}s")
+            batch = sampler.run(lambda: self.running)
+            logger.info(f"Burst concluído: {batch['count']} amostras")
+            return batch
+        finally:
+            self._burst_lock.release()
+    
+    def _handle_reload(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Recarrega o arquivo de configuração e refaz a verificação de serviços e caminhos de instalação
+        
+        As seções lidas a cada ciclo (métricas, serviços, portas) passam a valer no
+        próximo ciclo e as regras de alerta são trocadas na hora; conexão, intervalo
+        e identificação exigem reinício do agente.
+        
+        Args:
+            params: Parâmetros do comando (não utilizados)
+            
+        Returns:
+            Dicionário com os serviços verificados após a recarga
+        """
+        try:
+            with open(self.config_path, 'r') as file:
+                config = yaml.safe_load(file)
         except Exception as e:
-            logger.error(f"Erro ao enviar dados para o RabbitMQ: {e}")
-            self.update_connection_status("error", str(e))
-            return False
+            raise RuntimeError(f"Erro ao recarregar configuração: {e}")
+        if not isinstance(config, dict):
+            raise RuntimeError(f"Configuração inválida em {self.config_path}")
+        
+        self.config = config
+        self._configure_services()
+        self.process_table.set_matcher(ProcessMatcher.from_config(
+            config.get("metrics", {}).get("processes", {}).get("watch_processes", [])))
+        if self.alert_evaluator:
+            self.alert_evaluator.load_rules(AlertEvaluator.parse_rules(config.get("alerts", {}).get("rules", [])))
+        logger.info(f"Configuração recarregada de {self.config_path}")
+        return {
+            "reloaded": True,
+            "noip_install_path": self._noip_install_path,
+            "services": [service["name"] for service in self._watched_services]
+        }
     
-    def process_command(self, ch, method, properties, body) -> None:
+    def _handle_profile(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Processa comandos recebidos do RabbitMQ
+        Captura um perfil de CPU (cProfile nos ciclos de coleta) e/ou de memória (tracemalloc)
+        
+        O relatório completo é publicado na fila de diagnóstico; a resposta do comando
+        traz apenas um resumo, ou o relatório inteiro se a publicação falhar.
         
         Args:
-            ch: Canal RabbitMQ
-            method: Método de entrega
-            properties: Propriedades da mensagem
-            body: Corpo da mensagem
+            params: Parâmetros do comando ('modes', 'duration' e 'top' opcionais)
+            
+        Returns:
+            Resumo do relatório e destino da publicação
         """
+        profiling_config = self.config.get("profiling", {})
+        modes = params.get("modes") or profiling_config.get("modes", ["cpu"])
+        duration = min(
+            float(params.get("duration", profiling_config.get("duration", 30))),
+            float(profiling_config.get("max_duration", 300))
+        )
+        top = int(params.get("top", profiling_config.get("top", 25)))
+        
+        if not self._profile_lock.acquire(blocking=False):
+            raise RuntimeError("Já existe uma sessão de diagnóstico em andamento")
+        
         try:
-            command = json.loads(body)
-            logger.info(f"Comando recebido: {command}")
+            session = ProfileSession(modes, duration, top, int(profiling_config.get("tracemalloc_frames", 1)))
+            session.start()
+            self._profile_session = session
+            logger.info(f"Diagnóstico iniciado: {', '.join(session.modes)} por {duration}s")
+            try:
+                deadline = time.time() + duration
+                while self.running and time.time() < deadline:
+                    time.sleep(max(0.0, min(1.0, deadline - time.time())))
+            finally:
+                self._profile_session = None
+                report = session.stop()
+        finally:
+            self._profile_lock.release()
+        
+        report["hostname"] = self.hostname
+        report["process"] = self.telemetry.process_usage(advance=False)
+        published = self._publish_diagnostics(report)
+        logger.info(f"Diagnóstico concluído ({'publicado em ' + self.diagnostics_queue if published else 'não publicado'})")
+        
+        if not published:
+            return {"published": False, "report": report}
+        
+        summary: Dict[str, Any] = {"published": True, "queue": self.diagnostics_queue, "duration": report["duration"]}
+        if "cpu" in report:
+            summary["cpu_cycles"] = report["cpu"]["cycles"]
+            summary["cpu_top"] = report["cpu"]["by_cumtime"][:5]
+        if "memory" in report:
+            summary["memory_traced_kb"] = report["memory"]["traced_kb"]
+            summary["memory_top_growth"] = report["memory"]["top_growth"][:5]
+        return summary
+    
+    def _handle_dump_history(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Devolve as amostras do histórico em memória para um intervalo de tempo
+        
+        Args:
+            params: Parâmetros do comando ('start' e 'end' em epoch, ou 'last' em segundos,
+                    e 'series' com prefixos das séries; todos opcionais)
             
-            if command.get('action') == 'update_asn':
-                logger.info("Comando para atualizar ASN recebido")
-                self.force_asn_update = True
+        Returns:
+            Bloco colunar comprimido com as amostras do intervalo
+        """
+        if not self.history:
+            raise RuntimeError("Histórico desabilitado na configuração")
+        
+        start = params.get("start")
+        end = params.get("end")
+        if params.get("last") is not None:
+            start = time.time() - float(params["last"])
+        series = params.get("series")
+        if isinstance(series, str):
+            series = [series]
+        
+        block = self.history.dump(
+            float(start) if start is not None else None,
+            float(end) if end is not None else None,
+            series
+        )
+        block["hostname"] = self.hostname
+        logger.info(f"Histórico exportado: {block['count']} amostras, {len(block['columns']) - 1} séries")
+        return block
+    
+    def _publish_diagnostics(self, report: Dict[str, Any]) -> bool:
+        """
+        Publica um relatório de diagnóstico em conexão própria
+        
+        Usa uma conexão curta em vez do canal de dados, que pertence à thread de coleta.
+        
+        Args:
+            report: Relatório a publicar
             
-            # Confirma o recebimento da mensagem
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+        Returns:
+            True se a publicação foi bem-sucedida
+        """
+        connection = self.connect_rabbitmq()
+        if connection is None:
+            return False
+        
+        try:
+            channel = connection.channel()
+            channel.queue_declare(queue=self.diagnostics_queue, durable=True)
+            channel.basic_publish(
+                exchange='',
+                routing_key=self.diagnostics_queue,
+                body=json.dumps(report),
+                properties=pika.BasicProperties(
+                    delivery_mode=2,  # Mensagem persistente
+                    content_type='application/json'
+                )
+            )
+            return True
         except Exception as e:
-            logger.error(f"Erro ao processar comando: {e}")
-            # Rejeita a mensagem em caso de erro
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            logger.error(f"Erro ao publicar diagnóstico: {e}")
+            return False
+        finally:
+            try:
+                connection.close()
+            except Exception:
+                pass
     
     def listen_for_commands(self) -> None:
         """Escuta por comandos na fila do RabbitMQ"""
         while self.running:
+            # Aguarda a janela definida pela política de reconexão, verificando a parada a cada segundo
+            delay = self.consumer_reconnect.wait_time()
+            if delay > 0:
+                time.sleep(min(delay, 1.0))
+                continue
+            
+            if not self.consumer_reconnect.allow():
+                continue
+            
+            connection = self.connect_rabbitmq(self.consumer_reconnect)
+            if not connection:
+                logger.warning("Não foi possível conectar ao RabbitMQ para escutar comandos")
+                continue
+            
             try:
-                connection = self.connect_rabbitmq()
-                if not connection:
-                    logger.warning("Não foi possível conectar ao RabbitMQ para escutar comandos. Tentando novamente em 30 segundos.")
-                    time.sleep(30)
-                    continue
-                
+                # Fila própria ligada ao exchange de comandos pelo hostname: só chegam comandos para este agente
+                queue = f"{self.command_queue}.{self.hostname}"
                 channel = connection.channel()
-                channel.queue_declare(queue=self.command_queue, durable=True)
-                channel.basic_qos(prefetch_count=1)
-                channel.basic_consume(queue=self.command_queue, on_message_callback=self.process_command)
+                channel.exchange_declare(exchange=self.command_exchange, exchange_type='direct', durable=True)
+                channel.queue_declare(queue=queue, durable=True)
+                channel.queue_bind(queue=queue, exchange=self.command_exchange, routing_key=self.hostname)
+                self.dispatcher.setup_channel(channel, queue)
                 
-                logger.info(f"Escutando comandos na fila {self.command_queue}")
+                logger.info(f"Escutando comandos na fila {queue}")
                 channel.start_consuming()
             except Exception as e:
-                logger.error(f"Erro na thread de comandos: {e}")
+                delay = self.consumer_reconnect.record_failure(e)
+                logger.error(f"Erro na thread de comandos: {e}. Nova tentativa em {delay:.1f}s")
                 self.update_connection_status("error", str(e))
-                time.sleep(10)  # Espera antes de tentar novamente
     
-    def collect_and_send_data(self) -> None:
-        """Coleta e envia dados do sistema para o RabbitMQ"""
-        # Atualiza informações de rede
-        self.update_network_info()
-        
-        # Coleta dados do sistema
-        metrics = {}
+    def _enabled_collectors(self) -> List[Tuple[str, Callable[[], Dict[str, Any]]]]:
+        """Retorna, em ordem, as seções de métricas habilitadas e suas funções de coleta"""
+        metrics_config = self.config.get("metrics", {})
+        collectors = []
         
         # CPU
-        if self.config.get("metrics", {}).get("cpu", {}).get("enabled", True):
-            metrics["cpu"] = self.get_cpu_usage()
+        if metrics_config.get("cpu", {}).get("enabled", True):
+            collectors.append(("cpu", self.get_cpu_usage))
         
         # Memória
-        if self.config.get("metrics", {}).get("memory", {}).get("enabled", True):
-            metrics["memory"] = self.get_memory_usage()
+        if metrics_config.get("memory", {}).get("enabled", True):
+            collectors.append(("memory", self.get_memory_usage))
         
         # Disco
-        if self.config.get("metrics", {}).get("disk", {}).get("enabled", True):
-            metrics["disk"] = self.get_disk_usage()
+        if metrics_config.get("disk", {}).get("enabled", True):
+            collectors.append(("disk", self.get_disk_usage))
         
         # Rede
-        if self.config.get("metrics", {}).get("network", {}).get("enabled", True):
-            metrics["network"] = self.get_network_usage()
+        if metrics_config.get("network", {}).get("enabled", True):
+            collectors.append(("network", self.get_network_usage))
         
         # Temperatura
-        if self.config.get("metrics", {}).get("temperature", {}).get("enabled", True):
-            metrics["temperature"] = self.get_temperature()
+        if metrics_config.get("temperature", {}).get("enabled", True):
+            collectors.append(("temperature", self.get_temperature))
         
         # Processos
-        if self.config.get("metrics", {}).get("processes", {}).get("enabled", True):
-            metrics["processes"] = self.get_processes()
+        if metrics_config.get("processes", {}).get("enabled", True):
+            collectors.append(("processes", self.get_processes))
         
         # NoIP DUC
         if self.config.get("noip_duc", {}).get("enabled", True):
-            metrics["noip_duc"] = self.check_noip_duc()
+            collectors.append(("noip_duc", self.check_noip_duc))
         
         # Verificação de portas
         if self.config.get("port_check", {}).get("enabled", True):
-            metrics["port_check"] = self.check_ports()
+            collectors.append(("port_check", self.check_ports))
         
-        # Prepara o payload
-        data = {
-            "timestamp": time.time(),
+        # Serviços adicionais
+        if self._watched_services:
+            collectors.append(("services", self.get_services_status))
+        
+        # Resumos das janelas de agregação
+        if self.aggregator:
+            collectors.append(("aggregates", self.aggregator.collect))
+        
+        return collectors
+    
+    def collect_metrics(self) -> Dict[str, Any]:
+        """Executa todos os coletores habilitados e guarda o resultado de cada seção em cache"""
+        metrics = {}
+        
+        for name, collector in self._enabled_collectors():
+            with self.telemetry.timed(f"collector.{name}"):
+                metrics[name] = collector()
+            self._section_cache[name] = (time.time(), metrics[name])
+        
+        return metrics
+    
+    def get_agent_stats(self, advance: bool = True) -> Dict[str, Any]:
+        """
+        Coleta métricas do próprio agente
+        
+        Args:
+            advance: Avança a referência do uso de CPU do agente (False fora do ciclo normal)
+        """
+        return {
+            "reconnect": {
+                "publisher": self.publisher_reconnect.snapshot(),
+                "consumer": self.consumer_reconnect.snapshot(),
+                "alerts": self.alert_reconnect.snapshot()
+            },
+            "flow_control": self.flow_control.snapshot(),
+            "transport": self.publisher.snapshot(),
+            "aggregation": self.aggregator.snapshot() if self.aggregator else None,
+            "history": self.history.snapshot() if self.history else None,
+            "process_table": self.process_table.snapshot(),
+            "alerts": dict(self.alert_evaluator.snapshot(), publisher=self.alert_publisher.snapshot())
+                      if self.alert_evaluator else None,
+            "schedule": {
+                "interval": self.scheduler.interval,
+                "phase": round(self.scheduler.phase, 3),
+                "missed_ticks": self.scheduler.missed_ticks,
+                "adaptive": self.adaptive.snapshot() if self.adaptive else None
+            },
+            "logging": logging_stats(),
+            "telemetry": self.telemetry.snapshot(advance)
+        }
+    
+    def get_health(self) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Avalia a saúde do agente para o /healthz
+        
+        O agente é considerado saudável enquanto os ciclos de coleta continuam
+        concluindo dentro de max_tick_age; o estado do broker é apenas informativo,
+        já que reiniciar o agente não resolve uma queda do RabbitMQ.
+        
+        Returns:
+            Tupla (saudável, detalhes)
+        """
+        now = time.time()
+        http_config = self.config.get("http", {})
+        max_tick_age = float(http_config.get("max_tick_age") or max(60.0, 3 * self.scheduler.interval))
+        tick_age = now - (self._last_cycle_at or self._started_at)
+        healthy = self.running and tick_age <= max_tick_age
+        
+        return healthy, {
+            "status": "ok" if healthy else "stale",
+            "hostname": self.hostname,
+            "running": self.running,
+            "last_tick_at": self._last_cycle_at,
+            "tick_age": round(tick_age, 3),
+            "max_tick_age": max_tick_age,
+            "missed_ticks": self.scheduler.missed_ticks,
+            "broker": {
+                "transport": self.publisher.transport.name,
+                "publisher_connected": self.publisher.connected,
+                "blocked": self.flow_control.blocked,
+                "buffered": self.flow_control.pending(),
+                "publisher_circuit": self.publisher_reconnect.state,
+                "consumer_circuit": self.consumer_reconnect.state
+            }
+        }
+    
+    def build_payload(self, metrics: Dict[str, Any], timestamp: Optional[float] = None,
+                      advance: bool = True) -> Dict[str, Any]:
+        """
+        Monta a mensagem enviada ao backend
+        
+        Args:
+            metrics: Seções de métricas coletadas
+            timestamp: Momento da coleta (padrão: agora)
+            advance: Avança as referências de "desde o último envio" (False em snapshots)
+            
+        Returns:
+            Dicionário com o payload completo
+        """
+        payload = {
+            "timestamp": timestamp if timestamp is not None else time.time(),
             "hostname": self.hostname,
             "metrics": metrics,
             "network_info": {
                 "public_ip": self.public_ip,
                 "private_ip": self.private_ip,
                 "asn_info": self.asn_info
-            }
+            },
+            "agent_stats": self.get_agent_stats(advance)
         }
+        # Alertas já avaliados no agente: o backend não repete as regras por amostra
+        if self.alert_evaluator:
+            payload["edge_alerts"] = True
+        return payload
+    
+    def collect_snapshot(self, sections: Optional[List[str]] = None, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Coleta um snapshot imediato, reaproveitando seções lentas do último ciclo
+        
+        Executado em uma thread de comando: só as seções de LIVE_SECTIONS são reamostradas;
+        as demais vêm sempre do último ciclo, mesmo pedidas ou mais velhas que max_age.
+        
+        Args:
+            sections: Seções a reamostrar obrigatoriamente (padrão: as seções rápidas)
+            max_age: Idade máxima em segundos para reaproveitar uma seção do cache
+            
+        Returns:
+            Payload no mesmo formato do ciclo normal, com a idade das seções reaproveitadas
+            e as seções vencidas (stale_sections) ou ainda não coletadas (missing_sections)
+        """
+        snapshot_config = self.config.get("collect_now", {})
+        if max_age is None:
+            max_age = snapshot_config.get("max_cache_age", 300)
+        fast_sections = set(sections) if sections else set(snapshot_config.get("fast_sections", self.FAST_SECTIONS))
+        cpu_interval = snapshot_config.get("cpu_sample_interval", 0.2)
         
-        # Envia dados para o RabbitMQ
-        success = self.send_data_to_rabbitmq(data)
-        if success:
-            logger.info(f"Dados enviados com sucesso: CPU {metrics.get('cpu', {}).get('percent', 0)}%, Memória {metrics.get('memory', {}).get('percent', 0)}%")
+        now = time.time()
+        metrics = {}
+        cached_sections = {}
+        stale_sections = []
+        missing_sections = []
+        
+        for name, collector in self._enabled_collectors():
+            cached = self._section_cache.get(name)
+            fresh = cached is not None and now - cached[0] <= max_age
+            if name in self.LIVE_SECTIONS and (name in fast_sections or not fresh):
+                # CPU com janela curta de amostragem para responder em menos de um segundo
+                if name == "cpu":
+                    metrics[name] = self.get_cpu_usage(interval=cpu_interval, live=True)
+                else:
+                    metrics[name] = collector()
+            elif cached is not None:
+                metrics[name] = cached[1]
+                cached_sections[name] = round(now - cached[0], 2)
+                if not fresh:
+                    stale_sections.append(name)
+            else:
+                missing_sections.append(name)
+        
+        data = self.build_payload(metrics, advance=False)
+        data["snapshot"] = True
+        data["cached_sections"] = cached_sections
+        data["stale_sections"] = stale_sections
+        data["missing_sections"] = missing_sections
+        return data
+    
+    def collect_and_send_data(self) -> None:
+        """Coleta e envia dados do sistema para o RabbitMQ"""
+        # Atualiza informações de rede
+        with self.telemetry.timed("network_info"):
+            self.update_network_info()
+        
+        # Coleta dados do sistema e prepara o payload
+        metrics = self.collect_metrics()
+        self._evaluate_alerts(metrics)
+        if self.adaptive:
+            self._observe_tick(metrics)
+        data = self.build_payload(metrics)
+        self._last_payload = data
+        if self.history:
+            self.history.append(metrics, data["timestamp"])
+        
+        # Com o broker bloqueado, guarda uma versão reduzida da amostra em vez de publicar
+        self.publisher.poll()
+        if self.flow_control.blocked:
+            self.flow_control.buffer(data)
+            logger.debug("Broker bloqueado: amostra guardada no buffer local")
+            return
+        
+        # Envia dados pelo transporte configurado
+        status = self.send_data_to_rabbitmq(data)
+        if status == PUBLISH_SENT:
+            logger.info("Dados enviados com sucesso: CPU %s%%, Memória %s%%",
+                        metrics.get('cpu', {}).get('percent', 0), metrics.get('memory', {}).get('percent', 0))
+        elif status == PUBLISH_QUEUED:
+            logger.debug("Dados adicionados ao lote (%d mensagens aguardando envio)", self.publisher.pending())
         else:
             logger.warning("Falha ao enviar dados")
     
@@ -1115,17 +1936,43 @@ class MonitoringAgent:
         # Iniciar ícone na system tray
         self.start_tray_icon()
         
+        # Endpoint local de métricas e health check
+        if self.metrics_server:
+            self.metrics_server.start()
+        
+        # Publicação imediata dos eventos de alerta
+        if self.alert_publisher:
+            self.alert_publisher.start()
+        
+        # Amostragem em alta frequência para os resumos por janela
+        if self.aggregator:
+            self.aggregator.start()
+        
         # Inicia thread para escutar comandos
         self.command_thread = threading.Thread(target=self.listen_for_commands)
         self.command_thread.daemon = True
         self.command_thread.start()
         
-        logger.info("Agente de monitoramento iniciado")
+        logger.info(f"Agente de monitoramento iniciado (fase de {self.scheduler.phase:.3f}s no intervalo de {self.scheduler.interval}s)")
         
         try:
+            deadline = self.scheduler.next_deadline()
             while self.running:
-                self.collect_and_send_data()
-                time.sleep(self.collection_interval)
+                # Aguarda o próximo deadline da grade do host
+                self._wait_until(deadline)
+                if not self.running:
+                    break
+                
+                # Sessão de diagnóstico ativa: o ciclo é executado sob o cProfile
+                session = self._profile_session
+                with self.telemetry.timed("cycle"):
+                    if session:
+                        with session.profile_cycle():
+                            self.collect_and_send_data()
+                    else:
+                        self.collect_and_send_data()
+                self._last_cycle_at = time.time()
+                deadline = self._next_deadline(deadline)
         except KeyboardInterrupt:
             logger.info("Interrupção de teclado detectada")
             self.stop()
@@ -1138,12 +1985,35 @@ class MonitoringAgent:
         """Para o agente de monitoramento"""
         logger.info("Parando o agente de monitoramento...")
         self.running = False
+        self._wakeup.set()
         
         # Aguarda a thread de comandos terminar
         if self.command_thread and self.command_thread.is_alive():
             self.command_thread.join(timeout=5)
         
+        # Encerra o pool de execução de comandos e de consultas de serviços
+        self.dispatcher.shutdown()
+        self.service_prober.shutdown()
+        
+        # Envia o lote pendente e fecha o transporte de dados
+        self.publisher.close()
+        
+        # Publica os alertas pendentes, se possível, e fecha o transporte de alertas
+        if self.alert_publisher:
+            self.alert_publisher.stop()
+        
+        # Encerra o endpoint local de métricas
+        if self.metrics_server:
+            self.metrics_server.stop()
+        
+        # Encerra a amostragem das janelas de agregação
+        if self.aggregator:
+            self.aggregator.stop()
+        
         logger.info("Agente de monitoramento parado")
+        
+        # Escreve os registros pendentes e encerra a thread de logging
+        stop_logging()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,448 @@
+"""
+Agregação de métricas em janelas
+Amostra métricas baratas (CPU, memória, taxas de rede e disco) em alta frequência
+entre os envios e resume cada janela em min, max, média, último valor e p95, com
+memória constante por série (o p95 é estimado pelo algoritmo P²). A distribuição
+do uso por núcleo na janela é resumida por um DDSketch (p50/p90/p99/max)
+"""
+
+import math
+import time
+import bisect
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+import psutil
+
+from burst import _cpu_busy_percent
+from sketches import DDSketch
+
+logger = logging.getLogger("MonitoringAgent")
+
+# Famílias de métricas suportadas e suas séries
+AGGREGATION_FAMILIES = {
+    "cpu": ("percent",),
+    "memory": ("percent", "used_mb"),
+    "network": ("sent_bps", "recv_bps"),
+    "disk": ("read_bps", "write_bps")
+}
+
+
+class P2Quantile:
+    """Estimador P² (Jain e Chlamtac, 1985) de um quantil com cinco marcadores"""
+
+    __slots__ = ("p", "count", "_heights", "_positions", "_desired", "_increments")
+
+    def __init__(self, p: float):
+        """
+        Inicializa o estimador
+
+        Args:
+            p: Quantil desejado, entre 0 e 1
+        """
+        self.p = p
+        self.reset()
+
+    def reset(self) -> None:
+        """Descarta todas as observações"""
+        p = self.p
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x: float) -> None:
+        """Inclui uma observação"""
+        self.count += 1
+        heights = self._heights
+        if self.count <= 5:
+            bisect.insort(heights, x)
+            return
+
+        # Célula em que a observação cai; os extremos acompanham min e max
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+
+        positions = self._positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Ajusta os marcadores centrais que se afastaram da posição desejada
+        for i in (1, 2, 3):
+            delta = self._desired[i] - positions[i]
+            if (delta >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (delta <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if delta > 0 else -1
+                height = self._parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, step)
+                heights[i] = height
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        """Previsão parabólica da nova altura do marcador i"""
+        h, n = self._heights, self._positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, step: int) -> float:
+        """Previsão linear, usada quando a parabólica sai do intervalo dos vizinhos"""
+        h, n = self._heights, self._positions
+        return h[i] + step * (h[i + step] - h[i]) / (n[i + step] - n[i])
+
+    def value(self) -> Optional[float]:
+        """Retorna a estimativa atual (exata com até cinco observações)"""
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            index = max(0, math.ceil(self.p * self.count) - 1)
+            return self._heights[index]
+        return self._heights[2]
+
+
+class SeriesStats:
+    """Resumo em streaming de uma série: min, max, média, último valor e p95"""
+
+    __slots__ = ("count", "minimum", "maximum", "total", "last", "_p95")
+
+    def __init__(self):
+        self._p95 = P2Quantile(0.95)
+        self.reset()
+
+    def reset(self) -> None:
+        """Inicia uma nova janela"""
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.total = 0.0
+        self.last: Optional[float] = None
+        self._p95.reset()
+
+    def add(self, value: float) -> None:
+        """Inclui uma amostra"""
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        self._p95.add(value)
+
+    def summary(self) -> Dict[str, Any]:
+        """Retorna o resumo da janela"""
+        if self.count == 0:
+            return {"min": None, "max": None, "mean": None, "last": None, "p95": None}
+        return {
+            "min": round(self.minimum, 2),
+            "max": round(self.maximum, 2),
+            "mean": round(self.total / self.count, 2),
+            "last": round(self.last, 2),
+            "p95": round(self._p95.value(), 2)
+        }
+
+
+class _FamilyWindow:
+    """Janela corrente e última janela fechada de uma família de métricas"""
+
+    def __init__(self, name: str, window: float, phase: float,
+                 sampler: Callable[[float], Tuple[float, ...]],
+                 distribution: Optional[Callable[[], List[float]]] = None):
+        self.name = name
+        # 0 = janela fechada a cada envio; > 0 = janelas fixas na grade da fase do host
+        self.window = window
+        self.phase = phase
+        self.sampler = sampler
+        self.series = {series: SeriesStats() for series in AGGREGATION_FAMILIES[name]}
+        # Valores extras de cada amostra (uso por núcleo), resumidos como distribuição da janela
+        self.distribution = distribution
+        self.sketch: Optional[DDSketch] = None
+        self.started_at: Optional[float] = None
+        self.ends_at: Optional[float] = None
+        self.completed: Optional[Dict[str, Any]] = None
+
+    def _open(self, now: float) -> None:
+        """Abre a janela que contém o instante informado"""
+        if self.window > 0:
+            start = now - (now - self.phase) % self.window
+            self.started_at = start
+            self.ends_at = start + self.window
+        else:
+            self.started_at = now
+            self.ends_at = None
+        for stats in self.series.values():
+            stats.reset()
+        if self.distribution:
+            self.sketch = DDSketch()
+
+    def _summary(self, now: float, complete: bool) -> Dict[str, Any]:
+        """Resumo da janela corrente"""
+        end = self.ends_at if self.ends_at is not None and complete else now
+        result: Dict[str, Any] = {
+            "window": round(end - self.started_at, 3),
+            "start": round(self.started_at, 3),
+            "end": round(end, 3),
+            "samples": next(iter(self.series.values())).count,
+            "complete": complete
+        }
+        for series, stats in self.series.items():
+            result[series] = stats.summary()
+        if self.sketch is not None:
+            result["per_core"] = self.sketch.summary()
+        return result
+
+    def roll(self, now: float) -> None:
+        """Fecha a janela corrente se ela já terminou"""
+        if self.ends_at is not None and now >= self.ends_at:
+            self.completed = self._summary(now, True)
+            self._open(now)
+
+    def add(self, now: float, elapsed: float) -> Dict[str, float]:
+        """Amostra a família, inclui os valores na janela corrente e os retorna por série"""
+        if self.started_at is None:
+            self._open(now)
+        self.roll(now)
+        values = dict(zip(self.series, self.sampler(elapsed)))
+        for series, value in values.items():
+            self.series[series].add(value)
+        if self.sketch is not None:
+            self.sketch.add_many(self.distribution())
+        return values
+
+    def collect(self, now: float) -> Optional[Dict[str, Any]]:
+        """
+        Resumo a enviar no ciclo atual
+
+        Janelas por envio são fechadas aqui; janelas fixas retornam a última janela
+        fechada ou, antes da primeira, a janela parcial em andamento.
+        """
+        if self.started_at is None:
+            return None
+        if self.window <= 0:
+            summary = self._summary(now, True)
+            self._open(now)
+            return summary
+        self.roll(now)
+        if self.completed is not None:
+            return self.completed
+        return self._summary(now, False)
+
+
+class WindowAggregator:
+    """Amostrador em segundo plano que resume métricas baratas em janelas"""
+
+    def __init__(self, families: Dict[str, float], sample_interval: float, phase: float = 0.0,
+                 on_sample: Optional[Callable[[Dict[str, Any], float], Any]] = None,
+                 per_core: bool = False):
+        """
+        Inicializa o agregador
+
+        Args:
+            families: {família: janela em segundos}, com 0 para fechar a janela a cada envio
+            sample_interval: Intervalo entre amostras internas em segundos
+            phase: Fase da grade das janelas fixas (a mesma dos ciclos de coleta)
+            on_sample: Chamado a cada amostra com ({família: {série: valor}}, instante)
+            per_core: Amostra também o uso de cada núcleo e resume a distribuição na janela
+        """
+        unknown = [name for name in families if name not in AGGREGATION_FAMILIES]
+        if unknown:
+            raise ValueError(f"Famílias não suportadas na agregação: {', '.join(unknown)}")
+
+        self.sample_interval = max(0.05, sample_interval)
+        self.on_sample = on_sample
+        self.samples = 0
+        self.overruns = 0
+
+        self.per_core = per_core
+
+        self._last_cpu = None
+        self._last_cores = None
+        self._core_percents: List[float] = []
+        self._last_net = None
+        self._last_disk = None
+        self._last_time: Optional[float] = None
+
+        self._windows = [
+            _FamilyWindow(name, max(0.0, float(window)), phase, getattr(self, f"_sample_{name}"),
+                          self._take_core_percents if name == "cpu" and per_core else None)
+            for name, window in families.items()
+        ]
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], phase: float = 0.0,
+                    on_sample: Optional[Callable[[Dict[str, Any], float], Any]] = None) -> "WindowAggregator":
+        """
+        Cria o agregador a partir da seção aggregation da configuração
+
+        Args:
+            config: Seção aggregation
+            phase: Fase da grade das janelas fixas
+            on_sample: Chamado a cada amostra com os valores amostrados
+        """
+        families_config = config.get("families", {})
+        families = {}
+        for name in AGGREGATION_FAMILIES:
+            family_config = families_config.get(name, {}) or {}
+            if family_config.get("enabled", True):
+                families[name] = float(family_config.get("window", 0))
+        per_core = bool((families_config.get("cpu", {}) or {}).get("per_core", True))
+        return cls(families, float(config.get("sample_interval", 1)), phase, on_sample, per_core)
+
+    @property
+    def families(self) -> List[str]:
+        """Famílias agregadas"""
+        return [window.name for window in self._windows]
+
+    def _sample_cpu(self, elapsed: float) -> Tuple[float, ...]:
+        current = psutil.cpu_times()
+        percent = _cpu_busy_percent(self._last_cpu, current) if self._last_cpu else 0.0
+        self._last_cpu = current
+        if self.per_core:
+            cores = psutil.cpu_times(percpu=True)
+            previous, self._last_cores = self._last_cores, cores
+            if previous and len(previous) == len(cores):
+                self._core_percents = [_cpu_busy_percent(before, after) for before, after in zip(previous, cores)]
+        return (percent,)
+
+    def _take_core_percents(self) -> List[float]:
+        """Uso por núcleo da última amostra de CPU (consumido uma única vez)"""
+        values, self._core_percents = self._core_percents, []
+        return values
+
+    def _sample_memory(self, elapsed: float) -> Tuple[float, ...]:
+        memory = psutil.virtual_memory()
+        return (memory.percent, memory.used / (1024**2))
+
+    def _sample_network(self, elapsed: float) -> Tuple[float, ...]:
+        current = psutil.net_io_counters()
+        previous, self._last_net = self._last_net, current
+        if previous is None:
+            return (0.0, 0.0)
+        # Contadores reiniciados (interface recriada) viram taxa zero em vez de negativa
+        return (
+            max(0, current.bytes_sent - previous.bytes_sent) / elapsed,
+            max(0, current.bytes_recv - previous.bytes_recv) / elapsed
+        )
+
+    def _sample_disk(self, elapsed: float) -> Tuple[float, ...]:
+        current = psutil.disk_io_counters()
+        previous, self._last_disk = self._last_disk, current
+        if current is None or previous is None:
+            return (0.0, 0.0)
+        return (
+            max(0, current.read_bytes - previous.read_bytes) / elapsed,
+            max(0, current.write_bytes - previous.write_bytes) / elapsed
+        )
+
+    def _prime(self) -> None:
+        """Lê os contadores iniciais para que a primeira amostra já tenha taxas"""
+        self._last_cpu = psutil.cpu_times()
+        if self.per_core:
+            self._last_cores = psutil.cpu_times(percpu=True)
+        self._last_net = psutil.net_io_counters()
+        self._last_disk = psutil.disk_io_counters()
+        self._last_time = time.time()
+
+    def sample(self, now: Optional[float] = None) -> None:
+        """Amostra todas as famílias e acumula os valores nas janelas correntes"""
+        now = time.time() if now is None else now
+        elapsed = max(now - (self._last_time or now), 1e-6)
+        self._last_time = now
+        values = {}
+        with self._lock:
+            for window in self._windows:
+                try:
+                    values[window.name] = window.add(now, elapsed)
+                except Exception as e:
+                    logger.debug("Falha ao amostrar %s para agregação: %s", window.name, e)
+            self.samples += 1
+
+        if self.on_sample and values:
+            try:
+                self.on_sample(values, now)
+            except Exception as e:
+                logger.error(f"Erro ao processar amostra da agregação: {e}")
+
+    def collect(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Resumo das janelas para o payload
+
+        Args:
+            now: Instante do ciclo (padrão: agora)
+
+        Returns:
+            {família: {window, start, end, samples, complete, <série>: {min, max, mean, last, p95}}},
+            com cpu.per_core = {count, p50, p90, p99, max} quando o uso por núcleo é amostrado
+        """
+        now = time.time() if now is None else now
+        result = {}
+        with self._lock:
+            for window in self._windows:
+                summary = window.collect(now)
+                if summary is not None:
+                    result[window.name] = summary
+        return result
+
+    def start(self) -> None:
+        """Inicia a thread de amostragem"""
+        if not self._windows or (self._thread and self._thread.is_alive()):
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="window-aggregator", daemon=True)
+        self._thread.start()
+        logger.info(f"Agregação em janelas ativa: {', '.join(self.families)} a cada {self.sample_interval}s")
+
+    def stop(self) -> None:
+        """Encerra a thread de amostragem"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _run(self) -> None:
+        """Amostra em deadlines fixos até stop(), sem acumular atraso entre amostras"""
+        try:
+            self._prime()
+        except Exception as e:
+            logger.warning(f"Agregação em janelas indisponível: {e}")
+            return
+
+        deadline = time.time()
+        while True:
+            deadline += self.sample_interval
+            delay = deadline - time.time()
+            if delay < 0:
+                # Amostras atrasadas são puladas em vez de disparadas em sequência
+                missed = int(-delay // self.sample_interval) + 1
+                self.overruns += missed
+                deadline += missed * self.sample_interval
+                delay = deadline - time.time()
+            if self._stopped.wait(max(0.0, delay)):
+                return
+            self.sample()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado do agregador para as estatísticas do agente"""
+        return {
+            "families": self.families,
+            "sample_interval": self.sample_interval,
+            "samples": self.samples,
+            "overruns": self.overruns
+        }
@@ -0,0 +1,489 @@
+"""
+Alertas avaliados no próprio agente
+Regras de limite com duração mínima e histerese são aplicadas a cada amostra
+(ciclos de coleta e amostras internas da agregação em janelas). Mudanças de
+estado viram eventos pequenos, publicados imediatamente em uma fila prioritária
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Callable, Iterator, Tuple
+
+import pika
+
+from backoff import ReconnectPolicy
+from transports import AmqpTransport, BatchPublisher, Transport, build_transport, PUBLISH_FAILED
+
+logger = logging.getLogger("MonitoringAgent")
+
+# Condições aceitas nas regras e o operador exibido nas mensagens
+ALERT_CONDITIONS = {"above": ">", "below": "<", "equals": "==", "not_equals": "!="}
+
+# Prioridade AMQP padrão de cada severidade
+DEFAULT_PRIORITIES = {"critical": 9, "warning": 5, "info": 1}
+
+# Campos usados para identificar itens de listas nos caminhos das métricas
+_ITEM_KEYS = ("name", "mountpoint", "device")
+
+
+def resolve_metric(data: Any, path: List[str], instance: Tuple[str, ...] = ()) -> Iterator[Tuple[Optional[str], Any]]:
+    """
+    Percorre as métricas seguindo um caminho com curingas
+
+    "*" expande todas as chaves de um dicionário ou todos os itens de uma lista
+    (identificados por name, mountpoint ou device); cada expansão vira parte da
+    instância do alerta.
+
+    Args:
+        data: Seção atual das métricas
+        path: Partes restantes do caminho
+        instance: Partes já expandidas por curingas
+
+    Returns:
+        Iterador de (instância, valor)
+    """
+    if not path:
+        yield ("/".join(instance) if instance else None), data
+        return
+
+    key, rest = path[0], path[1:]
+    if isinstance(data, dict):
+        if key == "*":
+            for name, value in data.items():
+                yield from resolve_metric(value, rest, instance + (str(name),))
+        elif key in data:
+            yield from resolve_metric(data[key], rest, instance)
+    elif isinstance(data, list):
+        for index, item in enumerate(data):
+            name = next((item[k] for k in _ITEM_KEYS if isinstance(item, dict) and item.get(k) is not None), index)
+            if key == "*" or key == str(name):
+                yield from resolve_metric(item, rest, instance + ((str(name),) if key == "*" else ()))
+
+
+class AlertRule:
+    """Regra de limite com duração mínima e histerese"""
+
+    def __init__(self, name: str, metric: str, condition: str, threshold: Any,
+                 clear: Any = None, duration: float = 0.0, clear_duration: float = 0.0,
+                 severity: str = "warning"):
+        """
+        Inicializa a regra
+
+        Args:
+            name: Identificador da regra, usado como tipo do alerta no backend
+            metric: Caminho da métrica (ex.: cpu.percent, disk.partitions.*.percent)
+            condition: above, below, equals ou not_equals
+            threshold: Limite que dispara o alerta
+            clear: Limite que encerra o alerta em above/below (padrão: o próprio threshold)
+            duration: Segundos em que a condição precisa se manter para disparar
+            clear_duration: Segundos fora da condição para encerrar
+            severity: critical, warning ou info
+        """
+        if condition not in ALERT_CONDITIONS:
+            raise ValueError(f"Condição de alerta não suportada: {condition}")
+        if condition in ("above", "below") and not isinstance(threshold, (int, float)):
+            raise ValueError(f"Regra {name}: {condition} exige um limite numérico")
+
+        self.name = name
+        self.metric = metric
+        self.path = metric.split(".")
+        # Seção que contém as instâncias de regras com curinga (ex.: disk.partitions)
+        self.container = self.path[:self.path.index("*")] if "*" in self.path else None
+        self.condition = condition
+        self.threshold = threshold
+        self.clear = threshold if clear is None else clear
+        self.duration = max(0.0, duration)
+        self.clear_duration = max(0.0, clear_duration)
+        self.severity = severity
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "AlertRule":
+        """
+        Cria a regra a partir de um item de alerts.rules
+
+        Args:
+            config: Item da lista de regras
+        """
+        conditions = [condition for condition in ALERT_CONDITIONS if condition in config]
+        if len(conditions) != 1:
+            raise ValueError(f"Regra {config.get('name')}: informe exatamente uma condição "
+                             f"({', '.join(ALERT_CONDITIONS)})")
+        if not config.get("name") or not config.get("metric"):
+            raise ValueError("Regra de alerta sem name ou metric")
+
+        condition = conditions[0]
+        return cls(
+            str(config["name"]),
+            str(config["metric"]),
+            condition,
+            config[condition],
+            clear=config.get("clear"),
+            duration=float(config.get("for", 0)),
+            clear_duration=float(config.get("clear_for", 0)),
+            severity=str(config.get("severity", "warning"))
+        )
+
+    def breached(self, value: Any) -> Optional[bool]:
+        """Indica se o valor viola a regra (None quando o valor não é comparável)"""
+        if self.condition == "equals":
+            return value == self.threshold
+        if self.condition == "not_equals":
+            return value != self.threshold
+        if not isinstance(value, (int, float)):
+            return None
+        return value > self.threshold if self.condition == "above" else value < self.threshold
+
+    def cleared(self, value: Any) -> Optional[bool]:
+        """Indica se o valor encerra um alerta ativo, aplicando a histerese"""
+        if self.condition in ("equals", "not_equals"):
+            breached = self.breached(value)
+            return None if breached is None else not breached
+        if not isinstance(value, (int, float)):
+            return None
+        return value <= self.clear if self.condition == "above" else value >= self.clear
+
+    def describe(self, value: Any) -> str:
+        """Mensagem curta do alerta"""
+        text = f"{self.metric} {ALERT_CONDITIONS[self.condition]} {self.threshold}"
+        if self.duration:
+            text += f" for {self.duration:g}s"
+        return f"{text} (value: {value})"
+
+
+class _AlertState:
+    """Estado de uma regra para uma instância"""
+
+    __slots__ = ("firing", "since", "clear_since", "fired_at", "value")
+
+    def __init__(self):
+        self.firing = False
+        self.since: Optional[float] = None
+        self.clear_since: Optional[float] = None
+        self.fired_at: Optional[float] = None
+        self.value: Any = None
+
+
+class AlertEvaluator:
+    """Avalia as regras de alerta sobre cada amostra e gera eventos nas mudanças de estado"""
+
+    def __init__(self, hostname: str, rules: List[AlertRule]):
+        """
+        Inicializa o avaliador
+
+        Args:
+            hostname: Host incluído nos eventos
+            rules: Regras avaliadas
+        """
+        self.hostname = hostname
+        self.rules = rules
+        self.events = 0
+        self._states: Dict[Tuple[str, Optional[str]], _AlertState] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_rules(rules_config: List[Dict[str, Any]]) -> List[AlertRule]:
+        """Converte alerts.rules em regras, ignorando (com aviso) as inválidas"""
+        rules = []
+        for rule_config in rules_config or []:
+            try:
+                rules.append(AlertRule.from_config(rule_config))
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Regra de alerta ignorada: {e}")
+        return rules
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], hostname: str) -> "AlertEvaluator":
+        """
+        Cria o avaliador a partir da seção alerts da configuração
+
+        Args:
+            config: Seção alerts
+            hostname: Host incluído nos eventos
+        """
+        return cls(hostname, cls.parse_rules(config.get("rules", [])))
+
+    def load_rules(self, rules: List[AlertRule]) -> None:
+        """Troca as regras, mantendo o estado das que continuam existindo"""
+        names = {rule.name for rule in rules}
+        with self._lock:
+            self.rules = rules
+            self._states = {key: state for key, state in self._states.items() if key[0] in names}
+
+    def evaluate(self, metrics: Dict[str, Any], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Aplica as regras a uma amostra
+
+        Regras cujo caminho não existe na amostra são ignoradas, o que permite
+        avaliar tanto o payload completo quanto as amostras parciais da agregação.
+        Já instâncias que somem de uma seção presente (partição desmontada, processo
+        ou porta removidos da configuração) têm o alerta encerrado.
+
+        Args:
+            metrics: Métricas no formato do payload
+            now: Instante da amostra (padrão: agora)
+
+        Returns:
+            Eventos firing/resolved gerados por esta amostra
+        """
+        now = time.time() if now is None else now
+        events = []
+        with self._lock:
+            for rule in self.rules:
+                seen = set()
+                for instance, value in resolve_metric(metrics, rule.path):
+                    seen.add(instance)
+                    event = self._update(rule, instance, value, now)
+                    if event:
+                        events.append(event)
+                if rule.container is not None and any(True for _ in resolve_metric(metrics, rule.container)):
+                    events.extend(self._vanish(rule, seen, now))
+        return events
+
+    def _vanish(self, rule: AlertRule, seen: set, now: float) -> List[Dict[str, Any]]:
+        """Encerra os alertas (e descarta os estados pendentes) das instâncias ausentes da amostra"""
+        events = []
+        for key in [key for key in self._states if key[0] == rule.name and key[1] not in seen]:
+            state = self._states.pop(key)
+            if state.firing:
+                event = self._event("resolved", rule, key[1], state.value, now, state)
+                event["vanished"] = True
+                events.append(event)
+        return events
+
+    def _update(self, rule: AlertRule, instance: Optional[str], value: Any, now: float) -> Optional[Dict[str, Any]]:
+        """Avança a máquina de estados de uma regra/instância"""
+        key = (rule.name, instance)
+        state = self._states.get(key)
+
+        if state is None or not state.firing:
+            if not rule.breached(value):
+                # Condição não mantida: descarta o estado pendente
+                if state is not None:
+                    del self._states[key]
+                return None
+            if state is None:
+                state = self._states[key] = _AlertState()
+            if state.since is None:
+                state.since = now
+            if now - state.since < rule.duration:
+                return None
+            state.firing = True
+            state.fired_at = now
+            state.value = value
+            return self._event("firing", rule, instance, value, now, state)
+
+        state.value = value
+        cleared = rule.cleared(value)
+        if not cleared:
+            state.clear_since = None
+            return None
+        if state.clear_since is None:
+            state.clear_since = now
+        if now - state.clear_since < rule.clear_duration:
+            return None
+        del self._states[key]
+        return self._event("resolved", rule, instance, value, now, state)
+
+    def _event(self, kind: str, rule: AlertRule, instance: Optional[str], value: Any,
+               now: float, state: _AlertState) -> Dict[str, Any]:
+        """Monta o evento publicado na fila de alertas"""
+        self.events += 1
+        if isinstance(value, float):
+            value = round(value, 2)
+        if kind == "firing":
+            logger.warning(f"Alerta {rule.name}{f' [{instance}]' if instance else ''} disparado: {rule.describe(value)}")
+        else:
+            logger.info(f"Alerta {rule.name}{f' [{instance}]' if instance else ''} encerrado (valor: {value})")
+        return {
+            "type": "alert",
+            "event": kind,
+            "hostname": self.hostname,
+            "timestamp": now,
+            "rule": rule.name,
+            "instance": instance,
+            "severity": rule.severity,
+            "metric": rule.metric,
+            "value": value,
+            "threshold": rule.threshold,
+            "since": state.since,
+            "message": rule.describe(value)
+        }
+
+    def firing(self) -> List[Dict[str, Any]]:
+        """Alertas ativos no momento"""
+        with self._lock:
+            return [
+                {"rule": name, "instance": instance, "since": state.fired_at, "value": state.value}
+                for (name, instance), state in self._states.items() if state.firing
+            ]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado do avaliador para as estatísticas do agente"""
+        return {
+            "rules": len(self.rules),
+            "events": self.events,
+            "firing": self.firing()
+        }
+
+
+class AlertAmqpTransport(AmqpTransport):
+    """Fila de alertas com prioridade por severidade (x-max-priority)"""
+
+    def __init__(self, parameters: Callable[[], pika.ConnectionParameters], queue_name: str,
+                 priorities: Dict[str, int], max_priority: int):
+        """
+        Inicializa o transporte
+
+        Args:
+            parameters: Função que monta os parâmetros de conexão
+            queue_name: Fila de alertas
+            priorities: Prioridade AMQP de cada severidade
+            max_priority: x-max-priority declarado na fila
+        """
+        super().__init__(parameters, queue_name, queue_arguments={"x-max-priority": max_priority})
+        self.priorities = priorities
+
+    def encode(self, data: Dict[str, Any]) -> Any:
+        return json.dumps(data), self.priorities.get(data.get("severity"), 0)
+
+    def publish(self, messages: List[Any]) -> None:
+        for body, priority in messages:
+            self._channel.basic_publish(
+                exchange='',
+                routing_key=self.queue_name,
+                body=body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,  # Mensagem persistente
+                    content_type='application/json',
+                    priority=priority
+                )
+            )
+
+
+def build_alert_transport(kind: str, config: Dict[str, Any], transport_config: Dict[str, Any],
+                          parameters: Callable[[], pika.ConnectionParameters], queue_name: str,
+                          default_directory: str) -> Transport:
+    """
+    Cria o transporte dos alertas, do mesmo tipo do transporte de dados
+
+    Args:
+        kind: Tipo do transporte de dados (amqp, inprocess, file ou stdout)
+        config: Seção alerts
+        transport_config: Seção transport
+        parameters: Função que monta os parâmetros de conexão AMQP
+        queue_name: Fila de alertas
+        default_directory: Diretório padrão dos segmentos do transporte de dados
+
+    Returns:
+        Transporte dos alertas
+    """
+    if kind == "amqp":
+        priorities = dict(DEFAULT_PRIORITIES)
+        priorities.update(config.get("priorities", {}) or {})
+        max_priority = int(config.get("max_priority", 10))
+        return AlertAmqpTransport(parameters, queue_name, priorities, max_priority)
+
+    # Segmentos de alerta em um subdiretório, sem concorrer com a rotação dos dados
+    file_config = dict(transport_config.get("file", {}) or {})
+    file_config["directory"] = os.path.join(file_config.get("directory") or default_directory, "alerts")
+    return build_transport(kind, dict(transport_config, file=file_config), parameters, queue_name,
+                           default_directory=default_directory)
+
+
+class AlertPublisher:
+    """Thread que publica os eventos de alerta assim que são gerados, sem perder a ordem"""
+
+    def __init__(self, publisher: BatchPublisher, max_pending: int = 1000):
+        """
+        Inicializa o publicador
+
+        Args:
+            publisher: Publicador sobre o transporte de alertas (lotes de uma mensagem)
+            max_pending: Eventos retidos enquanto o transporte está indisponível
+        """
+        self.publisher = publisher
+        self.sent = 0
+        self.discarded = 0
+        self._pending: deque = deque()
+        self._max_pending = max(1, max_pending)
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, event: Dict[str, Any]) -> None:
+        """Enfileira um evento para publicação imediata"""
+        with self._condition:
+            if len(self._pending) >= self._max_pending:
+                self._pending.popleft()
+                self.discarded += 1
+            self._pending.append(event)
+            self._condition.notify()
+
+    def start(self) -> None:
+        """Inicia a thread de publicação"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="alert-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Publica o que for possível e encerra a thread"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.publisher.close()
+
+    def _run(self) -> None:
+        """Publica os eventos pendentes; em falha, espera o backoff da política e tenta de novo"""
+        while True:
+            with self._condition:
+                if not self._pending and not self._stopped:
+                    # Acorda periodicamente para manter a conexão (heartbeats)
+                    self._condition.wait(timeout=1.0)
+                if self._stopped and (not self._pending or not self.publisher.connected):
+                    return
+                event = self._pending[0] if self._pending else None
+
+            if event is None:
+                self.publisher.poll()
+                continue
+
+            if self.publisher.publish(self.publisher.encode(event)) != PUBLISH_FAILED:
+                with self._condition:
+                    if self._pending and self._pending[0] is event:
+                        self._pending.popleft()
+                self.sent += 1
+                continue
+
+            # Transporte indisponível: o evento continua na frente da fila
+            with self._condition:
+                if self._stopped:
+                    return
+                self._condition.wait(timeout=min(max(self.publisher.policy.wait_time(), 0.1), 30.0))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Contadores para as estatísticas do agente"""
+        return {
+            "type": self.publisher.transport.name,
+            "connected": self.publisher.connected,
+            "sent": self.sent,
+            "pending": len(self._pending),
+            "discarded": self.discarded
+        }
+
+
+def create_alert_publisher(kind: str, config: Dict[str, Any], transport_config: Dict[str, Any],
+                           parameters: Callable[[], pika.ConnectionParameters], queue_name: str,
+                           policy: ReconnectPolicy, default_directory: str) -> AlertPublisher:
+    """Monta o transporte, o publicador e a thread de alertas"""
+    transport = build_alert_transport(kind, config, transport_config, parameters, queue_name, default_directory)
+    publisher = BatchPublisher(transport, policy, batch_size=1, retry_on_disconnect=True)
+    return AlertPublisher(publisher, int(config.get("max_pending", 1000)))
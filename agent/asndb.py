@@ -0,0 +1,334 @@
+"""
+Consulta local de IP para ASN
+Carrega uma base de prefixos (dump pfx2as do RouteViews ou CSV CIDR→ASN/org/país),
+compila um índice binário de intervalos disjuntos e o mapeia em memória para
+consultas de longest-prefix-match por busca binária, sem acesso à rede
+"""
+
+import io
+import os
+import csv
+import sys
+import gzip
+import json
+import mmap
+import struct
+import bisect
+import logging
+import ipaddress
+import threading
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("MonitoringAgent")
+
+INDEX_MAGIC = b"ASNIDX1\0"
+# magic, ordem de bytes, n_v4, n_v6, tamanho dos registros, mtime da fonte, tamanho da fonte
+HEADER = struct.Struct("<8s1sIIIqq")
+
+
+class _FixedWidthKeys:
+    """Sequência de chaves big-endian de largura fixa sobre um buffer, usada com bisect"""
+
+    def __init__(self, buffer, offset: int, width: int, count: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._width = width
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> bytes:
+        start = self._offset + index * self._width
+        return self._buffer[start:start + self._width]
+
+
+def _open_text(path: str):
+    """Abre a base de prefixos como texto, descomprimindo .gz se necessário"""
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def _detect_format(path: str) -> str:
+    """Identifica o formato da base pela primeira linha de dados"""
+    with _open_text(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            fields = line.split()
+            # pfx2as: "1.0.0.0<TAB>24<TAB>13335"
+            if len(fields) >= 3 and "/" not in fields[0] and fields[1].isdigit():
+                return "pfx2as"
+            return "csv"
+    return "csv"
+
+
+def _parse_prefixes(path: str, fmt: str) -> Tuple[List[Tuple[int, int, int, int]], List[Tuple[str, str, str]]]:
+    """
+    Lê a base de prefixos
+
+    Args:
+        path: Caminho da base (.csv, .txt ou .gz)
+        fmt: "csv", "pfx2as" ou "auto"
+
+    Returns:
+        Lista (versão, início, fim, índice do registro) e tabela de registros (asn, org, país)
+    """
+    prefixes = []
+    records: List[Tuple[str, str, str]] = []
+    record_ids: Dict[Tuple[str, str, str], int] = {}
+
+    def add(cidr: str, asn: str, organization: str, country: str) -> None:
+        try:
+            network = ipaddress.ip_network(cidr.strip(), strict=False)
+        except ValueError:
+            return
+        asn = asn.strip().upper()
+        if asn and not asn.startswith("AS"):
+            asn = f"AS{asn}"
+        key = (asn or "Unknown", organization.strip() or "Unknown", country.strip() or "Unknown")
+        if key not in record_ids:
+            record_ids[key] = len(records)
+            records.append(key)
+        prefixes.append((
+            network.version,
+            int(network.network_address),
+            int(network.broadcast_address),
+            record_ids[key]
+        ))
+
+    if fmt == "auto":
+        fmt = _detect_format(path)
+
+    with _open_text(path) as file:
+        if fmt == "pfx2as":
+            for line in file:
+                fields = line.split()
+                if len(fields) < 3 or fields[0].startswith("#"):
+                    continue
+                # Prefixos com múltiplas origens vêm como "64500_64501" ou "64500,64501": usa a primeira
+                origin = fields[2].replace(",", "_").split("_")[0]
+                add(f"{fields[0]}/{fields[1]}", origin, "", "")
+        else:
+            for row in csv.reader(file):
+                # Ignora cabeçalho, comentários e linhas sem CIDR
+                if len(row) < 2 or "/" not in row[0] or row[0].lstrip().startswith("#"):
+                    continue
+                add(row[0], row[1], row[2] if len(row) > 2 else "", row[3] if len(row) > 3 else "")
+
+    return prefixes, records
+
+
+def _flatten(prefixes: List[Tuple[int, int, int]]) -> List[Tuple[int, int, int]]:
+    """
+    Converte prefixos aninhados em intervalos disjuntos, cada um associado ao prefixo mais específico
+
+    Args:
+        prefixes: Lista (início, fim, registro) de uma mesma família
+
+    Returns:
+        Intervalos (início, fim, registro) ordenados e sem sobreposição
+    """
+    # Início crescente e, no mesmo início, o prefixo mais largo primeiro
+    prefixes.sort(key=lambda p: (p[0], -p[1]))
+    intervals: List[Tuple[int, int, int]] = []
+    stack: List[Tuple[int, int]] = []
+    position = 0
+
+    def emit(start: int, end: int, record: int) -> None:
+        if start > end:
+            return
+        if intervals and intervals[-1][2] == record and intervals[-1][1] + 1 == start:
+            intervals[-1] = (intervals[-1][0], end, record)
+        else:
+            intervals.append((start, end, record))
+
+    for start, end, record in prefixes:
+        # Fecha os prefixos que terminam antes deste começar
+        while stack and stack[-1][0] < start:
+            top_end, top_record = stack.pop()
+            emit(position, top_end, top_record)
+            position = max(position, top_end + 1)
+        if stack:
+            emit(position, start - 1, stack[-1][1])
+        stack.append((end, record))
+        position = start
+
+    while stack:
+        top_end, top_record = stack.pop()
+        emit(position, top_end, top_record)
+        position = top_end + 1
+
+    return intervals
+
+
+def build_index(source_path: str, index_path: str, fmt: str = "auto") -> None:
+    """
+    Compila a base de prefixos em um índice binário gravado atomicamente
+
+    Args:
+        source_path: Base de prefixos
+        index_path: Arquivo de índice a gerar
+        fmt: "csv", "pfx2as" ou "auto"
+    """
+    prefixes, records = _parse_prefixes(source_path, fmt)
+    v4 = _flatten([(s, e, r) for version, s, e, r in prefixes if version == 4])
+    v6 = _flatten([(s, e, r) for version, s, e, r in prefixes if version == 6])
+    records_blob = json.dumps(records, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    stat = os.stat(source_path)
+
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(HEADER.pack(
+            INDEX_MAGIC, sys.byteorder[0].encode(), len(v4), len(v6),
+            len(records_blob), stat.st_mtime_ns, stat.st_size
+        ))
+        # IPv4: início e fim como uint32 nativos, consultados via memoryview.cast
+        file.write(array('I', [s for s, _, _ in v4]).tobytes())
+        file.write(array('I', [e for _, e, _ in v4]).tobytes())
+        file.write(array('I', [r for _, _, r in v4]).tobytes())
+        # IPv6: início e fim como 16 bytes big-endian, comparáveis como bytes
+        file.write(b"".join(s.to_bytes(16, "big") for s, _, _ in v6))
+        file.write(b"".join(e.to_bytes(16, "big") for _, e, _ in v6))
+        file.write(array('I', [r for _, _, r in v6]).tobytes())
+        file.write(records_blob)
+    os.replace(tmp_path, index_path)
+
+    logger.info(f"Índice de ASN gerado: {len(v4)} intervalos IPv4, {len(v6)} IPv6, {len(records)} registros")
+
+
+class AsnDatabase:
+    """Índice de prefixos mapeado em memória com consultas de longest-prefix-match"""
+
+    def __init__(self, index_path: str):
+        """
+        Abre um índice gerado por build_index
+
+        Args:
+            index_path: Caminho do arquivo de índice
+        """
+        if array('I').itemsize != 4:
+            raise RuntimeError("Plataforma sem inteiros de 32 bits para o índice de ASN")
+
+        self.index_path = index_path
+        self._file = open(index_path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._records: Optional[List[List[str]]] = None
+        self._records_lock = threading.Lock()
+
+        magic, byteorder, n4, n6, records_len, _, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC or byteorder != sys.byteorder[0].encode():
+            self.close()
+            raise ValueError(f"Índice de ASN inválido ou de outra plataforma: {index_path}")
+
+        view = self._view = memoryview(self._mmap)
+        offset = HEADER.size
+        self._v4_starts = view[offset:offset + 4 * n4].cast('I')
+        offset += 4 * n4
+        self._v4_ends = view[offset:offset + 4 * n4].cast('I')
+        offset += 4 * n4
+        self._v4_records = view[offset:offset + 4 * n4].cast('I')
+        offset += 4 * n4
+        self._v6_starts = _FixedWidthKeys(self._mmap, offset, 16, n6)
+        offset += 16 * n6
+        self._v6_ends = _FixedWidthKeys(self._mmap, offset, 16, n6)
+        offset += 16 * n6
+        self._v6_records = view[offset:offset + 4 * n6].cast('I')
+        offset += 4 * n6
+        self._records_span = (offset, offset + records_len)
+        self.size_v4 = n4
+        self.size_v6 = n6
+
+    @classmethod
+    def open(cls, source_path: str, index_path: Optional[str] = None, fmt: str = "auto") -> "AsnDatabase":
+        """
+        Abre a base, recompilando o índice se ele não existir ou estiver desatualizado
+
+        Args:
+            source_path: Base de prefixos
+            index_path: Arquivo de índice (padrão: <source_path>.idx)
+            fmt: "csv", "pfx2as" ou "auto"
+        """
+        index_path = index_path or f"{source_path}.idx"
+        if not cls._index_is_current(source_path, index_path):
+            build_index(source_path, index_path, fmt)
+        return cls(index_path)
+
+    @staticmethod
+    def _index_is_current(source_path: str, index_path: str) -> bool:
+        """Verifica se o índice corresponde à versão atual da base de prefixos"""
+        try:
+            stat = os.stat(source_path)
+            with open(index_path, "rb") as file:
+                header = file.read(HEADER.size)
+            magic, byteorder, _, _, _, mtime_ns, size = HEADER.unpack(header)
+        except (OSError, struct.error):
+            return False
+        return (
+            magic == INDEX_MAGIC
+            and byteorder == sys.byteorder[0].encode()
+            and mtime_ns == stat.st_mtime_ns
+            and size == stat.st_size
+        )
+
+    def _record(self, index: int) -> List[str]:
+        """Retorna um registro, carregando a tabela de registros na primeira consulta"""
+        if self._records is None:
+            with self._records_lock:
+                if self._records is None:
+                    start, end = self._records_span
+                    self._records = json.loads(self._mmap[start:end].decode("utf-8"))
+        return self._records[index]
+
+    def lookup(self, ip: str) -> Optional[Dict[str, str]]:
+        """
+        Consulta o ASN do prefixo mais específico que contém o IP
+
+        Args:
+            ip: Endereço IPv4 ou IPv6
+
+        Returns:
+            Dicionário no mesmo formato de get_asn_info ou None se não houver prefixo
+        """
+        try:
+            address = ipaddress.ip_address(ip.strip())
+        except ValueError:
+            return None
+
+        if address.version == 4:
+            key = int(address)
+            position = bisect.bisect_right(self._v4_starts, key) - 1
+            if position < 0 or self._v4_ends[position] < key:
+                return None
+            record_index = self._v4_records[position]
+        else:
+            key = address.packed
+            position = bisect.bisect_right(self._v6_starts, key) - 1
+            if position < 0 or self._v6_ends[position] < key:
+                return None
+            record_index = self._v6_records[position]
+
+        asn, organization, country = self._record(record_index)
+        return {
+            "asn": asn,
+            "organization": organization,
+            "country": country,
+            "region": "Unknown",
+            "city": "Unknown"
+        }
+
+    def close(self) -> None:
+        """Libera o mapeamento em memória"""
+        for name in ("_v4_starts", "_v4_ends", "_v4_records", "_v6_records", "_view"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._v6_starts = self._v6_ends = None
+        try:
+            self._mmap.close()
+        except (AttributeError, BufferError):
+            pass
+        self._file.close()
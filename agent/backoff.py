@@ -0,0 +1,137 @@
+"""
+Política de reconexão ao broker
+Backoff exponencial com jitter descorrelacionado, limite máximo e circuit breaker,
+evitando que toda a frota reconecte ao mesmo tempo após uma queda do RabbitMQ
+"""
+
+import time
+import random
+import threading
+from typing import Dict, Any, Optional
+
+# Estados do circuit breaker
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class ReconnectPolicy:
+    """Controla quando uma nova tentativa de conexão pode ser feita"""
+
+    def __init__(self, name: str, base_delay: float = 1.0, max_delay: float = 60.0,
+                 failure_threshold: int = 5, open_timeout: float = 120.0):
+        """
+        Inicializa a política de reconexão
+
+        Args:
+            name: Nome da conexão controlada (ex.: publisher, consumer)
+            base_delay: Menor espera entre tentativas, em segundos
+            max_delay: Maior espera entre tentativas, em segundos
+            failure_threshold: Falhas consecutivas que abrem o circuito
+            open_timeout: Tempo em segundos que o circuito permanece aberto
+        """
+        self.name = name
+        self.base_delay = base_delay
+        self.max_delay = max(base_delay, max_delay)
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_timeout = open_timeout
+
+        self.state = STATE_CLOSED
+        self.attempts = 0
+        self.total_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_failure_at: Optional[float] = None
+        self.last_success_at: Optional[float] = None
+        self.next_retry_at = 0.0
+        self._last_delay = base_delay
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, name: str, config: Dict[str, Any]) -> "ReconnectPolicy":
+        """
+        Cria a política a partir da seção rabbitmq.reconnect da configuração
+
+        Args:
+            name: Nome da conexão controlada
+            config: Dicionário de configuração
+        """
+        return cls(
+            name,
+            base_delay=float(config.get("base_delay", 1.0)),
+            max_delay=float(config.get("max_delay", 60.0)),
+            failure_threshold=int(config.get("failure_threshold", 5)),
+            open_timeout=float(config.get("open_timeout", 120.0))
+        )
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """Retorna quantos segundos faltam para a próxima tentativa permitida"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return max(0.0, self.next_retry_at - now)
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        """
+        Indica se uma tentativa de conexão pode ser feita agora
+
+        Com o circuito aberto, libera uma única tentativa (meio-aberto) após open_timeout.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if now < self.next_retry_at:
+                return False
+            if self.state == STATE_OPEN:
+                self.state = STATE_HALF_OPEN
+            return True
+
+    def record_success(self) -> None:
+        """Registra uma conexão bem-sucedida e fecha o circuito"""
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.attempts = 0
+            self.next_retry_at = 0.0
+            self._last_delay = self.base_delay
+            self.last_success_at = time.time()
+
+    def record_failure(self, error: Any = None) -> float:
+        """
+        Registra uma falha e agenda a próxima tentativa
+
+        Args:
+            error: Exceção ou mensagem da falha
+
+        Returns:
+            Espera em segundos até a próxima tentativa
+        """
+        now = time.time()
+        with self._lock:
+            self.attempts += 1
+            self.total_failures += 1
+            self.last_failure_at = now
+            if error is not None:
+                # Algumas exceções do pika não têm mensagem; usa o nome da classe nesse caso
+                self.last_error = str(error) or type(error).__name__
+
+            # Jitter descorrelacionado: espera aleatória entre a base e o triplo da anterior
+            delay = min(self.max_delay, random.uniform(self.base_delay, self._last_delay * 3))
+            self._last_delay = delay
+
+            if self.state == STATE_HALF_OPEN or self.attempts >= self.failure_threshold:
+                self.state = STATE_OPEN
+                delay = max(delay, self.open_timeout * random.uniform(0.8, 1.2))
+
+            self.next_retry_at = now + delay
+            return delay
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna o estado atual para as métricas do próprio agente"""
+        now = time.time()
+        with self._lock:
+            return {
+                "state": self.state,
+                "attempts": self.attempts,
+                "total_failures": self.total_failures,
+                "next_retry_in": round(max(0.0, self.next_retry_at - now), 2),
+                "last_error": self.last_error,
+                "last_failure_at": self.last_failure_at,
+                "last_success_at": self.last_success_at
+            }
@@ -0,0 +1,319 @@
+"""
+psutil falso e determinístico para os benchmarks dos coletores
+Gera uma única vez, a partir de uma semente, processos, sockets, discos, interfaces
+e sensores na quantidade pedida e expõe as mesmas funções e estruturas usadas pelo
+agente, para que os coletores possam ser medidos sem depender da máquina
+"""
+
+import time
+import contextlib
+import socket
+import random
+from collections import namedtuple
+from typing import Dict, Any, List, Optional
+
+# Estruturas com os mesmos campos das do psutil
+scputimes = namedtuple("scputimes", ["user", "nice", "system", "idle", "iowait"])
+svmem = namedtuple("svmem", ["total", "available", "percent", "used", "free"])
+sswap = namedtuple("sswap", ["total", "used", "free", "percent", "sin", "sout"])
+sdiskpart = namedtuple("sdiskpart", ["device", "mountpoint", "fstype", "opts"])
+sdiskusage = namedtuple("sdiskusage", ["total", "used", "free", "percent"])
+sdiskio = namedtuple("sdiskio", ["read_count", "write_count", "read_bytes", "write_bytes", "read_time", "write_time"])
+snetio = namedtuple("snetio", ["bytes_sent", "bytes_recv", "packets_sent", "packets_recv", "errin", "errout", "dropin", "dropout"])
+snicaddr = namedtuple("snicaddr", ["family", "address", "netmask", "broadcast", "ptp"])
+addr = namedtuple("addr", ["ip", "port"])
+sconn = namedtuple("sconn", ["fd", "family", "type", "laddr", "raddr", "status", "pid"])
+shwtemp = namedtuple("shwtemp", ["label", "current", "high", "critical"])
+pmem = namedtuple("pmem", ["rss", "vms"])
+
+STATUS_RUNNING = "running"
+STATUS_SLEEPING = "sleeping"
+STATUS_STOPPED = "stopped"
+STATUS_ZOMBIE = "zombie"
+STATUS_IDLE = "idle"
+
+AF_LINK = getattr(socket, "AF_PACKET", 17)
+
+# Distribuições usadas na geração (proporções aproximadas de um servidor comum)
+_STATUS_WEIGHTS = ((STATUS_SLEEPING, 80), (STATUS_IDLE, 12), (STATUS_RUNNING, 5), (STATUS_STOPPED, 2), (STATUS_ZOMBIE, 1))
+_CONN_WEIGHTS = (("ESTABLISHED", 55), ("LISTEN", 10), ("TIME_WAIT", 25), ("CLOSE_WAIT", 5), ("SYN_SENT", 3), ("FIN_WAIT2", 2))
+_PROCESS_NAMES = (
+    "systemd", "kworker/0:1", "sshd", "bash", "python3", "nginx", "postgres", "rabbitmq-server",
+    "containerd", "dockerd", "kubelet", "node", "java", "chrome", "code", "cron", "rsyslogd", "dbus-daemon"
+)
+_USERNAMES = ("root", "www-data", "postgres", "rabbitmq", "user", None)
+
+GB = 1024 ** 3
+
+
+class Error(Exception):
+    """Base das exceções do psutil"""
+
+
+class NoSuchProcess(Error):
+    def __init__(self, pid: int, name: Optional[str] = None, msg: Optional[str] = None):
+        super().__init__(msg or f"process no longer exists (pid={pid})")
+        self.pid = pid
+        self.name = name
+
+
+class ZombieProcess(NoSuchProcess):
+    pass
+
+
+class AccessDenied(Error):
+    def __init__(self, pid: Optional[int] = None, name: Optional[str] = None, msg: Optional[str] = None):
+        super().__init__(msg or f"access denied (pid={pid})")
+        self.pid = pid
+        self.name = name
+
+
+class FakeProcess:
+    """Processo falso com a interface de psutil.Process usada pelo agente"""
+
+    def __init__(self, owner: "FakePsutil", fields: Dict[str, Any]):
+        self._owner = owner
+        self._fields = fields
+        self.pid = fields["pid"]
+        self.info: Dict[str, Any] = {}
+
+    def name(self) -> str:
+        return self._fields["name"]
+
+    def status(self) -> str:
+        return self._fields["status"]
+
+    def cmdline(self) -> List[str]:
+        return list(self._fields["cmdline"])
+
+    def username(self) -> str:
+        if self._fields["username"] is None:
+            raise AccessDenied(self.pid, self._fields["name"])
+        return self._fields["username"]
+
+    def cpu_percent(self, interval: Optional[float] = None) -> float:
+        self._owner._block(interval)
+        return self._fields["cpu_percent"]
+
+    def memory_percent(self) -> float:
+        return self._fields["memory_percent"]
+
+    def create_time(self) -> float:
+        return self._fields["create_time"]
+
+    def memory_info(self) -> pmem:
+        return pmem(self._fields["rss"], self._fields["rss"] * 3)
+
+    def is_running(self) -> bool:
+        return self.pid in self._owner._processes
+
+    def oneshot(self):
+        return contextlib.nullcontext()
+
+
+class FakePsutil:
+    """Substituto do módulo psutil com dados sintéticos e reprodutíveis"""
+
+    Error = Error
+    NoSuchProcess = NoSuchProcess
+    ZombieProcess = ZombieProcess
+    AccessDenied = AccessDenied
+    STATUS_RUNNING = STATUS_RUNNING
+    STATUS_SLEEPING = STATUS_SLEEPING
+    STATUS_STOPPED = STATUS_STOPPED
+    STATUS_ZOMBIE = STATUS_ZOMBIE
+    STATUS_IDLE = STATUS_IDLE
+    AF_LINK = AF_LINK
+
+    def __init__(self, processes: int = 200, sockets: int = 500, disks: int = 4, interfaces: int = 4,
+                 cpus: int = 8, sensors: int = 4, seed: int = 0, honor_intervals: bool = False):
+        """
+        Gera os dados sintéticos
+
+        Args:
+            processes: Quantidade de processos em process_iter
+            sockets: Quantidade de conexões em net_connections
+            disks: Quantidade de partitions/discos
+            interfaces: Quantidade de interfaces de rede (além de lo e de uma veth ignorada)
+            cpus: Quantidade de CPUs lógicas
+            sensors: Quantidade de sensores de temperatura
+            seed: Semente do gerador; a mesma semente produz sempre os mesmos dados
+            honor_intervals: Se True, as janelas de amostragem (interval) dormem como no psutil real
+        """
+        self.counts = {
+            "processes": processes,
+            "sockets": sockets,
+            "disks": disks,
+            "interfaces": interfaces,
+            "cpus": cpus,
+            "sensors": sensors
+        }
+        self.honor_intervals = honor_intervals
+        rng = random.Random(seed)
+
+        self._cpu_percents = [round(rng.uniform(0, 100), 1) for _ in range(cpus)]
+        self._processes = self._generate_processes(rng, processes)
+        # Processos que "terminam" entre a listagem e a consulta por pid, como acontece na prática
+        self._vanished = {pid for pid in self._processes if rng.random() < 0.01}
+        self._connections = self._generate_connections(rng, sockets)
+        self._partitions, self._disk_io = self._generate_disks(rng, disks)
+        self._if_addrs, self._net_io = self._generate_interfaces(rng, interfaces)
+        self._temperatures = {
+            "coretemp": [
+                shwtemp(f"Core {i}" if i else "Package id 0", round(rng.uniform(35, 80), 1), 82.0, 100.0)
+                for i in range(sensors)
+            ]
+        } if sensors else {}
+
+    # Geração ---------------------------------------------------------------
+
+    @staticmethod
+    def _weighted(rng: random.Random, weights) -> str:
+        values, cum = zip(*weights)
+        return rng.choices(values, weights=cum)[0]
+
+    def _generate_processes(self, rng: random.Random, count: int) -> Dict[int, Dict[str, Any]]:
+        processes = {}
+        pid = 1
+        for i in range(count):
+            name = _PROCESS_NAMES[i % len(_PROCESS_NAMES)] if i < len(_PROCESS_NAMES) else rng.choice(_PROCESS_NAMES)
+            processes[pid] = {
+                "pid": pid,
+                "name": name,
+                "username": rng.choice(_USERNAMES),
+                "status": self._weighted(rng, _STATUS_WEIGHTS),
+                "cpu_percent": round(rng.expovariate(1 / 2.0), 1),
+                "memory_percent": round(rng.expovariate(1 / 0.5), 3),
+                "rss": rng.randint(1, 512) * 1024 * 1024,
+                "create_time": 1700000000.0 + pid,
+                "cmdline": [f"/usr/bin/{name}", f"--worker={i}"]
+            }
+            pid += rng.randint(1, 7)
+        return processes
+
+    def _generate_connections(self, rng: random.Random, count: int) -> List[sconn]:
+        connections = []
+        for i in range(count):
+            status = self._weighted(rng, _CONN_WEIGHTS)
+            laddr = addr(f"10.0.{(i >> 8) & 255}.{i & 255}", rng.randint(1024, 65535))
+            raddr = addr(f"203.0.113.{rng.randint(1, 254)}", rng.choice((80, 443, 5432, 5672))) if status != "LISTEN" else ()
+            connections.append(sconn(-1, socket.AF_INET, socket.SOCK_STREAM, laddr, raddr, status, None))
+        return connections
+
+    def _generate_disks(self, rng: random.Random, count: int):
+        partitions = []
+        io = {}
+        for i in range(count):
+            device = f"/dev/sd{chr(ord('a') + i % 26)}{i // 26 + 1}"
+            mountpoint = "/" if i == 0 else f"/mnt/data{i}"
+            partitions.append(sdiskpart(device, mountpoint, "ext4", "rw,relatime"))
+            io[device.rsplit("/", 1)[1]] = sdiskio(
+                rng.randint(10**5, 10**7), rng.randint(10**5, 10**7),
+                rng.randint(10**9, 10**12), rng.randint(10**9, 10**12),
+                rng.randint(10**4, 10**7), rng.randint(10**4, 10**7)
+            )
+        return partitions, io
+
+    def _generate_interfaces(self, rng: random.Random, count: int):
+        names = ["lo"] + [f"eth{i}" for i in range(count)] + ["veth0a1b2c"]
+        if_addrs = {}
+        net_io = {}
+        for i, name in enumerate(names):
+            mac = ":".join(f"{rng.randint(0, 255):02x}" for _ in range(6))
+            if name == "lo":
+                ipv4, ipv6 = "127.0.0.1", "::1"
+            else:
+                ipv4, ipv6 = f"192.168.{i}.{rng.randint(2, 254)}", f"fe80::{rng.randint(1, 0xffff):x}:{i:x}"
+            if_addrs[name] = [
+                snicaddr(socket.AF_INET, ipv4, "255.255.255.0", None if name == "lo" else f"192.168.{i}.255", None),
+                snicaddr(socket.AF_INET6, ipv6, "ffff:ffff:ffff:ffff::", None, None),
+                snicaddr(AF_LINK, mac, None, "ff:ff:ff:ff:ff:ff", None)
+            ]
+            net_io[name] = snetio(
+                rng.randint(10**6, 10**12), rng.randint(10**6, 10**12),
+                rng.randint(10**3, 10**9), rng.randint(10**3, 10**9),
+                0, 0, rng.randint(0, 100), 0
+            )
+        return if_addrs, net_io
+
+    def _block(self, interval: Optional[float]) -> None:
+        if self.honor_intervals and interval:
+            time.sleep(interval)
+
+    # API do psutil ---------------------------------------------------------
+
+    def cpu_percent(self, interval: Optional[float] = None, percpu: bool = False):
+        self._block(interval)
+        if percpu:
+            return list(self._cpu_percents)
+        return round(sum(self._cpu_percents) / len(self._cpu_percents), 1)
+
+    def cpu_count(self, logical: bool = True) -> int:
+        return self.counts["cpus"]
+
+    def cpu_times(self, percpu: bool = False):
+        total = scputimes(123456.7, 12.3, 23456.7, 987654.3, 345.6)
+        if percpu:
+            return [total] * self.counts["cpus"]
+        return total
+
+    def getloadavg(self):
+        return (0.52, 0.61, 0.58)
+
+    def virtual_memory(self) -> svmem:
+        total = 32 * GB
+        available = 19 * GB
+        return svmem(total, available, round((total - available) / total * 100, 1), total - available, 4 * GB)
+
+    def swap_memory(self) -> sswap:
+        return sswap(8 * GB, GB, 7 * GB, 12.5, 0, 0)
+
+    def disk_partitions(self, all: bool = False) -> List[sdiskpart]:
+        return list(self._partitions)
+
+    def disk_usage(self, path: str) -> sdiskusage:
+        for partition in self._partitions:
+            if partition.mountpoint == path:
+                return sdiskusage(500 * GB, 210 * GB, 290 * GB, 42.0)
+        raise FileNotFoundError(path)
+
+    def disk_io_counters(self, perdisk: bool = False):
+        if perdisk:
+            return dict(self._disk_io)
+        return sdiskio(*(sum(values) for values in zip(*self._disk_io.values())))
+
+    def net_io_counters(self, pernic: bool = False):
+        if pernic:
+            return dict(self._net_io)
+        return snetio(*(sum(values) for values in zip(*self._net_io.values())))
+
+    def net_if_addrs(self) -> Dict[str, List[snicaddr]]:
+        return {name: list(addrs) for name, addrs in self._if_addrs.items()}
+
+    def net_connections(self, kind: str = "inet") -> List[sconn]:
+        return list(self._connections)
+
+    def sensors_temperatures(self, fahrenheit: bool = False) -> Dict[str, List[shwtemp]]:
+        return {name: list(entries) for name, entries in self._temperatures.items()}
+
+    def pids(self) -> List[int]:
+        return list(self._processes)
+
+    def process_iter(self, attrs: Optional[List[str]] = None, ad_value: Any = None):
+        for fields in self._processes.values():
+            proc = FakeProcess(self, fields)
+            if attrs:
+                info = {}
+                for attr in attrs:
+                    try:
+                        info[attr] = getattr(proc, attr)() if attr != "pid" else proc.pid
+                    except AccessDenied:
+                        info[attr] = ad_value
+                proc.info = info
+            yield proc
+
+    def Process(self, pid: Optional[int] = None) -> FakeProcess:
+        fields = self._processes.get(pid)
+        if fields is None or pid in self._vanished:
+            raise NoSuchProcess(pid)
+        return FakeProcess(self, fields)
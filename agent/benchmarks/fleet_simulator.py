@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+"""
+Simulador de frota para teste de carga da ingestão
+Simula N hosts virtuais em um único processo (asyncio), cada um com sua fase no
+intervalo de coleta, publicando payloads no formato real do agente (montados
+por MonitoringAgent.build_payload sobre um modelo coletado com o psutil falso)
+e com métricas que evoluem a cada ciclo. Relata a taxa de publicação obtida, a
+latência de confirmação do broker e o atraso fim a fim até o consumidor
+
+O atraso fim a fim é estimado pela profundidade da fila de dados: como ela é FIFO,
+a mensagem mais antiga ainda na fila é a de número (publicadas - profundidade), e
+a idade dela é o tempo que uma amostra espera até o consumer.js (process_agent_data)
+confirmá-la. Use um broker isolado; outros publicadores na mesma fila distorcem a conta.
+
+Uso, a partir de agent/, contra um broker local:
+    docker run -d --rm -p 5672:5672 rabbitmq:3-management-alpine
+    python benchmarks/fleet_simulator.py --hosts 5000 --interval 10 --duration 300
+    python benchmarks/fleet_simulator.py --hosts 5000 --dry-run   # só a capacidade do gerador
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import shutil
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import pika
+
+from run_benchmarks import SCENARIOS, create_agent
+from fake_psutil import FakePsutil
+from scheduling import TickScheduler, phase_offset
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil por ordenação (amostras de uma janela de relatório)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def build_template(profile: str, seed: int):
+    """
+    Coleta uma vez as métricas de um host simulado para servir de modelo
+
+    Args:
+        profile: Cenário de run_benchmarks.SCENARIOS (tamanho do host)
+        seed: Semente do psutil falso
+
+    Returns:
+        Tupla (classe MonitoringAgent, métricas, agent_stats)
+    """
+    fake = FakePsutil(seed=seed, **SCENARIOS[profile])
+    workdir = tempfile.mkdtemp(prefix="agent-fleet-")
+    agent = None
+    try:
+        agent = create_agent("agent", fake, workdir)
+        return type(agent), agent.collect_metrics(), agent.get_agent_stats()
+    finally:
+        if agent is not None:
+            agent.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class VirtualHost:
+    """Host simulado: identidade, fase no intervalo e estado das métricas que evoluem"""
+
+    def __init__(self, index: int, prefix: str, interval: float, template: Dict[str, Any],
+                 agent_stats: Dict[str, Any], seed: int):
+        self.hostname = f"{prefix}-{index:05d}"
+        self.scheduler = TickScheduler(interval, phase_offset(self.hostname, interval))
+        self.private_ip = f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+        self.public_ip = f"198.51.100.{index % 254 + 1}"
+        self.asn_info = {
+            "asn": "AS64500",
+            "organization": "Simulated Network",
+            "country": "BR",
+            "region": "Unknown",
+            "city": "Unknown"
+        }
+        # Sem regras locais: os payloads simulados seguem para a avaliação de alertas do backend
+        self.alert_evaluator = None
+        self._template = template
+        self._agent_stats = agent_stats
+        self._rng = random.Random(seed * 1000003 + index)
+
+        # Cada host tem seu próprio nível de carga, para onde as métricas tendem a voltar
+        self.cpu_base = self._rng.uniform(2, 60)
+        self.cpu = self.cpu_base
+        self.memory_base = self._rng.uniform(20, 85)
+        self.memory = self.memory_base
+        self.disk_fill = self._rng.uniform(10, 80)
+        self.net_rate = self._rng.uniform(1e3, 5e6)
+        self.disk_rate = self._rng.uniform(1e3, 2e6)
+        self.elapsed = 0.0
+
+    def get_agent_stats(self) -> Dict[str, Any]:
+        """Mesmo formato de MonitoringAgent.get_agent_stats, com a agenda do host simulado"""
+        stats = dict(self._agent_stats)
+        stats["schedule"] = {
+            "interval": self.scheduler.interval,
+            "phase": round(self.scheduler.phase, 3),
+            "missed_ticks": self.scheduler.missed_ticks
+        }
+        return stats
+
+    def _walk(self, value: float, base: float, sigma: float, spike: float = 0.0) -> float:
+        """Passeio aleatório com retorno à média e picos ocasionais, limitado a [0, 100]"""
+        value += self._rng.gauss(0, sigma) + 0.2 * (base - value)
+        if spike and self._rng.random() < 0.02:
+            value += spike
+        return min(100.0, max(0.0, value))
+
+    def next_metrics(self, interval: float) -> Dict[str, Any]:
+        """
+        Avança o estado do host em um ciclo e retorna as seções de métricas
+
+        As seções que não mudam de um ciclo para outro (temperatura, processos,
+        NoIP) são reaproveitadas do modelo sem cópia.
+        """
+        self.elapsed += interval
+        self.cpu = self._walk(self.cpu, self.cpu_base, 5.0, spike=40.0)
+        self.memory = self._walk(self.memory, self.memory_base, 1.0)
+        self.disk_fill = min(99.0, self.disk_fill + self._rng.uniform(0, 0.001))
+
+        metrics = dict(self._template)
+        rng = self._rng
+
+        cpu = self._template.get("cpu")
+        if cpu:
+            cpu = dict(cpu, percent=round(self.cpu, 1))
+            if "per_cpu_percent" in cpu:
+                cpu["per_cpu_percent"] = [
+                    round(min(100.0, max(0.0, self.cpu + rng.gauss(0, 8))), 1) for _ in cpu["per_cpu_percent"]
+                ]
+            if "load_avg" in cpu:
+                load = self.cpu / 100 * len(cpu.get("per_cpu_percent", [0]))
+                cpu["load_avg"] = {"1min": round(load, 2), "5min": round(load * 0.9, 2), "15min": round(load * 0.8, 2)}
+            metrics["cpu"] = cpu
+
+        memory = self._template.get("memory")
+        if memory:
+            used = round(memory["total_gb"] * self.memory / 100, 2)
+            metrics["memory"] = dict(memory, percent=round(self.memory, 1), used_gb=used,
+                                     free_gb=round(memory["total_gb"] - used, 2))
+
+        disk = self._template.get("disk")
+        if disk:
+            partitions = []
+            for partition in disk.get("partitions", []):
+                used = round(partition["total_gb"] * self.disk_fill / 100, 2)
+                partitions.append(dict(partition, percent=round(self.disk_fill, 1), used_gb=used,
+                                       free_gb=round(partition["total_gb"] - used, 2)))
+            disk = dict(disk, partitions=partitions)
+            if "io_counters" in disk:
+                grown = int(self.disk_rate * self.elapsed)
+                disk["io_counters"] = {
+                    name: dict(counters, read_bytes=counters["read_bytes"] + grown,
+                               write_bytes=counters["write_bytes"] + grown // 2,
+                               read_count=counters["read_count"] + grown // 4096,
+                               write_count=counters["write_count"] + grown // 8192)
+                    for name, counters in disk["io_counters"].items()
+                }
+            metrics["disk"] = disk
+
+        network = self._template.get("network")
+        if network and "io_counters" in network:
+            grown = int(self.net_rate * self.elapsed)
+            metrics["network"] = dict(network, io_counters={
+                name: dict(counters, bytes_sent=counters["bytes_sent"] + grown,
+                           bytes_recv=counters["bytes_recv"] + grown * 3,
+                           packets_sent=counters["packets_sent"] + grown // 1200,
+                           packets_recv=counters["packets_recv"] + grown // 400)
+                for name, counters in network["io_counters"].items()
+            })
+
+        return metrics
+
+
+class Publisher:
+    """Conexão AMQP própria executada em uma thread dedicada (o pika não é thread-safe)"""
+
+    def __init__(self, parameters: Optional[pika.ConnectionParameters], queue: str, confirm: bool):
+        self.parameters = parameters
+        self.queue = queue
+        self.confirm = confirm
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fleet-publisher")
+        self._connection = None
+        self._channel = None
+
+    def _ensure_channel(self):
+        if self._channel is not None and self._channel.is_open:
+            return self._channel
+        self.close()
+        self._connection = pika.BlockingConnection(self.parameters)
+        channel = self._connection.channel()
+        channel.queue_declare(queue=self.queue, durable=True)
+        if self.confirm:
+            channel.confirm_delivery()
+        self._channel = channel
+        return channel
+
+    def publish(self, body: str) -> float:
+        """
+        Publica uma mensagem (na thread do publicador)
+
+        Returns:
+            Latência em segundos até o broker aceitar (confirmar, com publisher confirms)
+        """
+        started = time.perf_counter()
+        if self.parameters is None:
+            return time.perf_counter() - started
+        try:
+            self._ensure_channel().basic_publish(
+                exchange='',
+                routing_key=self.queue,
+                body=body,
+                properties=pika.BasicProperties(delivery_mode=2, content_type='application/json')
+            )
+        except Exception:
+            self.close()
+            raise
+        return time.perf_counter() - started
+
+    def close(self) -> None:
+        connection, self._connection, self._channel = self._connection, None, None
+        if connection is not None:
+            try:
+                if connection.is_open:
+                    connection.close()
+            except Exception:
+                pass
+
+
+class QueueProbe:
+    """Consulta passiva da profundidade da fila de dados, em conexão própria"""
+
+    def __init__(self, parameters: pika.ConnectionParameters, queue: str):
+        self.parameters = parameters
+        self.queue = queue
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fleet-probe")
+        self._connection = None
+        self._channel = None
+
+    def depth(self) -> Optional[Dict[str, int]]:
+        """Retorna {messages, consumers} da fila ou None em caso de erro"""
+        try:
+            if self._channel is None or not self._channel.is_open:
+                self.close()
+                self._connection = pika.BlockingConnection(self.parameters)
+                self._channel = self._connection.channel()
+            frame = self._channel.queue_declare(queue=self.queue, passive=True)
+            return {"messages": frame.method.message_count, "consumers": frame.method.consumer_count}
+        except Exception:
+            self.close()
+            return None
+
+    def close(self) -> None:
+        connection, self._connection, self._channel = self._connection, None, None
+        if connection is not None:
+            try:
+                if connection.is_open:
+                    connection.close()
+            except Exception:
+                pass
+
+
+class FleetStats:
+    """Contadores da simulação; atualizados apenas na thread do event loop"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.published = 0
+        self.failures = 0
+        self.bytes = 0
+        # Instante de confirmação de cada mensagem publicada, na ordem de publicação
+        self.publish_times = array('d')
+        self.initial_depth: Optional[int] = None
+        self.window_started = time.time()
+        self.window_published = 0
+        self.window_bytes = 0
+        self.window_latencies: List[float] = []
+        self.window_delays: List[float] = []
+        self.latencies: List[float] = []
+        self.delays: List[float] = []
+        self.last_consumed: Optional[int] = None
+        self.last_probe_at: Optional[float] = None
+
+    def record(self, body_bytes: int, latency: float, delay: float) -> None:
+        self.published += 1
+        self.bytes += body_bytes
+        self.publish_times.append(time.time())
+        self.window_published += 1
+        self.window_bytes += body_bytes
+        self.window_latencies.append(latency)
+        self.window_delays.append(delay)
+
+    def end_to_end(self, depth: Optional[Dict[str, int]], now: float) -> Dict[str, Any]:
+        """Estima consumo e atraso fim a fim a partir da profundidade da fila"""
+        if depth is None:
+            return {"queue_depth": None}
+        if self.initial_depth is None:
+            self.initial_depth = depth["messages"]
+        backlog = max(0, depth["messages"] - self.initial_depth)
+        consumed = max(0, self.published - backlog)
+        oldest = self.publish_times[consumed] if consumed < len(self.publish_times) else None
+
+        consume_rate = None
+        if self.last_consumed is not None and self.last_probe_at and now > self.last_probe_at:
+            consume_rate = round((consumed - self.last_consumed) / (now - self.last_probe_at), 1)
+        self.last_consumed, self.last_probe_at = consumed, now
+
+        return {
+            "queue_depth": depth["messages"],
+            "consumers": depth["consumers"],
+            "consumed": consumed,
+            "consume_rate": consume_rate,
+            "lag_s": round(now - oldest, 3) if oldest is not None else 0.0
+        }
+
+    def window_report(self, now: float) -> Dict[str, Any]:
+        """Fecha a janela de relatório atual e retorna seus números"""
+        span = max(1e-9, now - self.window_started)
+        report = {
+            "elapsed_s": round(now - self.started_at, 1),
+            "publish_rate": round(self.window_published / span, 1),
+            "mb_per_s": round(self.window_bytes / span / 1024**2, 3),
+            "broker_latency_ms": {
+                "p50": round(percentile(self.window_latencies, 0.50) * 1000, 2),
+                "p95": round(percentile(self.window_latencies, 0.95) * 1000, 2),
+                "p99": round(percentile(self.window_latencies, 0.99) * 1000, 2),
+                "max": round(max(self.window_latencies, default=0.0) * 1000, 2)
+            },
+            "schedule_delay_ms_p95": round(percentile(self.window_delays, 0.95) * 1000, 2),
+            "published": self.published,
+            "failures": self.failures
+        }
+        self.latencies.extend(self.window_latencies)
+        self.delays.extend(self.window_delays)
+        self.window_started = now
+        self.window_published = 0
+        self.window_bytes = 0
+        self.window_latencies = []
+        self.window_delays = []
+        return report
+
+
+async def host_loop(host: VirtualHost, agent_class, outbox: asyncio.Queue, interval: float) -> None:
+    """Ciclo de um host virtual: aguarda o deadline da sua fase, monta o payload e o enfileira"""
+    deadline = host.scheduler.next_deadline()
+    while True:
+        await asyncio.sleep(max(0.0, deadline - time.time()))
+        payload = agent_class.build_payload(host, host.next_metrics(interval))
+        await outbox.put((deadline, json.dumps(payload)))
+        deadline = host.scheduler.advance(deadline)
+
+
+async def publisher_loop(publisher: Publisher, outbox: asyncio.Queue, stats: FleetStats) -> None:
+    """Retira payloads da fila interna e os publica na thread do publicador"""
+    loop = asyncio.get_running_loop()
+    while True:
+        deadline, body = await outbox.get()
+        try:
+            latency = await loop.run_in_executor(publisher.executor, publisher.publish, body)
+            stats.record(len(body), latency, time.time() - deadline - latency)
+        except Exception as e:
+            stats.failures += 1
+            if stats.failures <= 5 or stats.failures % 1000 == 0:
+                print(f"Falha ao publicar ({stats.failures}): {e}", file=sys.stderr)
+            # Evita rodar em falso enquanto o broker está fora
+            await asyncio.sleep(1.0)
+        finally:
+            outbox.task_done()
+
+
+def _print_window(report: Dict[str, Any], lag: Dict[str, Any], target_rate: float) -> None:
+    latency = report["broker_latency_ms"]
+    line = (f"[{report['elapsed_s']:>7.1f}s] publicadas {report['publish_rate']:>8.1f}/s "
+            f"(alvo {target_rate:.1f}/s, {report['mb_per_s']:.2f} MB/s) | broker p50 {latency['p50']}ms "
+            f"p95 {latency['p95']}ms p99 {latency['p99']}ms | atraso agenda p95 {report['schedule_delay_ms_p95']}ms "
+            f"| falhas {report['failures']}")
+    if lag.get("queue_depth") is not None:
+        line += (f" | fila {lag['queue_depth']} ({lag['consumers']} consumidores, "
+                 f"{lag['consume_rate'] if lag['consume_rate'] is not None else '-'}/s) "
+                 f"| atraso fim a fim {lag['lag_s']}s")
+    print(line, flush=True)
+
+
+async def simulate(args: argparse.Namespace) -> Dict[str, Any]:
+    """Executa a simulação e retorna o resumo final"""
+    agent_class, template, agent_stats = build_template(args.profile, args.seed)
+    hosts = [
+        VirtualHost(i, args.prefix, args.interval, template, agent_stats, args.seed)
+        for i in range(args.hosts)
+    ]
+    sample_bytes = len(json.dumps(agent_class.build_payload(hosts[0], hosts[0].next_metrics(0))))
+    target_rate = args.hosts / args.interval
+    print(f"{args.hosts} hosts, intervalo {args.interval}s: alvo de {target_rate:.1f} mensagens/s "
+          f"de ~{sample_bytes} bytes ({target_rate * sample_bytes / 1024**2:.2f} MB/s)", flush=True)
+
+    parameters = None
+    if not args.dry_run:
+        parameters = pika.ConnectionParameters(
+            host=args.host,
+            port=args.port,
+            virtual_host=args.vhost,
+            credentials=pika.PlainCredentials(args.user, args.password),
+            heartbeat=600,
+            blocked_connection_timeout=300
+        )
+
+    stats = FleetStats()
+    outbox: asyncio.Queue = asyncio.Queue(maxsize=max(1, args.hosts))
+    publishers = [Publisher(parameters, args.queue, not args.no_confirm) for _ in range(max(1, args.connections))]
+    probe = QueueProbe(parameters, args.queue) if parameters and not args.no_lag else None
+    loop = asyncio.get_running_loop()
+
+    async def probe_depth() -> Dict[str, Any]:
+        if probe is None:
+            return {"queue_depth": None}
+        depth = await loop.run_in_executor(probe.executor, probe.depth)
+        return stats.end_to_end(depth, time.time())
+
+    await probe_depth()  # Profundidade inicial, descontada das contas de consumo
+    tasks = [asyncio.create_task(publisher_loop(p, outbox, stats)) for p in publishers]
+    tasks += [asyncio.create_task(host_loop(h, agent_class, outbox, args.interval)) for h in hosts]
+
+    lag: Dict[str, Any] = {"queue_depth": None}
+    try:
+        ends_at = time.time() + args.duration
+        while time.time() < ends_at:
+            await asyncio.sleep(min(args.report_every, max(0.0, ends_at - time.time())))
+            lag = await probe_depth()
+            _print_window(stats.window_report(time.time()), lag, target_rate)
+
+        # Para de gerar e aguarda a fila interna esvaziar
+        for task in tasks[len(publishers):]:
+            task.cancel()
+        try:
+            await asyncio.wait_for(outbox.join(), timeout=args.drain_timeout)
+        except asyncio.TimeoutError:
+            print("Fila interna não esvaziou dentro do limite", file=sys.stderr)
+        stats.window_report(time.time())
+        published_for = time.time() - stats.started_at
+
+        # Aguarda o consumidor alcançar as mensagens publicadas
+        drain_started = time.time()
+        while probe is not None and time.time() - drain_started < args.drain_timeout:
+            lag = await probe_depth()
+            if lag.get("queue_depth") is None or lag["lag_s"] == 0.0:
+                break
+            await asyncio.sleep(1.0)
+        drain_time = time.time() - drain_started
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for publisher in publishers:
+            publisher.executor.submit(publisher.close)
+            publisher.executor.shutdown(wait=True)
+        if probe is not None:
+            probe.executor.submit(probe.close)
+            probe.executor.shutdown(wait=True)
+
+    return {
+        "hosts": args.hosts,
+        "interval": args.interval,
+        "target_rate": round(target_rate, 1),
+        "achieved_rate": round(stats.published / max(1e-9, published_for), 1),
+        "published": stats.published,
+        "failures": stats.failures,
+        "payload_bytes_avg": round(stats.bytes / max(1, stats.published)),
+        "broker_latency_ms": {
+            "p50": round(percentile(stats.latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(stats.latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(stats.latencies, 0.99) * 1000, 2),
+            "max": round(max(stats.latencies, default=0.0) * 1000, 2)
+        },
+        "schedule_delay_ms_p95": round(percentile(stats.delays, 0.95) * 1000, 2),
+        "end_to_end": dict(lag, drain_time_s=round(drain_time, 1)) if probe is not None else None
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Simulador de frota para teste de carga da ingestão")
+    parser.add_argument("--hosts", type=int, default=1000, help="Hosts virtuais simulados")
+    parser.add_argument("--interval", type=float, default=10, help="Intervalo de coleta de cada host (segundos)")
+    parser.add_argument("--duration", type=float, default=60, help="Duração da geração de carga (segundos)")
+    parser.add_argument("--profile", default="small", choices=sorted(SCENARIOS),
+                        help="Tamanho de cada host (cenários dos benchmarks)")
+    parser.add_argument("--prefix", default="sim-host", help="Prefixo dos hostnames simulados")
+    parser.add_argument("--seed", type=int, default=0, help="Semente das métricas simuladas")
+    parser.add_argument("--host", default=os.getenv("RABBITMQ_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("RABBITMQ_PORT", "5672")))
+    parser.add_argument("--user", default=os.getenv("RABBITMQ_USER", "guest"))
+    parser.add_argument("--password", default=os.getenv("RABBITMQ_PASSWORD", "guest"))
+    parser.add_argument("--vhost", default=os.getenv("RABBITMQ_VHOST", "/"))
+    parser.add_argument("--queue", default=os.getenv("RABBITMQ_QUEUE_DATA", "agent_data"))
+    parser.add_argument("--connections", type=int, default=8, help="Conexões de publicação simultâneas")
+    parser.add_argument("--no-confirm", action="store_true",
+                        help="Publica sem publisher confirms (latência medida só até o socket)")
+    parser.add_argument("--no-lag", action="store_true", help="Não consulta a profundidade da fila")
+    parser.add_argument("--dry-run", action="store_true", help="Monta e serializa os payloads sem publicar")
+    parser.add_argument("--report-every", type=float, default=10, help="Intervalo entre relatórios (segundos)")
+    parser.add_argument("--drain-timeout", type=float, default=60,
+                        help="Espera máxima pelo consumo das mensagens ao final (segundos)")
+    parser.add_argument("--json", action="store_true", help="Imprime o resumo final em JSON")
+    args = parser.parse_args()
+
+    try:
+        summary = asyncio.run(simulate(args))
+    except KeyboardInterrupt:
+        return 130
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        latency = summary["broker_latency_ms"]
+        print(f"\nResumo: {summary['published']} mensagens, {summary['achieved_rate']}/s "
+              f"(alvo {summary['target_rate']}/s), {summary['failures']} falhas, "
+              f"~{summary['payload_bytes_avg']} bytes/mensagem")
+        print(f"Latência do broker: p50 {latency['p50']}ms, p95 {latency['p95']}ms, "
+              f"p99 {latency['p99']}ms, máx {latency['max']}ms")
+        if summary["end_to_end"]:
+            e2e = summary["end_to_end"]
+            print(f"Fim a fim: fila {e2e.get('queue_depth')} mensagens, atraso {e2e.get('lag_s')}s, "
+                  f"{e2e.get('drain_time_s')}s para esvaziar após o fim da carga")
+    return 1 if summary["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
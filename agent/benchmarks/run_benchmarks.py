@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Benchmarks dos coletores do agente
+Executa cada coletor do MonitoringAgent e o ciclo completo (collect_and_send_data)
+contra um psutil falso e determinístico, medindo tempo de parede, tempo de CPU,
+pico de alocações e tamanho do payload. Falha (código de saída 1) quando algum
+número piora além da tolerância em relação às referências de baselines.json
+
+Tempos dependem da máquina: regrave as referências com --update-baselines na
+mesma máquina (ou runner de CI) em que a comparação será feita.
+
+Uso, a partir de agent/:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --scenario large --iterations 50
+    python benchmarks/run_benchmarks.py --update-baselines
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import importlib
+import statistics
+import tracemalloc
+from typing import Dict, Any, List, Callable, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, AGENT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import yaml  # noqa: E402
+
+from fake_psutil import FakePsutil  # noqa: E402
+
+BASELINES_PATH = os.path.join(BENCH_DIR, "baselines.json")
+
+# Tamanho do host simulado em cada cenário
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "small": {"processes": 100, "sockets": 200, "disks": 2, "interfaces": 2},
+    "medium": {"processes": 1000, "sockets": 5000, "disks": 8, "interfaces": 8},
+    "large": {"processes": 5000, "sockets": 50000, "disks": 32, "interfaces": 64}
+}
+
+# Módulos do agente que importam o psutil por conta própria e também recebem o falso
+PSUTIL_MODULES = ("proctable", "procmatch")
+
+METRICS = ("wall_ms", "cpu_ms", "alloc_peak_kb", "payload_bytes")
+
+# Piora relativa aceita por métrica, somada a uma folga absoluta que absorve o ruído de medidas pequenas
+TOLERANCES = {"wall_ms": 0.50, "cpu_ms": 0.50, "alloc_peak_kb": 0.25, "payload_bytes": 0.10}
+ABSOLUTE_SLACK = {"wall_ms": 2.0, "cpu_ms": 2.0, "alloc_peak_kb": 32.0, "payload_bytes": 512}
+
+# Configuração do agente nos benchmarks: tudo que depende de rede, systemctl ou disco fica desligado
+BENCH_CONFIG: Dict[str, Any] = {
+    "general": {
+        "hostname_override": "bench-host",
+        "collection_interval": 10,
+        "phase_spreading": True,
+        "log_level": "WARNING"
+    },
+    "rabbitmq": {"host": "127.0.0.1"},
+    # Fila em memória serializando em JSON, para que o custo de serialização entre no ciclo medido
+    "transport": {"type": "inprocess", "inprocess": {"max_messages": 16, "encoding": "json"}},
+    "metrics": {
+        "cpu": {"enabled": True, "collect_per_cpu": True, "collect_cpu_times": True, "collect_load_avg": True},
+        "memory": {"enabled": True, "collect_swap": True},
+        "disk": {"enabled": True, "paths": ["/"], "collect_io_counters": True, "ignore_mounts": []},
+        "network": {
+            "enabled": True,
+            "collect_io_counters": True,
+            "collect_connections": True,
+            "collect_interfaces": True,
+            "ignore_interfaces": ["lo", "docker0", "veth"]
+        },
+        "temperature": {"enabled": True, "collect_sensors": True},
+        "processes": {
+            "enabled": True,
+            "collect_top_processes": 10,
+            # Um processo presente e um ausente (o ausente percorre a tabela inteira)
+            "watch_processes": [{"name": "nginx"}, {"name": "noip-duc"}]
+        }
+    },
+    "network_info": {
+        "collect_public_ip": False,
+        "collect_private_ip": False,
+        "collect_asn_info": False,
+        "netlink_events": False,
+        "asn_database": {"enabled": False}
+    },
+    "http": {"enabled": False},
+    "noip_duc": {"enabled": True, "check_installed": False, "check_running": True, "check_service": False},
+    "services": {"watch": []},
+    "port_check": {"enabled": False},
+    "logging": {
+        "file": {"enabled": False},
+        "console": {"enabled": True},
+        "rate_limit": {"enabled": False}
+    }
+}
+
+
+def create_agent(agent_module: str, fake: FakePsutil, workdir: str):
+    """
+    Cria um MonitoringAgent com o psutil falso e o transporte em memória
+
+    Args:
+        agent_module: Módulo do agente (agent ou agent_windows)
+        fake: psutil falso usado pelos coletores
+        workdir: Diretório temporário para configuração e estado
+
+    Returns:
+        Agente pronto para coletar
+    """
+    config = json.loads(json.dumps(BENCH_CONFIG))
+    config["general"]["state_dir"] = os.path.join(workdir, "data")
+    config_path = os.path.join(workdir, "config.yaml")
+    with open(config_path, "w") as f:
+        yaml.safe_dump(config, f)
+
+    module = importlib.import_module(agent_module)
+    module.psutil = fake
+    # Módulos auxiliares que consultam o psutil durante os ciclos
+    for name in PSUTIL_MODULES:
+        importlib.import_module(name).psutil = fake
+    return module.MonitoringAgent(config_path)
+
+
+def measure(func: Callable[[], Any], iterations: int) -> Dict[str, float]:
+    """
+    Mede tempo de parede, tempo de CPU e pico de alocações de uma função
+
+    Os tempos são medianas das iterações; as alocações são medidas numa execução
+    separada sob o tracemalloc, que distorceria os tempos.
+
+    Args:
+        func: Função medida
+        iterations: Quantidade de execuções cronometradas
+
+    Returns:
+        Dicionário com wall_ms, cpu_ms e alloc_peak_kb
+    """
+    func()  # Aquecimento (caches, imports tardios)
+
+    walls, cpus = [], []
+    for _ in range(iterations):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        func()
+        cpus.append(time.process_time() - cpu_start)
+        walls.append(time.perf_counter() - wall_start)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_ms": round(statistics.median(walls) * 1000, 3),
+        "cpu_ms": round(statistics.median(cpus) * 1000, 3),
+        "alloc_peak_kb": round(max(0, peak - before) / 1024, 1)
+    }
+
+
+def run_scenario(name: str, agent_module: str, iterations: int, seed: int,
+                 honor_intervals: bool, only: Optional[List[str]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Executa os benchmarks de um cenário
+
+    Args:
+        name: Nome do cenário em SCENARIOS
+        agent_module: Módulo do agente
+        iterations: Execuções cronometradas por benchmark
+        seed: Semente do psutil falso
+        honor_intervals: Faz o psutil falso dormir nas janelas de amostragem
+        only: Restringe aos benchmarks informados (nomes de coletores e/ou "tick")
+
+    Returns:
+        Dicionário {benchmark: métricas}
+    """
+    fake = FakePsutil(seed=seed, honor_intervals=honor_intervals, **SCENARIOS[name])
+    workdir = tempfile.mkdtemp(prefix="agent-bench-")
+    agent = None
+    try:
+        agent = create_agent(agent_module, fake, workdir)
+        results: Dict[str, Dict[str, float]] = {}
+
+        for collector_name, collector in agent._enabled_collectors():
+            if only and collector_name not in only:
+                continue
+            result = measure(collector, iterations)
+            result["payload_bytes"] = len(json.dumps(collector()))
+            results[f"collector.{collector_name}"] = result
+
+        if not only or "tick" in only:
+            result = measure(agent.collect_and_send_data, iterations)
+            result["payload_bytes"] = agent.telemetry.last_payload_bytes
+            results["tick"] = result
+
+        return results
+    finally:
+        if agent is not None:
+            agent.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance_scale: float) -> List[Dict[str, Any]]:
+    """
+    Compara os resultados com as referências
+
+    Args:
+        results: Resultados de um cenário
+        baseline: Referências do mesmo cenário
+        tolerance_scale: Multiplicador das tolerâncias relativas
+
+    Returns:
+        Lista de regressões com benchmark, métrica, valor, referência e limite
+    """
+    regressions = []
+    for bench, metrics in results.items():
+        reference = baseline.get(bench)
+        if not reference:
+            continue
+        for metric in METRICS:
+            if metric not in metrics or metric not in reference:
+                continue
+            limit = reference[metric] * (1 + TOLERANCES[metric] * tolerance_scale) + ABSOLUTE_SLACK[metric]
+            if metrics[metric] > limit:
+                regressions.append({
+                    "benchmark": bench,
+                    "metric": metric,
+                    "value": metrics[metric],
+                    "baseline": reference[metric],
+                    "limit": round(limit, 3)
+                })
+    return regressions
+
+
+def _format_delta(value: float, reference: Optional[float]) -> str:
+    if not reference:
+        return f"{value:>10}"
+    delta = (value - reference) / reference * 100
+    return f"{value:>10} ({delta:+.0f}%)"
+
+
+def print_report(scenario: str, results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                 regressions: List[Dict[str, Any]]) -> None:
+    """Imprime a tabela de resultados de um cenário"""
+    counts = ", ".join(f"{key}={value}" for key, value in SCENARIOS[scenario].items())
+    print(f"\n== {scenario} ({counts})")
+    print(f"{'benchmark':<24}" + "".join(f"{metric:>20}" for metric in METRICS) + "  status")
+    failed = {(r["benchmark"], r["metric"]) for r in regressions}
+    for bench, metrics in results.items():
+        reference = baseline.get(bench, {})
+        cells = "".join(f"{_format_delta(metrics[m], reference.get(m)):>20}" for m in METRICS)
+        if not reference:
+            status = "novo"
+        elif any((bench, m) in failed for m in METRICS):
+            status = "REGRESSÃO"
+        else:
+            status = "ok"
+        print(f"{bench:<24}{cells}  {status}")
+
+
+def load_baselines() -> Dict[str, Any]:
+    """Carrega as referências guardadas (vazio se ainda não existem)"""
+    try:
+        with open(BASELINES_PATH) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"scenarios": {}}
+
+
+def save_baselines(baselines: Dict[str, Any], iterations: int) -> None:
+    """Grava as referências com a descrição da máquina em que foram medidas"""
+    baselines["generated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    baselines["python"] = platform.python_version()
+    baselines["platform"] = platform.platform()
+    baselines["iterations"] = iterations
+    with open(BASELINES_PATH, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks dos coletores do agente com psutil falso")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Cenário a executar (repetível; padrão: todos)")
+    parser.add_argument("--only", action="append",
+                        help="Benchmark a executar: nome do coletor (cpu, processes...) ou tick (repetível)")
+    parser.add_argument("--agent", default="agent", choices=("agent", "agent_windows"),
+                        help="Módulo do agente medido")
+    parser.add_argument("-n", "--iterations", type=int, default=20, help="Execuções cronometradas por benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Semente do psutil falso")
+    parser.add_argument("--honor-intervals", action="store_true",
+                        help="Dorme nas janelas de amostragem do psutil (cpu_percent(interval=...))")
+    parser.add_argument("--tolerance-scale", type=float, default=1.0,
+                        help="Multiplica as tolerâncias relativas (ex.: 2 em máquinas ruidosas)")
+    parser.add_argument("--update-baselines", action="store_true",
+                        help="Grava os resultados como novas referências em vez de comparar")
+    parser.add_argument("--json", action="store_true", help="Imprime os resultados em JSON")
+    args = parser.parse_args()
+
+    # O agente escreve caminhos relativos (logs, estado) a partir do diretório atual
+    os.chdir(AGENT_DIR)
+    logging.getLogger("MonitoringAgent").setLevel(logging.WARNING)
+
+    baselines = load_baselines()
+    scenarios = args.scenario or list(SCENARIOS)
+    all_results: Dict[str, Dict[str, Dict[str, float]]] = {}
+    all_regressions: Dict[str, List[Dict[str, Any]]] = {}
+
+    for scenario in scenarios:
+        results = run_scenario(scenario, args.agent, max(1, args.iterations), args.seed,
+                               args.honor_intervals, args.only)
+        all_results[scenario] = results
+        baseline = baselines.get("scenarios", {}).get(scenario, {})
+        regressions = [] if args.update_baselines else compare(results, baseline, args.tolerance_scale)
+        all_regressions[scenario] = regressions
+        if not args.json:
+            print_report(scenario, results, baseline, regressions)
+
+    if args.json:
+        print(json.dumps({"results": all_results, "regressions": all_regressions}, indent=2))
+
+    if args.update_baselines:
+        for scenario, results in all_results.items():
+            baselines.setdefault("scenarios", {}).setdefault(scenario, {}).update(results)
+        save_baselines(baselines, args.iterations)
+        print(f"\nReferências gravadas em {os.path.relpath(BASELINES_PATH)}")
+        return 0
+
+    failures = [r for regressions in all_regressions.values() for r in regressions]
+    if failures:
+        print(f"\n{len(failures)} regressões acima da tolerância:", file=sys.stderr)
+        for scenario, regressions in all_regressions.items():
+            for r in regressions:
+                print(f"  [{scenario}] {r['benchmark']} {r['metric']}: {r['value']} "
+                      f"(referência {r['baseline']}, limite {r['limit']})", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Amostragem em alta frequência sob demanda (modo burst)
+Coleta um subconjunto de métricas baratas em intervalos curtos, grava as amostras
+em um buffer colunar pré-alocado e entrega tudo como um único lote comprimido
+"""
+
+import sys
+import time
+import zlib
+import base64
+import logging
+from array import array
+from typing import Dict, Any, List, Callable
+
+import psutil
+
+logger = logging.getLogger("MonitoringAgent")
+
+# Coletores suportados no modo burst
+BURST_COLLECTORS = ("cpu", "memory", "network", "disk")
+
+
+def _cpu_total(times) -> float:
+    """Tempo total de CPU; no Linux, guest e guest_nice já estão contados em user e nice (como no psutil)"""
+    return sum(times) - getattr(times, "guest", 0) - getattr(times, "guest_nice", 0)
+
+
+def _cpu_busy_percent(previous, current) -> float:
+    """Calcula o percentual de CPU ocupada entre duas leituras de cpu_times"""
+    prev_total = _cpu_total(previous)
+    curr_total = _cpu_total(current)
+    prev_idle = previous.idle + getattr(previous, "iowait", 0)
+    curr_idle = current.idle + getattr(current, "iowait", 0)
+    total_delta = curr_total - prev_total
+    if total_delta <= 0:
+        return 0.0
+    return max(0.0, min(100.0, 100.0 * (1 - (curr_idle - prev_idle) / total_delta)))
+
+
+class BurstSampler:
+    """Amostrador de alta frequência com buffer colunar pré-alocado"""
+
+    def __init__(self, collectors: List[str], interval: float, duration: float):
+        """
+        Inicializa o amostrador
+
+        Args:
+            collectors: Coletores a amostrar (subconjunto de BURST_COLLECTORS)
+            interval: Intervalo entre amostras em segundos
+            duration: Duração total do burst em segundos
+        """
+        unknown = [name for name in collectors if name not in BURST_COLLECTORS]
+        if unknown:
+            raise ValueError(f"Coletores não suportados no modo burst: {', '.join(unknown)}")
+        if not collectors:
+            raise ValueError("Nenhum coletor informado para o modo burst")
+
+        self.collectors = list(dict.fromkeys(collectors))
+        self.interval = interval
+        self.duration = duration
+        self.capacity = max(1, int(duration / interval))
+        self.count = 0
+
+        # Leituras anteriores para o cálculo de taxas e percentuais
+        self._last_cpu = None
+        self._last_net = None
+        self._last_disk = None
+        self._last_time = None
+
+        self.columns: List[str] = ["t_offset"]
+        self._samplers: List[Callable[[float], List[float]]] = []
+        for name in self.collectors:
+            names, sampler = getattr(self, f"_setup_{name}")()
+            self.columns.extend(names)
+            self._samplers.append(sampler)
+
+        # Buffer colunar pré-alocado: uma coluna float64 por série
+        self._buffer = [array('d', bytes(8 * self.capacity)) for _ in self.columns]
+
+    def _setup_cpu(self):
+        """Prepara a amostragem de CPU total e por núcleo"""
+        self._last_cpu = psutil.cpu_times(percpu=True)
+        names = ["cpu.percent"] + [f"cpu.core{i}" for i in range(len(self._last_cpu))]
+
+        def sample(elapsed: float) -> List[float]:
+            current = psutil.cpu_times(percpu=True)
+            per_core = [_cpu_busy_percent(p, c) for p, c in zip(self._last_cpu, current)]
+            self._last_cpu = current
+            total = sum(per_core) / len(per_core) if per_core else 0.0
+            return [total] + per_core
+
+        return names, sample
+
+    def _setup_memory(self):
+        """Prepara a amostragem de memória"""
+        def sample(elapsed: float) -> List[float]:
+            memory = psutil.virtual_memory()
+            return [memory.percent, memory.used / (1024**2)]
+
+        return ["memory.percent", "memory.used_mb"], sample
+
+    def _setup_network(self):
+        """Prepara a amostragem de taxas de rede"""
+        self._last_net = psutil.net_io_counters()
+
+        def sample(elapsed: float) -> List[float]:
+            current = psutil.net_io_counters()
+            rates = [
+                (current.bytes_sent - self._last_net.bytes_sent) / elapsed,
+                (current.bytes_recv - self._last_net.bytes_recv) / elapsed
+            ]
+            self._last_net = current
+            return rates
+
+        return ["network.sent_bps", "network.recv_bps"], sample
+
+    def _setup_disk(self):
+        """Prepara a amostragem de taxas de disco"""
+        self._last_disk = psutil.disk_io_counters()
+
+        def sample(elapsed: float) -> List[float]:
+            current = psutil.disk_io_counters()
+            if current is None or self._last_disk is None:
+                return [0.0, 0.0]
+            rates = [
+                (current.read_bytes - self._last_disk.read_bytes) / elapsed,
+                (current.write_bytes - self._last_disk.write_bytes) / elapsed
+            ]
+            self._last_disk = current
+            return rates
+
+        return ["disk.read_bps", "disk.write_bps"], sample
+
+    def sample(self, now: float, started: float) -> None:
+        """Grava uma amostra de todos os coletores na próxima linha do buffer"""
+        if self.count >= self.capacity:
+            return
+
+        elapsed = max(now - (self._last_time or started), 1e-6)
+        self._last_time = now
+
+        row = [now - started]
+        for sampler in self._samplers:
+            row.extend(sampler(elapsed))
+
+        for column, value in zip(self._buffer, row):
+            column[self.count] = value
+        self.count += 1
+
+    def run(self, should_continue: Callable[[], bool]) -> Dict[str, Any]:
+        """
+        Executa o burst até o fim da duração ou até should_continue retornar False
+
+        Args:
+            should_continue: Função consultada a cada amostra para interromper o burst
+
+        Returns:
+            Lote comprimido com todas as amostras
+        """
+        started = time.time()
+        self._last_time = started
+        deadline = started
+
+        while self.count < self.capacity and should_continue():
+            # Agenda por deadline para não acumular atraso entre amostras
+            deadline += self.interval
+            delay = deadline - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self.sample(time.time(), started)
+
+        return self.to_batch(started)
+
+    def to_batch(self, started: float) -> Dict[str, Any]:
+        """Serializa as amostras coletadas em um lote colunar comprimido"""
+        batch = {
+            "started_at": started,
+            "interval_ms": round(self.interval * 1000, 3)
+        }
+        batch.update(encode_columns(self.columns, [column[:self.count] for column in self._buffer], self.count))
+        return batch
+
+
+def encode_columns(names: List[str], columns: List[array], count: int) -> Dict[str, Any]:
+    """
+    Serializa colunas float64 de mesmo tamanho em um bloco colunar comprimido
+
+    Args:
+        names: Nome de cada coluna
+        columns: Colunas com exatamente count valores cada
+        count: Número de linhas
+
+    Returns:
+        Bloco com colunas, codificação e dados comprimidos (lido por decode_batch)
+    """
+    raw = bytearray()
+    for column in columns:
+        if sys.byteorder != "little":
+            column = array('d', column)
+            column.byteswap()
+        raw.extend(column.tobytes())
+
+    compressed = zlib.compress(bytes(raw), 6)
+    return {
+        "count": count,
+        "columns": list(names),
+        "encoding": "zlib+base64;float64-le;column-major",
+        "raw_bytes": len(raw),
+        "data": base64.b64encode(compressed).decode("ascii")
+    }
+
+
+def decode_batch(batch: Dict[str, Any]) -> Dict[str, List[float]]:
+    """
+    Decodifica um lote gerado por encode_columns (burst ou histórico)
+
+    Args:
+        batch: Lote comprimido
+
+    Returns:
+        Dicionário {coluna: valores}
+    """
+    values = array('d', zlib.decompress(base64.b64decode(batch["data"])))
+    if sys.byteorder != "little":
+        values.byteswap()
+    count = batch["count"]
+    return {
+        name: values[i * count:(i + 1) * count].tolist()
+        for i, name in enumerate(batch["columns"])
+    }
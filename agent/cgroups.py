@@ -0,0 +1,253 @@
+"""
+Uso de recursos por container e pod (cgroup v2)
+Lê diretamente os arquivos do cgroupfs (cpu.stat, memory.current, io.stat, pids.current
+e os arquivos de pressão PSI) de cada cgroup de pod e de container, calcula as taxas
+entre ciclos e entrega os maiores consumidores de CPU e memória, sem percorrer processos
+"""
+
+import os
+import re
+import time
+import heapq
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger("MonitoringAgent")
+
+# Nomes de cgroup de pod (drivers systemd e cgroupfs do kubelet)
+POD_PATTERN = re.compile(r"pod([0-9a-f]{8}[-_][0-9a-f]{4}[-_][0-9a-f]{4}[-_][0-9a-f]{4}[-_][0-9a-f]{12})(?:\.slice)?$")
+
+# Nomes de cgroup de container (containerd, CRI-O, Docker ou id puro no driver cgroupfs)
+CONTAINER_PATTERN = re.compile(r"^(?:cri-containerd-|crio-|docker-|containerd-)?([0-9a-f]{64})(?:\.scope)?$")
+
+# Classe de QoS do Kubernetes a partir do caminho do cgroup
+QOS_PATTERN = re.compile(r"(burstable|besteffort)", re.IGNORECASE)
+
+PRESSURE_RESOURCES = ("cpu", "memory", "io")
+
+
+def _read_int(path: str) -> Optional[int]:
+    """Lê um arquivo com um único inteiro ('max' = sem limite)"""
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    if value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _read_keyed(path: str) -> Dict[str, int]:
+    """Lê um arquivo 'chave valor' por linha (cpu.stat, memory.stat)"""
+    result = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(" ")
+                if value:
+                    result[key] = int(value)
+    except (OSError, ValueError):
+        pass
+    return result
+
+
+def _read_io(path: str) -> Tuple[int, int]:
+    """Soma os bytes lidos e escritos de todos os dispositivos em io.stat"""
+    read_bytes = write_bytes = 0
+    try:
+        with open(path) as f:
+            for line in f:
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes":
+                        read_bytes += int(value)
+                    elif key == "wbytes":
+                        write_bytes += int(value)
+    except (OSError, ValueError):
+        pass
+    return read_bytes, write_bytes
+
+
+def _read_pressure(path: str) -> Optional[float]:
+    """Retorna o avg10 da linha 'some' de um arquivo de pressão PSI"""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith("some "):
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition("=")
+                        if key == "avg10":
+                            return float(value)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class CgroupCollector:
+    """Coletor de uso por container e pod a partir do cgroup v2"""
+
+    def __init__(self, root: str = "/sys/fs/cgroup", scan: Tuple[str, ...] = ("kubepods.slice", "kubepods", "system.slice"),
+                 max_depth: int = 4, top_n: int = 10, pressure: bool = True):
+        """
+        Inicializa o coletor
+
+        Args:
+            root: Ponto de montagem do cgroup v2 (no DaemonSet, o do host)
+            scan: Subárvores do root onde pods e containers são procurados
+            max_depth: Profundidade máxima da busca em cada subárvore
+            top_n: Número de containers e pods listados por CPU e por memória
+            pressure: Lê os arquivos de pressão PSI (cpu/memory/io.pressure)
+        """
+        self.root = root
+        self.scan = tuple(scan)
+        self.max_depth = max_depth
+        self.top_n = top_n
+        self.pressure = pressure
+        self.available = os.path.exists(os.path.join(root, "cgroup.controllers"))
+
+        # Últimos contadores por cgroup: (instante, usage_usec, throttled_usec, rbytes, wbytes)
+        self._previous: Dict[str, Tuple[float, int, int, int, int]] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], root: Optional[str] = None) -> "CgroupCollector":
+        """
+        Cria o coletor a partir da seção metrics.cgroups da configuração
+
+        Args:
+            config: Seção metrics.cgroups
+            root: Ponto de montagem (sobrepõe config['root'], por exemplo via CGROUP_ROOT)
+        """
+        return cls(
+            root or config.get("root", "/sys/fs/cgroup"),
+            tuple(config.get("scan", ["kubepods.slice", "kubepods", "system.slice"])),
+            int(config.get("max_depth", 4)),
+            int(config.get("top_n", 10)),
+            bool(config.get("pressure", True))
+        )
+
+    def discover(self) -> Tuple[List[Tuple[str, str, str]], List[Tuple[str, str, Optional[str], str]]]:
+        """
+        Procura os cgroups de pods e containers
+
+        Returns:
+            Tupla (pods, containers): pods como (caminho, uid, qos) e containers como
+            (caminho, id, uid do pod ou None, qos)
+        """
+        pods = []
+        containers = []
+        stack = [(os.path.join(self.root, name), 0, None, "") for name in self.scan]
+        while stack:
+            path, depth, pod_uid, qos = stack.pop()
+            try:
+                entries = [entry for entry in os.scandir(path) if entry.is_dir(follow_symlinks=False)]
+            except OSError:
+                continue
+            for entry in entries:
+                name = entry.name
+                child_qos = qos
+                if not child_qos:
+                    match = QOS_PATTERN.search(name)
+                    if match:
+                        child_qos = match.group(1).lower()
+
+                match = CONTAINER_PATTERN.match(name)
+                if match:
+                    containers.append((entry.path, match.group(1), pod_uid, child_qos or "guaranteed"))
+                    continue
+
+                child_pod = pod_uid
+                match = POD_PATTERN.search(name)
+                if match:
+                    child_pod = match.group(1).replace("_", "-")
+                    pods.append((entry.path, child_pod, child_qos or "guaranteed"))
+                if depth + 1 < self.max_depth:
+                    stack.append((entry.path, depth + 1, child_pod, child_qos))
+        return pods, containers
+
+    def _read(self, path: str, now: float) -> Dict[str, Any]:
+        """Lê os arquivos de um cgroup e calcula as taxas desde o ciclo anterior"""
+        cpu = _read_keyed(os.path.join(path, "cpu.stat"))
+        usage = cpu.get("usage_usec", 0)
+        throttled = cpu.get("throttled_usec", 0)
+        read_bytes, write_bytes = _read_io(os.path.join(path, "io.stat"))
+        memory = _read_int(os.path.join(path, "memory.current"))
+        limit = _read_int(os.path.join(path, "memory.max"))
+        inactive_file = _read_keyed(os.path.join(path, "memory.stat")).get("inactive_file", 0) if memory else 0
+
+        entry: Dict[str, Any] = {
+            "cpu_percent": None,
+            "throttled_percent": None,
+            "memory_mb": round(memory / (1024**2), 2) if memory is not None else None,
+            # Mesma definição de working set do kubelet: memória menos cache inativo
+            "working_set_mb": round(max(0, memory - inactive_file) / (1024**2), 2) if memory is not None else None,
+            "memory_limit_mb": round(limit / (1024**2), 2) if limit is not None else None,
+            "pids": _read_int(os.path.join(path, "pids.current")),
+            "read_bps": None,
+            "write_bps": None
+        }
+
+        previous = self._previous.get(path)
+        self._previous[path] = (now, usage, throttled, read_bytes, write_bytes)
+        if previous:
+            elapsed = now - previous[0]
+            if elapsed > 0:
+                # Percentual de um núcleo, como no docker stats; contadores reiniciados viram zero
+                entry["cpu_percent"] = round(max(0, usage - previous[1]) / (elapsed * 1e4), 2)
+                entry["throttled_percent"] = round(max(0, throttled - previous[2]) / (elapsed * 1e4), 2)
+                entry["read_bps"] = round(max(0, read_bytes - previous[3]) / elapsed, 2)
+                entry["write_bps"] = round(max(0, write_bytes - previous[4]) / elapsed, 2)
+
+        if self.pressure:
+            entry["pressure"] = {
+                resource: _read_pressure(os.path.join(path, f"{resource}.pressure"))
+                for resource in PRESSURE_RESOURCES
+            }
+        return entry
+
+    def _top(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Maiores consumidores de CPU e de memória (working set)"""
+        return {
+            "count": len(entries),
+            "top_cpu": heapq.nlargest(self.top_n, entries, key=lambda e: e["cpu_percent"] or 0),
+            "top_memory": heapq.nlargest(self.top_n, entries, key=lambda e: e["working_set_mb"] or 0)
+        }
+
+    def collect(self) -> Dict[str, Any]:
+        """
+        Coleta o uso de todos os pods e containers
+
+        Returns:
+            {pods: {count, top_cpu, top_memory}, containers: {count, top_cpu, top_memory}}
+        """
+        now = time.time()
+        pods, containers = self.discover()
+
+        per_pod = Counter(pod_uid for _, _, pod_uid, _ in containers)
+        pod_entries = []
+        for path, uid, qos in pods:
+            entry = {"uid": uid, "qos": qos}
+            entry.update(self._read(path, now))
+            entry["containers"] = per_pod.get(uid, 0)
+            pod_entries.append(entry)
+
+        container_entries = []
+        for path, container_id, pod_uid, qos in containers:
+            entry = {"id": container_id[:12], "pod_uid": pod_uid, "qos": qos}
+            entry.update(self._read(path, now))
+            container_entries.append(entry)
+
+        # Cgroups removidos deixam de ter contadores guardados
+        current = {path for path, *_ in pods} | {path for path, *_ in containers}
+        for path in list(self._previous):
+            if path not in current:
+                del self._previous[path]
+
+        return {
+            "pods": self._top(pod_entries),
+            "containers": self._top(container_entries)
+        }
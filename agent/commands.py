@@ -0,0 +1,157 @@
+"""
+Despacho de comandos recebidos pelo agente
+Mantém um registro de handlers por ação e executa cada comando em um pool
+de workers, fora da thread de I/O do pika, respondendo via reply_to
+"""
+
+import json
+import time
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+
+import pika
+
+logger = logging.getLogger("MonitoringAgent")
+
+# Um handler recebe os parâmetros do comando e devolve um resultado serializável em JSON
+CommandHandler = Callable[[Dict[str, Any]], Any]
+
+
+class CommandDispatcher:
+    """Registro de handlers de comando com execução em pool de workers limitado"""
+
+    def __init__(self, hostname: str, max_workers: int = 4, prefetch_count: int = 8):
+        """
+        Inicializa o despachante de comandos
+
+        Args:
+            hostname: Hostname do agente, incluído nas respostas
+            max_workers: Número de threads que executam handlers
+            prefetch_count: Máximo de comandos não confirmados entregues pelo broker.
+                Como a confirmação só ocorre ao fim da execução, limita também a fila do pool
+        """
+        self.hostname = hostname
+        self.max_workers = max(1, int(max_workers))
+        self.prefetch_count = max(self.max_workers, int(prefetch_count))
+        self._handlers: Dict[str, CommandHandler] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="command-worker"
+        )
+
+    def register(self, action: str, handler: CommandHandler) -> None:
+        """
+        Registra um handler para uma ação
+
+        Args:
+            action: Nome da ação (campo 'action' ou 'command_type' do comando)
+            handler: Função que recebe os parâmetros e devolve o resultado
+        """
+        self._handlers[action] = handler
+
+    def actions(self):
+        """Retorna as ações registradas"""
+        return sorted(self._handlers)
+
+    def setup_channel(self, channel, queue: str) -> None:
+        """
+        Configura QoS e consumo de um canal para este despachante
+
+        Args:
+            channel: Canal RabbitMQ (BlockingChannel)
+            queue: Nome da fila de comandos
+        """
+        channel.basic_qos(prefetch_count=self.prefetch_count)
+        channel.basic_consume(queue=queue, on_message_callback=self.on_message)
+
+    def on_message(self, ch, method, properties, body) -> None:
+        """
+        Callback do pika: decodifica o comando e agenda sua execução no pool
+
+        Executado na thread de I/O, portanto não pode bloquear.
+        """
+        try:
+            command = json.loads(body)
+        except (ValueError, TypeError) as e:
+            logger.error(f"Comando inválido descartado: {e}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return
+
+        # Comando endereçado a outro agente (roteamento incorreto): ninguém mais consome esta fila,
+        # então é rejeitado em vez de devolvido para não circular indefinidamente
+        target = command.get("hostname")
+        if target and target != self.hostname:
+            logger.warning(f"Comando para {target} rejeitado por {self.hostname}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return
+
+        # Aceita tanto o formato do agente ('action'/'params') quanto o do backend ('command_type'/'command_data')
+        action = command.get("action") or command.get("command_type")
+        params = command.get("params") or command.get("command_data") or {}
+        logger.info(f"Comando recebido: {action}")
+
+        try:
+            self._executor.submit(self._run, ch, method.delivery_tag, properties, action, params)
+        except RuntimeError as e:
+            # Pool encerrado durante a parada do agente: devolve o comando para a fila
+            logger.warning(f"Comando {action} devolvido à fila: {e}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+
+    def _run(self, ch, delivery_tag, properties, action: Optional[str], params: Dict[str, Any]) -> None:
+        """Executa o handler em uma thread do pool e agenda a resposta na thread de I/O"""
+        started = time.time()
+        reply = {
+            "hostname": self.hostname,
+            "action": action,
+            "command_id": params.get("command_id") if isinstance(params, dict) else None,
+            "status": "completed",
+            "result": None,
+            "error": None
+        }
+
+        handler = self._handlers.get(action)
+        if handler is None:
+            reply["status"] = "failed"
+            reply["error"] = f"Comando desconhecido: {action}"
+            logger.warning(reply["error"])
+        else:
+            try:
+                reply["result"] = handler(params)
+            except Exception as e:
+                reply["status"] = "failed"
+                reply["error"] = str(e)
+                logger.error(f"Erro ao executar comando {action}: {e}")
+
+        reply["started_at"] = started
+        reply["duration_ms"] = round((time.time() - started) * 1000, 2)
+
+        # Operações no canal só podem ser feitas na thread de I/O da conexão
+        callback = functools.partial(self._finish, ch, delivery_tag, properties, reply)
+        try:
+            ch.connection.add_callback_threadsafe(callback)
+        except Exception as e:
+            # Conexão encerrada: o broker reentregará o comando não confirmado
+            logger.warning(f"Não foi possível confirmar o comando {action}: {e}")
+
+    def _finish(self, ch, delivery_tag, properties, reply: Dict[str, Any]) -> None:
+        """Publica o resultado em reply_to (se houver) e confirma o comando"""
+        try:
+            if properties is not None and properties.reply_to:
+                ch.basic_publish(
+                    exchange='',
+                    routing_key=properties.reply_to,
+                    body=json.dumps(reply, default=str),
+                    properties=pika.BasicProperties(
+                        correlation_id=properties.correlation_id,
+                        content_type='application/json'
+                    )
+                )
+            ch.basic_ack(delivery_tag=delivery_tag)
+        except Exception as e:
+            logger.error(f"Erro ao responder comando {reply.get('action')}: {e}")
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Encerra o pool de workers"""
+        self._executor.shutdown(wait=wait)
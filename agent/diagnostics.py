@@ -0,0 +1,175 @@
+"""
+Diagnóstico remoto do agente
+Liga cProfile (ciclos de coleta) e/ou tracemalloc (alocações do processo) por
+alguns segundos e resume as funções e pontos de alocação mais relevantes em um
+relatório compacto. Nada é instrumentado fora de uma sessão ativa
+"""
+
+import os
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+# Modos de diagnóstico suportados
+PROFILE_MODES = ("cpu", "memory")
+
+
+def _short_path(path: str) -> str:
+    """Reduz o caminho de um arquivo aos dois últimos componentes"""
+    parts = path.replace("\\", "/").split("/")
+    return "/".join(parts[-2:])
+
+
+class ProfileSession:
+    """Sessão de profiling com duração limitada"""
+
+    def __init__(self, modes: List[str], duration: float, top: int = 25, frames: int = 1):
+        """
+        Inicializa a sessão
+
+        Args:
+            modes: Subconjunto de PROFILE_MODES
+            duration: Duração da captura em segundos
+            top: Quantidade de funções/pontos de alocação no relatório
+            frames: Profundidade de pilha guardada pelo tracemalloc
+        """
+        unknown = [mode for mode in modes if mode not in PROFILE_MODES]
+        if unknown:
+            raise ValueError(f"Modos de diagnóstico não suportados: {', '.join(unknown)}")
+        if not modes:
+            raise ValueError("Nenhum modo de diagnóstico informado")
+
+        self.modes = list(dict.fromkeys(modes))
+        self.duration = duration
+        self.top = max(1, top)
+        self.frames = max(1, frames)
+        self.cycles = 0
+        self.started_at: Optional[float] = None
+
+        self._profiler: Optional[cProfile.Profile] = None
+        # Garante que o relatório só é montado depois do ciclo perfilado em andamento
+        self._cycle_lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_tracemalloc = False
+
+    def start(self) -> None:
+        """Inicia a captura"""
+        self.started_at = time.time()
+        if "cpu" in self.modes:
+            self._profiler = cProfile.Profile()
+        if "memory" in self.modes:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._started_tracemalloc = True
+            self._baseline = tracemalloc.take_snapshot()
+
+    @contextmanager
+    def profile_cycle(self):
+        """Perfila um ciclo de coleta, executado na thread principal"""
+        with self._cycle_lock:
+            if self._profiler is None:
+                yield
+                return
+            self._profiler.enable()
+            try:
+                yield
+            finally:
+                self._profiler.disable()
+                self.cycles += 1
+
+    def stop(self) -> Dict[str, Any]:
+        """
+        Encerra a captura e monta o relatório
+
+        Returns:
+            Relatório com as funções mais custosas e os pontos de alocação que mais cresceram
+        """
+        report: Dict[str, Any] = {
+            "modes": self.modes,
+            "started_at": self.started_at,
+            "duration": round(time.time() - (self.started_at or time.time()), 3),
+            "pid": os.getpid()
+        }
+
+        with self._cycle_lock:
+            if self._profiler is not None:
+                report["cpu"] = self._cpu_report()
+                self._profiler = None
+
+        if self._baseline is not None:
+            try:
+                report["memory"] = self._memory_report()
+            finally:
+                self._baseline = None
+                if self._started_tracemalloc:
+                    tracemalloc.stop()
+                    self._started_tracemalloc = False
+
+        return report
+
+    def _cpu_report(self) -> Dict[str, Any]:
+        """Resume as estatísticas do cProfile por tempo próprio e acumulado"""
+        try:
+            stats = pstats.Stats(self._profiler)
+        except TypeError:
+            # Nenhum ciclo perfilado durante a sessão
+            return {"cycles": self.cycles, "total_ms": 0.0, "by_tottime": [], "by_cumtime": []}
+
+        rows = []
+        for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                "function": f"{_short_path(filename)}:{line}({function})",
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3)
+            })
+
+        return {
+            "cycles": self.cycles,
+            "total_ms": round(stats.total_tt * 1000, 3),
+            "by_tottime": sorted(rows, key=lambda row: row["tottime_ms"], reverse=True)[:self.top],
+            "by_cumtime": sorted(rows, key=lambda row: row["cumtime_ms"], reverse=True)[:self.top]
+        }
+
+    def _memory_report(self) -> Dict[str, Any]:
+        """Compara as alocações atuais com as do início da sessão"""
+        snapshot = tracemalloc.take_snapshot()
+        ignore = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ]
+        snapshot = snapshot.filter_traces(ignore)
+        baseline = self._baseline.filter_traces(ignore)
+        current, peak = tracemalloc.get_traced_memory()
+
+        growth = []
+        for stat in snapshot.compare_to(baseline, "lineno")[:self.top]:
+            frame = stat.traceback[0]
+            growth.append({
+                "site": f"{_short_path(frame.filename)}:{frame.lineno}",
+                "size_diff_kb": round(stat.size_diff / 1024, 2),
+                "count_diff": stat.count_diff,
+                "size_kb": round(stat.size / 1024, 2)
+            })
+
+        largest = []
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            frame = stat.traceback[0]
+            largest.append({
+                "site": f"{_short_path(frame.filename)}:{frame.lineno}",
+                "size_kb": round(stat.size / 1024, 2),
+                "count": stat.count
+            })
+
+        return {
+            "traced_kb": round(current / 1024, 2),
+            "peak_kb": round(peak / 1024, 2),
+            "top_growth": growth,
+            "top_allocations": largest
+        }
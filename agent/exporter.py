@@ -0,0 +1,345 @@
+"""
+Endpoint HTTP local de métricas
+Serve o último snapshot coletado no formato texto do Prometheus (/metrics) e o
+estado do agente (/healthz) sem disparar nenhuma coleta, permitindo scrapes
+frequentes e probes de liveness no Kubernetes
+"""
+
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Tuple, Callable, Optional
+
+logger = logging.getLogger("MonitoringAgent")
+
+PREFIX = "monitoring_agent"
+CONTENT_TYPE_PROMETHEUS = "text/plain; version=0.0.4; charset=utf-8"
+
+# Rótulo quantile dos resumos de sketches (p50/p90/p99/max)
+QUANTILE_LABELS = {"p50": "0.5", "p90": "0.9", "p99": "0.99", "max": "1"}
+
+Sample = Tuple[Dict[str, Any], Any]
+
+
+def _escape(value: Any) -> str:
+    """Escapa um valor de label conforme o formato texto do Prometheus"""
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value: Any) -> Optional[str]:
+    """Converte um valor em número do Prometheus, ignorando ausentes e não numéricos"""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(float(value)) if isinstance(value, float) else str(value)
+    return None
+
+
+class _MetricWriter:
+    """Acumula famílias de métricas no formato texto do Prometheus"""
+
+    def __init__(self, base_labels: Dict[str, Any]):
+        self.base_labels = base_labels
+        self.lines: List[str] = []
+
+    def _labels(self, labels: Dict[str, Any]) -> str:
+        merged = dict(self.base_labels, **labels)
+        return ",".join(f'{key}="{_escape(value)}"' for key, value in merged.items())
+
+    def family(self, name: str, metric_type: str, help_text: str, samples: List[Sample], suffix: str = "") -> None:
+        """
+        Escreve uma família de métricas
+
+        Args:
+            name: Nome sem o prefixo
+            metric_type: gauge, counter ou histogram
+            help_text: Descrição
+            samples: Lista (labels, valor); valores não numéricos são ignorados
+        """
+        rendered = []
+        for labels, value in samples:
+            number = _number(value)
+            if number is not None:
+                rendered.append(f"{PREFIX}_{name}{suffix}{{{self._labels(labels)}}} {number}")
+        if not rendered:
+            return
+        self.lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        self.lines.append(f"# TYPE {PREFIX}_{name} {metric_type}")
+        self.lines.extend(rendered)
+
+    def histogram(self, name: str, help_text: str, series: List[Tuple[Dict[str, Any], List[float], List[int], float, int]]) -> None:
+        """
+        Escreve uma família de histogramas
+
+        Args:
+            series: Lista (labels, limites, contagens por bucket não cumulativas, soma, total)
+        """
+        if not series:
+            return
+        self.lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        self.lines.append(f"# TYPE {PREFIX}_{name} histogram")
+        for labels, bounds, buckets, total_sum, count in series:
+            cumulative = 0
+            for bound, bucket in zip(bounds, buckets):
+                cumulative += bucket
+                self.lines.append(f"{PREFIX}_{name}_bucket{{{self._labels(dict(labels, le=repr(float(bound))))}}} {cumulative}")
+            self.lines.append(f"{PREFIX}_{name}_bucket{{{self._labels(dict(labels, le='+Inf'))}}} {count}")
+            self.lines.append(f"{PREFIX}_{name}_sum{{{self._labels(labels)}}} {repr(float(total_sum))}")
+            self.lines.append(f"{PREFIX}_{name}_count{{{self._labels(labels)}}} {count}")
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def render_prometheus(payload: Dict[str, Any], now: float) -> str:
+    """
+    Converte o último payload do agente para o formato texto do Prometheus
+
+    Args:
+        payload: Payload montado por build_payload
+        now: Instante atual, para a idade do snapshot
+
+    Returns:
+        Texto com todas as famílias de métricas
+    """
+    writer = _MetricWriter({"hostname": payload.get("hostname", "")})
+    metrics = payload.get("metrics", {})
+    timestamp = payload.get("timestamp", now)
+
+    writer.family("snapshot_timestamp_seconds", "gauge", "Momento da última coleta", [({}, timestamp)])
+    writer.family("snapshot_age_seconds", "gauge", "Idade do último snapshot", [({}, round(now - timestamp, 3))])
+
+    # CPU
+    cpu = metrics.get("cpu", {})
+    writer.family("cpu_percent", "gauge", "Uso total de CPU", [({}, cpu.get("percent"))])
+    writer.family("cpu_core_percent", "gauge", "Uso de CPU por núcleo",
+                  [({"core": i}, value) for i, value in enumerate(cpu.get("per_cpu_percent", []) or [])])
+    writer.family("cpu_core_percent_quantile", "gauge", "Distribuição do uso de CPU entre os núcleos",
+                  [({"quantile": QUANTILE_LABELS[stat]}, value)
+                   for stat, value in (cpu.get("per_cpu_summary") or {}).items() if stat in QUANTILE_LABELS])
+    writer.family("load_average", "gauge", "Carga média do sistema",
+                  [({"period": period}, value) for period, value in (cpu.get("load_avg") or {}).items()])
+
+    # Memória
+    memory = metrics.get("memory", {})
+    for key in ("total", "used", "free"):
+        writer.family(f"memory_{key}_gigabytes", "gauge", f"Memória ({key})", [({}, memory.get(f"{key}_gb"))])
+    writer.family("memory_percent", "gauge", "Uso de memória", [({}, memory.get("percent"))])
+
+    # Disco
+    disk = metrics.get("disk", {})
+    partitions = disk.get("partitions", []) or []
+    partition_labels = [
+        ({"mountpoint": p.get("mountpoint"), "device": p.get("device"), "fstype": p.get("fstype")}, p)
+        for p in partitions
+    ]
+    for key in ("total", "used", "free"):
+        writer.family(f"disk_{key}_gigabytes", "gauge", f"Espaço em disco ({key})",
+                      [(labels, p.get(f"{key}_gb")) for labels, p in partition_labels])
+    writer.family("disk_percent", "gauge", "Uso do disco", [(labels, p.get("percent")) for labels, p in partition_labels])
+    disk_io = disk.get("io_counters", {}) or {}
+    for key, name in (("read_bytes", "disk_read_bytes_total"), ("write_bytes", "disk_written_bytes_total"),
+                      ("read_count", "disk_reads_total"), ("write_count", "disk_writes_total")):
+        writer.family(name, "counter", f"Contador de disco ({key})",
+                      [({"disk": device}, counters.get(key)) for device, counters in disk_io.items()])
+
+    # Rede
+    network = metrics.get("network", {})
+    net_io = network.get("io_counters", {}) or {}
+    for key, name in (("bytes_sent", "network_sent_bytes_total"), ("bytes_recv", "network_received_bytes_total"),
+                      ("packets_sent", "network_sent_packets_total"), ("packets_recv", "network_received_packets_total"),
+                      ("errin", "network_receive_errors_total"), ("errout", "network_transmit_errors_total"),
+                      ("dropin", "network_receive_drops_total"), ("dropout", "network_transmit_drops_total")):
+        writer.family(name, "counter", f"Contador de rede ({key})",
+                      [({"interface": interface}, counters.get(key)) for interface, counters in net_io.items()])
+    writer.family("network_connections", "gauge", "Conexões por estado",
+                  [({"state": state}, value) for state, value in (network.get("connections") or {}).items()])
+
+    # Processos
+    processes = metrics.get("processes", {})
+    writer.family("processes", "gauge", "Processos por estado",
+                  [({"state": state}, processes.get(state)) for state in ("running", "sleeping", "stopped", "zombie")])
+    writer.family("processes_total", "gauge", "Total de processos", [({}, processes.get("total"))])
+    watched = processes.get("watched") or {}
+    writer.family("watched_process_instances", "gauge", "Instâncias de cada processo monitorado",
+                  [({"rule": rule}, entry.get("instances")) for rule, entry in watched.items()])
+    writer.family("watched_process_cpu_percent", "gauge", "CPU somado das instâncias de cada processo monitorado",
+                  [({"rule": rule}, entry.get("cpu_percent")) for rule, entry in watched.items()])
+    writer.family("watched_process_memory_percent", "gauge", "Memória somada das instâncias de cada processo monitorado",
+                  [({"rule": rule}, entry.get("memory_percent")) for rule, entry in watched.items()])
+
+    # Containers e pods (cgroup v2): maiores consumidores, sem repetir quem aparece nas duas listas
+    cgroups = metrics.get("cgroups", {}) or {}
+    cgroup_entries = []
+    for kind, key in (("pod", "uid"), ("container", "id")):
+        section = cgroups.get(f"{kind}s", {}) or {}
+        seen = {}
+        for entry in (section.get("top_cpu") or []) + (section.get("top_memory") or []):
+            seen.setdefault(entry.get(key), entry)
+        writer.family(f"{kind}s", "gauge", f"Cgroups de {kind} encontrados", [({}, section.get("count"))])
+        cgroup_entries.extend(({"kind": kind, "id": entry_id, "qos": entry.get("qos")}, entry)
+                              for entry_id, entry in seen.items())
+    writer.family("cgroup_cpu_percent", "gauge", "Uso de CPU do cgroup (percentual de um núcleo)",
+                  [(labels, entry.get("cpu_percent")) for labels, entry in cgroup_entries])
+    writer.family("cgroup_working_set_megabytes", "gauge", "Working set de memória do cgroup",
+                  [(labels, entry.get("working_set_mb")) for labels, entry in cgroup_entries])
+
+    # Temperatura
+    sensors = (metrics.get("temperature", {}) or {}).get("sensors", {}) or {}
+    writer.family("temperature_celsius", "gauge", "Temperatura dos sensores",
+                  [({"sensor": name, "label": entry.get("label")}, entry.get("current"))
+                   for name, entries in sensors.items() for entry in entries])
+
+    # NoIP DUC e serviços
+    noip = metrics.get("noip_duc", {})
+    for key in ("installed", "running", "service_active"):
+        writer.family(f"noip_duc_{key}", "gauge", f"NoIP DUC ({key})", [({}, noip.get(key))])
+    services = metrics.get("services", {}) or {}
+    writer.family("service_active", "gauge", "Serviço ativo",
+                  [({"service": name}, status.get("active")) for name, status in services.items()])
+
+    # Verificação de portas
+    targets = (metrics.get("port_check", {}) or {}).get("targets", []) or []
+    target_labels = [
+        ({"name": t.get("name"), "host": t.get("host"), "port": t.get("port"), "protocol": t.get("protocol")}, t)
+        for t in targets
+    ]
+    writer.family("port_check_up", "gauge", "Porta aberta/respondendo",
+                  [(labels, t.get("status") == "open") for labels, t in target_labels])
+    writer.family("port_check_response_milliseconds", "gauge", "Tempo de resposta da verificação de porta",
+                  [(labels, t.get("response_time")) for labels, t in target_labels])
+    writer.family("port_check_latency_milliseconds", "gauge", "Distribuição da latência nas sondagens da porta",
+                  [(dict(labels, quantile=QUANTILE_LABELS[stat]), value) for labels, t in target_labels
+                   for stat, value in (t.get("latency") or {}).items() if stat in QUANTILE_LABELS])
+
+    # Resumos das janelas de agregação
+    aggregates = metrics.get("aggregates", {}) or {}
+    writer.family("window_value", "gauge", "Resumo da última janela de agregação",
+                  [({"family": family, "series": series, "stat": stat}, value)
+                   for family, window in aggregates.items()
+                   for series, stats in window.items() if isinstance(stats, dict)
+                   for stat, value in stats.items()])
+    writer.family("window_samples", "gauge", "Amostras na última janela de agregação",
+                  [({"family": family}, window.get("samples")) for family, window in aggregates.items()])
+
+    _render_agent_stats(writer, payload.get("agent_stats", {}) or {})
+    return writer.render()
+
+
+def _render_agent_stats(writer: _MetricWriter, stats: Dict[str, Any]) -> None:
+    """Converte a seção agent_stats (telemetria, broker e agendamento)"""
+    telemetry = stats.get("telemetry", {}) or {}
+    process = telemetry.get("process", {}) or {}
+    writer.family("resident_memory_megabytes", "gauge", "Memória residente do agente", [({}, process.get("rss_mb"))])
+    writer.family("cpu_seconds_total", "counter", "Tempo de CPU do agente",
+                  [({"mode": "user"}, process.get("cpu_user_s")), ({"mode": "system"}, process.get("cpu_system_s"))])
+    writer.family("threads", "gauge", "Threads do agente", [({}, process.get("threads"))])
+
+    publish = telemetry.get("publish", {}) or {}
+    writer.family("publishes_total", "counter", "Publicações bem-sucedidas", [({}, publish.get("published"))])
+    writer.family("publish_failures_total", "counter", "Falhas de publicação", [({}, publish.get("failures"))])
+    writer.family("payload_bytes_total", "counter", "Bytes publicados", [({}, publish.get("payload_bytes_total"))])
+
+    bounds_s = [bound / 1000.0 for bound in telemetry.get("bucket_bounds_ms", [])]
+    writer.histogram("stage_duration_seconds", "Duração de cada coletor e etapa do ciclo", [
+        ({"stage": stage}, bounds_s, timing.get("buckets", []), timing.get("sum_ms", 0) / 1000.0, timing.get("count", 0))
+        for stage, timing in (telemetry.get("timings", {}) or {}).items()
+    ])
+
+    flow = stats.get("flow_control", {}) or {}
+    writer.family("broker_blocked", "gauge", "Publicações bloqueadas pelo broker", [({}, flow.get("blocked"))])
+    writer.family("flow_control_buffered", "gauge", "Amostras no buffer local", [({}, flow.get("buffered"))])
+    transport = stats.get("transport", {}) or {}
+    if transport:
+        labels = {"transport": transport.get("type")}
+        writer.family("transport_connected", "gauge", "Transporte de dados aberto", [(labels, transport.get("connected"))])
+        writer.family("transport_dropped_total", "counter", "Mensagens descartadas por falha de envio",
+                      [(labels, transport.get("dropped"))])
+    alerts = stats.get("alerts") or {}
+    if alerts:
+        writer.family("alerts_firing", "gauge", "Alertas ativos avaliados no agente",
+                      [({"rule": alert.get("rule"), "instance": alert.get("instance") or ""}, 1)
+                       for alert in alerts.get("firing", [])])
+        writer.family("alert_events_pending", "gauge", "Eventos de alerta aguardando publicação",
+                      [({}, (alerts.get("publisher") or {}).get("pending"))])
+    reconnect = stats.get("reconnect", {}) or {}
+    writer.family("broker_circuit_open", "gauge", "Circuit breaker de reconexão aberto",
+                  [({"connection": name}, policy.get("state") != "closed") for name, policy in reconnect.items()])
+    writer.family("missed_ticks_total", "counter", "Ciclos de coleta perdidos",
+                  [({}, (stats.get("schedule", {}) or {}).get("missed_ticks"))])
+
+
+class MetricsServer:
+    """Servidor HTTP em thread própria para /metrics e /healthz"""
+
+    def __init__(self, host: str, port: int,
+                 snapshot: Callable[[], Optional[Dict[str, Any]]],
+                 health: Callable[[], Tuple[bool, Dict[str, Any]]],
+                 clock: Callable[[], float]):
+        """
+        Inicializa o servidor
+
+        Args:
+            host: Endereço de escuta
+            port: Porta de escuta
+            snapshot: Retorna o último payload coletado (ou None antes do primeiro ciclo)
+            health: Retorna (saudável, detalhes) para o /healthz
+            clock: Relógio usado na idade do snapshot
+        """
+        self.host = host
+        self.port = port
+        self._snapshot = snapshot
+        self._health = health
+        self._clock = clock
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Abre a porta e começa a atender em segundo plano"""
+        server_ref = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    payload = server_ref._snapshot()
+                    if payload is None:
+                        self._reply(503, "text/plain; charset=utf-8", "nenhuma coleta concluída\n")
+                    else:
+                        self._reply(200, CONTENT_TYPE_PROMETHEUS, render_prometheus(payload, server_ref._clock()))
+                elif path in ("/healthz", "/health"):
+                    healthy, details = server_ref._health()
+                    self._reply(200 if healthy else 503, "application/json", json.dumps(details))
+                else:
+                    self._reply(404, "text/plain; charset=utf-8", "not found\n")
+
+            def _reply(self, status: int, content_type: str, body: str) -> None:
+                data = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug("HTTP %s - %s", self.address_string(), format % args)
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+            self._server.daemon_threads = True
+        except OSError as e:
+            logger.error(f"Não foi possível iniciar o endpoint de métricas em {self.host}:{self.port}: {e}")
+            return False
+
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        logger.info(f"Endpoint de métricas em http://{self.host}:{self.port}/metrics")
+        return True
+
+    def stop(self) -> None:
+        """Encerra o servidor"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,200 @@
+"""
+Controle de fluxo do broker
+Enquanto o RabbitMQ bloqueia publicações (alarme de memória ou disco), o agente
+continua amostrando em um buffer local limitado, com payloads reduzidos, e o
+esvazia em ritmo controlado quando o bloqueio termina
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+
+class FlowControl:
+    """Estado de bloqueio do broker e buffer local de amostras"""
+
+    def __init__(self, buffer_size: int = 360, sample_every: int = 1, drain_rate: float = 5.0):
+        """
+        Inicializa o controle de fluxo
+
+        Args:
+            buffer_size: Máximo de amostras guardadas enquanto bloqueado (as mais antigas são descartadas)
+            sample_every: Guarda uma a cada N amostras enquanto bloqueado
+            drain_rate: Mensagens por segundo ao esvaziar o buffer
+        """
+        self.sample_every = max(1, int(sample_every))
+        self.drain_rate = max(0.1, float(drain_rate))
+        self._buffer = deque(maxlen=max(1, int(buffer_size)))
+        self._lock = threading.Lock()
+
+        self.blocked = False
+        self.reason: Optional[str] = None
+        self.blocked_since: Optional[float] = None
+        self.blocked_seconds_total = 0.0
+        self.blocked_count = 0
+        self.buffered_total = 0
+        self.dropped_total = 0
+        self.drained_total = 0
+        self._skipped = 0
+        self._next_drain_at = 0.0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "FlowControl":
+        """
+        Cria o controle de fluxo a partir da seção rabbitmq.flow_control
+
+        Args:
+            config: Dicionário de configuração
+        """
+        return cls(
+            buffer_size=int(config.get("buffer_size", 360)),
+            sample_every=int(config.get("sample_every", 1)),
+            drain_rate=float(config.get("drain_rate", 5.0))
+        )
+
+    def set_blocked(self, blocked: bool, reason: Optional[str] = None) -> None:
+        """
+        Atualiza o estado de bloqueio, contabilizando o tempo bloqueado
+
+        Args:
+            blocked: True ao receber connection.blocked, False ao receber connection.unblocked
+            reason: Motivo informado pelo broker
+        """
+        now = time.time()
+        with self._lock:
+            if blocked and not self.blocked:
+                self.blocked = True
+                self.blocked_since = now
+                self.blocked_count += 1
+                self.reason = reason
+            elif not blocked and self.blocked:
+                self.blocked = False
+                self.blocked_seconds_total += now - (self.blocked_since or now)
+                self.blocked_since = None
+                self._next_drain_at = now
+
+    def buffer(self, data: Dict[str, Any]) -> bool:
+        """
+        Guarda uma amostra reduzida para envio posterior
+
+        Returns:
+            True se a amostra foi guardada, False se foi pulada pela redução de resolução
+        """
+        with self._lock:
+            self._skipped += 1
+            if self._skipped < self.sample_every:
+                return False
+            self._skipped = 0
+
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped_total += 1
+            self._buffer.append(reduce_payload(data))
+            self.buffered_total += 1
+            return True
+
+    def pending(self) -> int:
+        """Retorna o número de amostras aguardando envio"""
+        return len(self._buffer)
+
+    def next_to_drain(self, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Retorna a próxima amostra a reenviar, respeitando a taxa de esvaziamento
+
+        Returns:
+            Amostra mais antiga do buffer ou None se bloqueado, vazio ou fora da janela
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.blocked or not self._buffer or now < self._next_drain_at:
+                return None
+            self._next_drain_at = max(self._next_drain_at, now - 1.0 / self.drain_rate) + 1.0 / self.drain_rate
+            return self._buffer.popleft()
+
+    def requeue(self, data: Dict[str, Any]) -> None:
+        """Devolve ao início do buffer uma amostra cujo reenvio falhou"""
+        with self._lock:
+            if len(self._buffer) < self._buffer.maxlen:
+                self._buffer.appendleft(data)
+            else:
+                self.dropped_total += 1
+
+    def mark_drained(self) -> None:
+        """Contabiliza uma amostra reenviada com sucesso"""
+        with self._lock:
+            self.drained_total += 1
+
+    def seconds_until_drain(self, now: Optional[float] = None) -> Optional[float]:
+        """Retorna a espera até o próximo reenvio ou None se não houver o que reenviar"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self.blocked or not self._buffer:
+                return None
+            return max(0.0, self._next_drain_at - now)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna o estado atual para as métricas do próprio agente"""
+        now = time.time()
+        with self._lock:
+            blocked_total = self.blocked_seconds_total
+            if self.blocked and self.blocked_since:
+                blocked_total += now - self.blocked_since
+            return {
+                "blocked": self.blocked,
+                "reason": self.reason if self.blocked else None,
+                "blocked_count": self.blocked_count,
+                "blocked_seconds_total": round(blocked_total, 2),
+                "buffered": len(self._buffer),
+                "buffered_total": self.buffered_total,
+                "dropped_total": self.dropped_total,
+                "drained_total": self.drained_total
+            }
+
+
+def reduce_payload(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduz um payload às métricas essenciais para economizar memória e banda
+
+    Mantém as seções que o backend grava nas tabelas principais e descarta
+    detalhes volumosos (por núcleo, interfaces, conexões, top processos, sensores).
+    Das estatísticas do agente fica só o controle de fluxo, que explica a redução.
+
+    Args:
+        data: Payload completo
+
+    Returns:
+        Payload reduzido, marcado com "degraded": True
+    """
+    metrics = data.get("metrics", {})
+    reduced: Dict[str, Any] = {}
+
+    cpu = metrics.get("cpu")
+    if cpu:
+        reduced["cpu"] = {key: cpu[key] for key in ("percent", "load_avg") if key in cpu}
+
+    if "memory" in metrics:
+        reduced["memory"] = metrics["memory"]
+
+    disk = metrics.get("disk")
+    if disk and "partitions" in disk:
+        reduced["disk"] = {"partitions": disk["partitions"]}
+
+    network = metrics.get("network")
+    if network and "io_counters" in network:
+        reduced["network"] = {"io_counters": network["io_counters"]}
+
+    processes = metrics.get("processes")
+    if processes:
+        reduced["processes"] = {
+            key: processes[key]
+            for key in ("total", "running", "sleeping", "stopped", "zombie")
+            if key in processes
+        }
+
+    result = {key: value for key, value in data.items() if key not in ("metrics", "agent_stats")}
+    result["metrics"] = reduced
+    agent_stats = data.get("agent_stats")
+    if agent_stats and "flow_control" in agent_stats:
+        result["agent_stats"] = {"flow_control": agent_stats["flow_control"]}
+    result["degraded"] = True
+    return result
@@ -0,0 +1,248 @@
+"""
+Histórico recente de métricas em memória
+Guarda as amostras numéricas de cada ciclo em um buffer circular colunar de tamanho
+fixo (uma coluna float64 por série) e entrega um intervalo de tempo como bloco
+comprimido, no mesmo formato do modo burst
+"""
+
+import math
+import re
+import threading
+from array import array
+from typing import Dict, Any, List, Optional, Iterable, Pattern, Tuple
+
+from burst import encode_columns
+
+# Campos usados como chave dos itens de listas de dicionários (partições, sensores, ...)
+ITEM_KEYS = ("name", "mountpoint", "device", "label")
+
+NAN = float("nan")
+
+# Séries fora do histórico quando a configuração não define exclude; os pids dos processos
+# monitorados mudam a cada reinício e ocupariam uma série nova por pid
+DEFAULT_EXCLUDE = ("processes.top_cpu", "processes.top_memory", "processes.watched.*.pids", "aggregates")
+
+# Nomes de séries recusadas lembrados para a contagem de dropped_series
+DROPPED_NAMES_LIMIT = 1024
+
+
+def exclude_pattern(prefixes: Iterable[str]) -> Optional[Pattern]:
+    """
+    Compila os prefixos de séries excluídas em uma única expressão
+
+    Args:
+        prefixes: Prefixos em notação de ponto; '*' vale por um trecho qualquer do caminho
+            (processes.watched.*.pids)
+
+    Returns:
+        Expressão que casa com o início dos caminhos excluídos, ou None sem prefixos
+    """
+    patterns = [re.escape(prefix).replace(r"\*", r"[^.]+") for prefix in prefixes if prefix]
+    return re.compile("|".join(patterns)) if patterns else None
+
+
+def flatten_numeric(data: Any, exclude: Optional[Pattern] = None, prefix: str = "") -> Iterable[Tuple[str, float]]:
+    """
+    Percorre as métricas e devolve as folhas numéricas com o caminho em notação de ponto
+
+    Listas de números viram séries indexadas (cpu.per_cpu_percent.0) e listas de
+    dicionários usam o primeiro campo de ITEM_KEYS presente no item como chave
+    (disk.partitions./.percent). Textos e listas sem chave são ignorados.
+
+    Args:
+        data: Métricas (ou uma seção delas)
+        exclude: Caminhos a ignorar (ver exclude_pattern)
+        prefix: Caminho da seção atual
+
+    Returns:
+        Iterador de (série, valor)
+    """
+    if isinstance(data, (int, float)):
+        yield prefix, float(data)
+    elif isinstance(data, dict):
+        for key, value in data.items():
+            path = f"{prefix}.{key}" if prefix else str(key)
+            if exclude and exclude.match(path):
+                continue
+            yield from flatten_numeric(value, exclude, path)
+    elif isinstance(data, list):
+        for index, item in enumerate(data):
+            if isinstance(item, dict):
+                key = next((item[field] for field in ITEM_KEYS if item.get(field) is not None), None)
+                if key is None:
+                    continue
+                item = {k: v for k, v in item.items() if k not in ITEM_KEYS}
+            elif isinstance(item, (int, float)):
+                key = index
+            else:
+                continue
+            yield from flatten_numeric(item, exclude, f"{prefix}.{key}")
+
+
+class HistoryBuffer:
+    """Buffer circular colunar com as amostras numéricas recentes"""
+
+    def __init__(self, capacity: int, max_series: int, exclude: Iterable[str] = DEFAULT_EXCLUDE):
+        """
+        Inicializa o buffer
+
+        Args:
+            capacity: Número de linhas (amostras) mantidas; as mais antigas são sobrescritas
+            max_series: Número máximo de séries; com o limite atingido, uma série nova ocupa a
+                coluna de uma série sem nenhum valor no buffer, ou é ignorada se não houver
+            exclude: Prefixos de séries que não são guardadas ('*' vale por um trecho do caminho)
+        """
+        self.capacity = max(1, int(capacity))
+        self.max_series = max(1, int(max_series))
+        self.exclude = tuple(exclude)
+        self._exclude = exclude_pattern(self.exclude)
+
+        # Coluna de tempo pré-alocada; as colunas de séries são criadas na primeira vez que aparecem
+        self._timestamps = array('d', bytes(8 * self.capacity))
+        self._columns: Dict[str, array] = {}
+        # Número da última amostra com valor em cada série; abaixo de _seq - capacity a coluna é só NaN
+        self._last_seen: Dict[str, int] = {}
+        self._seq = 0
+        self._head = 0
+        self.count = 0
+        self.dropped_series = 0
+        self.evicted_series = 0
+        self._dropped_names = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "HistoryBuffer":
+        """
+        Cria o buffer a partir da seção history da configuração
+
+        A capacidade é limitada para que o buffer completo (todas as séries) caiba em max_mb.
+
+        Args:
+            config: Seção history
+        """
+        max_series = int(config.get("max_series", 256))
+        max_bytes = float(config.get("max_mb", 4)) * 1024 * 1024
+        capacity = min(int(config.get("max_samples", 2048)), int(max_bytes // (8 * (max_series + 1))))
+        exclude = config.get("exclude", DEFAULT_EXCLUDE)
+        return cls(capacity, max_series, exclude or ())
+
+    def append(self, metrics: Dict[str, Any], timestamp: float) -> None:
+        """
+        Grava uma amostra no buffer
+
+        Args:
+            metrics: Métricas do ciclo
+            timestamp: Instante da amostra
+        """
+        values = dict(flatten_numeric(metrics, self._exclude))
+        with self._lock:
+            row = self._head
+            seq = self._seq
+            self._timestamps[row] = timestamp
+            # Sem coluna livre para uma série, não há para as demais desta amostra
+            full = False
+            for name in values:
+                if name not in self._columns:
+                    if len(self._columns) < self.max_series:
+                        column = array('d', [NAN]) * self.capacity
+                    else:
+                        column = None if full else self._free_column(seq)
+                        full = column is None
+                    if column is None:
+                        if name not in self._dropped_names and len(self._dropped_names) < DROPPED_NAMES_LIMIT:
+                            self._dropped_names.add(name)
+                            self.dropped_series += 1
+                        continue
+                    self._columns[name] = column
+                    self._dropped_names.discard(name)
+            # Séries ausentes nesta amostra ficam como NaN, sobrescrevendo o valor antigo da linha
+            last_seen = self._last_seen
+            for name, column in self._columns.items():
+                value = values.get(name)
+                if value is None:
+                    column[row] = NAN
+                else:
+                    column[row] = value
+                    last_seen[name] = seq
+            self._seq = seq + 1
+            self._head = (row + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def _free_column(self, seq: int) -> Optional[array]:
+        """
+        Libera a coluna da série vista há mais tempo se ela não tiver mais nenhum valor no buffer
+
+        Interfaces, discos e processos que somem deixam de ocupar uma das max_series. Chamado
+        com _lock antes de gravar a amostra seq; a linha sobrescrita por ela não conta.
+
+        Returns:
+            Coluna liberada (reaproveitada pela série nova), ou None se todas têm valores
+        """
+        if not self._last_seen:
+            # Limite atingido já na primeira amostra
+            return None
+        name = min(self._last_seen, key=self._last_seen.get)
+        if self._last_seen[name] > seq - self.capacity:
+            return None
+        del self._last_seen[name]
+        self.evicted_series += 1
+        return self._columns.pop(name)
+
+    def _rows(self) -> List[int]:
+        """Índices das linhas ocupadas, da mais antiga para a mais recente"""
+        start = (self._head - self.count) % self.capacity
+        return [(start + i) % self.capacity for i in range(self.count)]
+
+    def dump(self, start: Optional[float] = None, end: Optional[float] = None,
+             series: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Extrai as amostras de um intervalo de tempo como bloco colunar comprimido
+
+        Args:
+            start: Início do intervalo (epoch, inclusivo; padrão: amostra mais antiga)
+            end: Fim do intervalo (epoch, inclusivo; padrão: amostra mais recente)
+            series: Prefixos das séries desejadas (padrão: todas)
+
+        Returns:
+            Bloco com a coluna 'timestamp' seguida das séries com algum valor no intervalo
+        """
+        prefixes = tuple(series or ())
+        with self._lock:
+            rows = [row for row in self._rows()
+                    if (start is None or self._timestamps[row] >= start)
+                    and (end is None or self._timestamps[row] <= end)]
+            names = ["timestamp"]
+            columns = [array('d', (self._timestamps[row] for row in rows))]
+            for name, column in self._columns.items():
+                if prefixes and not name.startswith(prefixes):
+                    continue
+                values = array('d', (column[row] for row in rows))
+                if all(math.isnan(value) for value in values):
+                    continue
+                names.append(name)
+                columns.append(values)
+
+        block = {
+            "start": columns[0][0] if rows else start,
+            "end": columns[0][-1] if rows else end
+        }
+        block.update(encode_columns(names, columns, len(rows)))
+        return block
+
+    def memory_bytes(self) -> int:
+        """Memória ocupada pelas colunas do buffer"""
+        return 8 * self.capacity * (len(self._columns) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado do buffer para as estatísticas do agente"""
+        with self._lock:
+            oldest = self._timestamps[(self._head - self.count) % self.capacity] if self.count else None
+            return {
+                "samples": self.count,
+                "capacity": self.capacity,
+                "series": len(self._columns),
+                "dropped_series": self.dropped_series,
+                "evicted_series": self.evicted_series,
+                "oldest": oldest,
+                "bytes": self.memory_bytes()
+            }
@@ -0,0 +1,190 @@
+"""
+Pipeline de logging não bloqueante
+As chamadas de log apenas enfileiram o registro; uma thread dedicada (QueueListener)
+faz a formatação final e a escrita em console/arquivo. Mensagens repetidas de
+WARNING ou acima são limitadas por ponto de origem para que uma queda do broker
+não gere megabytes de avisos idênticos
+"""
+
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Any, List, Optional
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+_atexit_registered = False
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Formata cada registro como um objeto JSON por linha"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        suppressed = getattr(record, "suppressed", None)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Limita mensagens repetidas vindas do mesmo ponto do código"""
+
+    def __init__(self, window: float = 60.0, burst: int = 5, min_level: int = logging.WARNING, max_keys: int = 1024):
+        """
+        Inicializa o filtro
+
+        Args:
+            window: Janela em segundos da contagem de cada ponto de origem
+            burst: Mensagens liberadas por janela antes de suprimir
+            min_level: Nível a partir do qual o limite se aplica
+            max_keys: Máximo de pontos de origem acompanhados
+        """
+        super().__init__()
+        self.window = window
+        self.burst = max(1, burst)
+        self.min_level = min_level
+        self.max_keys = max_keys
+        self.suppressed_total = 0
+        # {(nível, arquivo, linha): [início da janela, liberadas, suprimidas]}
+        self._state: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.min_level:
+            return True
+
+        key = (record.levelno, record.pathname, record.lineno)
+        with self._lock:
+            state = self._state.get(key)
+            if state is None or record.created - state[0] >= self.window:
+                suppressed = int(state[2]) if state else 0
+                self._state[key] = [record.created, 1, 0]
+                if len(self._state) > self.max_keys:
+                    oldest = min(self._state, key=lambda k: self._state[k][0])
+                    del self._state[oldest]
+                if suppressed:
+                    # Resume na primeira mensagem liberada o que foi descartado na janela anterior
+                    record.suppressed = suppressed
+                    record.msg = f"{record.msg} [{suppressed} mensagens repetidas suprimidas]"
+                return True
+
+            state[1] += 1
+            if state[1] <= self.burst:
+                return True
+            state[2] += 1
+            self.suppressed_total += 1
+            return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler que descarta registros quando a fila está cheia em vez de bloquear"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Enfileira uma cópia do registro sem formatá-lo
+
+        O QueueHandler padrão formata a mensagem na thread que registrou e descarta
+        args e exc_info; aqui a formatação (inclusive o campo "exception" do JSON)
+        fica toda com o listener.
+        """
+        return copy.copy(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def build_formatter(fmt: str) -> logging.Formatter:
+    """
+    Cria o formatador de saída
+
+    Args:
+        fmt: "text" ou "json"
+    """
+    if fmt == "json":
+        return JsonLinesFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def configure_logging(logger: logging.Logger, level: int, handlers: List[logging.Handler],
+                      queue_size: int = 10000, rate_limit: Optional[RateLimitFilter] = None) -> None:
+    """
+    Liga o logger às saídas através de uma fila processada em thread própria
+
+    Args:
+        logger: Logger do agente
+        level: Nível mínimo
+        handlers: Saídas finais (console, arquivo), executadas na thread do listener
+        queue_size: Máximo de registros pendentes antes de descartar
+        rate_limit: Filtro de mensagens repetidas aplicado antes de enfileirar
+    """
+    global _listener, _queue_handler, _atexit_registered
+
+    stop_logging()
+    for handler in logger.handlers[:]:
+        logger.removeHandler(handler)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.setLevel(level)
+    if rate_limit:
+        _queue_handler.addFilter(rate_limit)
+
+    logger.setLevel(level)
+    logger.addHandler(_queue_handler)
+    # As saídas ficam todas no listener; propagar duplicaria as linhas no handler raiz
+    logger.propagate = False
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    if not _atexit_registered:
+        atexit.register(stop_logging)
+        _atexit_registered = True
+
+
+def stop_logging() -> None:
+    """Escreve os registros pendentes e encerra a thread de logging"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def logging_stats() -> Dict[str, int]:
+    """Retorna contadores do pipeline para as métricas do próprio agente"""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0, "suppressed": 0}
+    suppressed = sum(
+        f.suppressed_total for f in _queue_handler.filters if isinstance(f, RateLimitFilter)
+    )
+    return {
+        "queued": _queue_handler.queue.qsize(),
+        "dropped": _queue_handler.dropped,
+        "suppressed": suppressed
+    }
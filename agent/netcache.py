@@ -0,0 +1,127 @@
+"""
+Cache persistente de informações de rede
+Guarda o IP público e as informações de ASN no diretório de estado do agente,
+para que um reinício em uma rede inalterada não consulte os serviços externos
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger("MonitoringAgent")
+
+CACHE_VERSION = 1
+
+
+class NetworkInfoCache:
+    """Cache em disco do IP público (por IP privado) e do ASN (por IP público), com TTL"""
+
+    def __init__(self, path: str, public_ip_ttl: float = 300, asn_ttl: float = 3600, max_entries: int = 32):
+        """
+        Inicializa o cache e carrega o arquivo existente
+
+        Args:
+            path: Arquivo do cache no diretório de estado
+            public_ip_ttl: Validade em segundos do IP público associado a um IP privado
+            asn_ttl: Validade em segundos das informações de ASN de um IP público
+            max_entries: Máximo de IPs guardados em cada tabela (os mais antigos são descartados)
+        """
+        self.path = path
+        self.public_ip_ttl = public_ip_ttl
+        self.asn_ttl = asn_ttl
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._public_ips: Dict[str, Dict[str, Any]] = {}
+        self._asn: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def load(self) -> None:
+        """Carrega o cache do disco, ignorando arquivos ausentes, corrompidos ou de outra versão"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cache de rede ignorado ({self.path}): {e}")
+            return
+
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return
+        with self._lock:
+            self._public_ips = dict(data.get("public_ips", {}))
+            self._asn = dict(data.get("asn", {}))
+        logger.info(f"Cache de rede carregado: {len(self._public_ips)} IPs públicos, {len(self._asn)} ASNs")
+
+    def save(self) -> None:
+        """Grava o cache atomicamente (arquivo temporário + rename)"""
+        with self._lock:
+            data = {
+                "version": CACHE_VERSION,
+                "public_ips": dict(self._public_ips),
+                "asn": dict(self._asn)
+            }
+
+        tmp_path = f"{self.path}.tmp"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(data, file, ensure_ascii=False)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Erro ao gravar cache de rede ({self.path}): {e}")
+
+    @staticmethod
+    def _fresh(entry: Optional[Dict[str, Any]], ttl: float, now: float) -> bool:
+        """Verifica se uma entrada existe e está dentro da validade"""
+        return bool(entry) and 0 <= now - entry.get("fetched_at", 0) < ttl
+
+    def _trim(self, table: Dict[str, Dict[str, Any]]) -> None:
+        """Descarta as entradas mais antigas além de max_entries"""
+        while len(table) > self.max_entries:
+            oldest = min(table, key=lambda key: table[key].get("fetched_at", 0))
+            del table[oldest]
+
+    def get_public_ip(self, private_ip: Optional[str], now: Optional[float] = None) -> Optional[str]:
+        """
+        Retorna o IP público conhecido para o IP privado atual, se ainda válido
+
+        Args:
+            private_ip: IP privado atual, usado como identificação da rede local
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._public_ips.get(private_ip or "")
+            if self._fresh(entry, self.public_ip_ttl, now):
+                return entry["ip"]
+        return None
+
+    def set_public_ip(self, private_ip: Optional[str], public_ip: str) -> None:
+        """Registra o IP público observado a partir do IP privado atual"""
+        with self._lock:
+            self._public_ips[private_ip or ""] = {"ip": public_ip, "fetched_at": time.time()}
+            self._trim(self._public_ips)
+        self.save()
+
+    def get_asn(self, public_ip: str, now: Optional[float] = None) -> Optional[Dict[str, str]]:
+        """Retorna as informações de ASN do IP público, se ainda válidas"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._asn.get(public_ip)
+            if self._fresh(entry, self.asn_ttl, now):
+                return dict(entry["info"])
+        return None
+
+    def set_asn(self, public_ip: str, asn_info: Dict[str, str]) -> None:
+        """Registra as informações de ASN de um IP público"""
+        with self._lock:
+            self._asn[public_ip] = {"info": dict(asn_info), "fetched_at": time.time()}
+            self._trim(self._asn)
+        self.save()
@@ -0,0 +1,171 @@
+"""
+Detecção de mudanças de rede por eventos
+No Linux assina as notificações rtnetlink de links, endereços e rotas, permitindo
+que o agente só resolva novamente os IPs (e a lista de interfaces) quando o
+kernel informa uma mudança, em vez de sondar a cada ciclo
+"""
+
+import time
+import errno
+import socket
+import struct
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger("MonitoringAgent")
+
+NETLINK_ROUTE = 0
+
+# Grupos multicast rtnetlink (linux/rtnetlink.h)
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+RTMGRP_IPV6_IFADDR = 0x100
+RTMGRP_IPV6_ROUTE = 0x400
+
+# Tipos de mensagem relevantes
+RTM_EVENTS = {
+    16: "link",     # RTM_NEWLINK
+    17: "link",     # RTM_DELLINK
+    20: "address",  # RTM_NEWADDR
+    21: "address",  # RTM_DELADDR
+    24: "route",    # RTM_NEWROUTE
+    25: "route",    # RTM_DELROUTE
+}
+
+# Cabeçalho nlmsghdr: tamanho, tipo, flags, sequência, pid
+NLMSG_HEADER = struct.Struct("=IHHII")
+NLMSG_ALIGN = 4
+
+
+def netlink_supported() -> bool:
+    """Indica se a plataforma oferece sockets netlink"""
+    return hasattr(socket, "AF_NETLINK")
+
+
+class NetworkChangeWatcher:
+    """Contador de gerações de rede incrementado a cada notificação do kernel"""
+
+    def __init__(self, debounce: float = 1.0):
+        """
+        Inicializa o observador
+
+        Args:
+            debounce: Tempo em segundos para agrupar rajadas de eventos em uma única mudança
+        """
+        self.debounce = debounce
+        self.generation = 0
+        self.events: Dict[str, int] = {"link": 0, "address": 0, "route": 0}
+        self.last_change_at: Optional[float] = None
+        self.active = False
+        self.error: Optional[str] = None
+
+        self._socket: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pending_since: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self) -> bool:
+        """
+        Abre o socket netlink e inicia a thread de leitura
+
+        Returns:
+            True se a detecção por eventos está ativa, False se o agente deve sondar
+        """
+        if not netlink_supported():
+            self.error = "netlink indisponível nesta plataforma"
+            return False
+
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV6_IFADDR
+                       | RTMGRP_IPV4_ROUTE | RTMGRP_IPV6_ROUTE))
+            # Timeout curto para aplicar o debounce e perceber o stop()
+            sock.settimeout(0.5)
+        except OSError as e:
+            self.error = str(e)
+            logger.warning(f"Não foi possível assinar eventos de rede via netlink: {e}")
+            return False
+
+        self._socket = sock
+        self._stopped.clear()
+        self.active = True
+        self._thread = threading.Thread(target=self._run, name="netlink-watcher", daemon=True)
+        self._thread.start()
+        logger.info("Detecção de mudanças de rede via netlink ativa")
+        return True
+
+    def stop(self) -> None:
+        """Encerra a thread de leitura e fecha o socket"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+        self.active = False
+
+    def _run(self) -> None:
+        """Lê notificações do kernel até stop()"""
+        while not self._stopped.is_set():
+            try:
+                data = self._socket.recv(65536)
+            except socket.timeout:
+                data = None
+            except OSError as e:
+                # ENOBUFS: o kernel descartou notificações; trata como mudança
+                if e.errno == errno.ENOBUFS:
+                    self._mark("route")
+                    continue
+                if not self._stopped.is_set():
+                    self.error = str(e)
+                    self.active = False
+                    logger.warning(f"Leitura de eventos netlink interrompida, voltando à sondagem: {e}")
+                return
+
+            if data:
+                for kind in self._parse(data):
+                    self._mark(kind)
+            self._flush()
+
+    @staticmethod
+    def _parse(data: bytes):
+        """Extrai o tipo de cada mensagem netlink do datagrama"""
+        offset = 0
+        while offset + NLMSG_HEADER.size <= len(data):
+            length, msg_type, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+            if length < NLMSG_HEADER.size:
+                break
+            kind = RTM_EVENTS.get(msg_type)
+            if kind:
+                yield kind
+            offset += (length + NLMSG_ALIGN - 1) & ~(NLMSG_ALIGN - 1)
+
+    def _mark(self, kind: str) -> None:
+        """Registra um evento, adiando a nova geração até o fim da rajada"""
+        with self._lock:
+            self.events[kind] += 1
+            if self._pending_since is None:
+                self._pending_since = time.time()
+
+    def _flush(self) -> None:
+        """Publica uma nova geração quando a rajada de eventos termina"""
+        with self._lock:
+            if self._pending_since is not None and time.time() - self._pending_since >= self.debounce:
+                self._pending_since = None
+                self.generation += 1
+                self.last_change_at = time.time()
+                logger.info("Mudança de rede detectada pelo kernel")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna o estado atual para as métricas do próprio agente"""
+        with self._lock:
+            return {
+                "active": self.active,
+                "generation": self.generation,
+                "events": dict(self.events),
+                "last_change_at": self.last_change_at,
+                "error": self.error
+            }
@@ -0,0 +1,162 @@
+"""
+Processos monitorados (metrics.processes.watch_processes)
+Compila as regras uma única vez em um casador combinado, aplicado pela tabela de
+processos quando um pid aparece; o resultado fica guardado com o pid entre os ciclos
+e cada regra acompanha todas as instâncias que casam, com CPU e memória somados
+"""
+
+import re
+import logging
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+import psutil
+
+logger = logging.getLogger("MonitoringAgent")
+
+# Pids listados por regra no payload
+MAX_LISTED_PIDS = 20
+
+
+class WatchRule:
+    """Critérios de uma regra de processo monitorado (todos precisam casar)"""
+
+    __slots__ = ("name", "process", "exe", "cmdline", "user")
+
+    def __init__(self, name: str, process: Optional[str] = None, exe: Optional[str] = None,
+                 cmdline: Optional[str] = None, user: Optional[str] = None):
+        """
+        Inicializa a regra
+
+        Args:
+            name: Nome da regra (chave em processes.watched)
+            process: Regex do nome do processo (sem diferenciar maiúsculas)
+            exe: Regex do caminho do executável
+            cmdline: Regex da linha de comando (argumentos unidos por espaço)
+            user: Usuário dono do processo
+        """
+        self.name = name
+        self.process = re.compile(process, re.IGNORECASE) if process else None
+        self.exe = re.compile(exe) if exe else None
+        self.cmdline = re.compile(cmdline) if cmdline else None
+        self.user = user
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "WatchRule":
+        """
+        Cria a regra a partir de um item de watch_processes
+
+        Sem process, exe ou cmdline, vale o comportamento original: o nome da regra
+        como trecho do nome do processo.
+        """
+        name = config.get("name")
+        if not name:
+            raise ValueError("regra sem 'name'")
+        process = config.get("process")
+        if not (process or config.get("exe") or config.get("cmdline")):
+            process = re.escape(name)
+        try:
+            return cls(name, process, config.get("exe"), config.get("cmdline"), config.get("user"))
+        except re.error as e:
+            raise ValueError(f"expressão inválida na regra '{name}': {e}")
+
+
+class ProcessMatcher:
+    """Casador combinado das regras de processos monitorados"""
+
+    def __init__(self, rules: List[WatchRule]):
+        """
+        Inicializa o casador
+
+        Args:
+            rules: Regras, na ordem da configuração
+        """
+        self.rules = rules
+        # Uma única regex com os nomes de todas as regras descarta de uma vez os processos que não interessam
+        patterns = [rule.process.pattern for rule in rules if rule.process]
+        try:
+            self._names = re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE) if patterns else None
+        except re.error:
+            # Padrões que não podem ser combinados (flags globais) são testados um a um
+            self._names = None
+
+    @classmethod
+    def from_config(cls, watch_config: List[Dict[str, Any]]) -> "ProcessMatcher":
+        """Cria o casador a partir de watch_processes, ignorando (com aviso) as regras inválidas"""
+        rules = []
+        for rule_config in watch_config or []:
+            try:
+                rules.append(WatchRule.from_config(rule_config))
+            except (ValueError, TypeError) as e:
+                logger.warning(f"Regra de processo monitorado ignorada: {e}")
+        return cls(rules)
+
+    def match(self, process, name: str, username: Optional[str]) -> Tuple[int, ...]:
+        """
+        Regras que casam com um processo
+
+        Executável e linha de comando só são lidos se alguma regra candidata precisar deles.
+
+        Args:
+            process: psutil.Process
+            name: Nome do processo
+            username: Usuário dono do processo
+
+        Returns:
+            Índices das regras que casam
+        """
+        if not self.rules:
+            return ()
+        name_hit = bool(self._names.search(name)) if self._names else True
+        exe = cmdline = None
+        matches = []
+        for index, rule in enumerate(self.rules):
+            if rule.process and not (name_hit and rule.process.search(name)):
+                continue
+            if rule.user and rule.user != username:
+                continue
+            try:
+                if rule.exe:
+                    if exe is None:
+                        exe = process.exe() or ""
+                    if not rule.exe.search(exe):
+                        continue
+                if rule.cmdline:
+                    if cmdline is None:
+                        cmdline = " ".join(process.cmdline())
+                    if not rule.cmdline.search(cmdline):
+                        continue
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            matches.append(index)
+        return tuple(matches)
+
+    def summarize(self, matched: Iterable[Tuple[Tuple[int, ...], Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Soma as instâncias de cada regra
+
+        Args:
+            matched: Pares (índices das regras, amostra do processo) dos processos que casaram
+
+        Returns:
+            {regra: {running, instances, pid, pids, cpu_percent, memory_percent}}
+        """
+        instances: List[List[Dict[str, Any]]] = [[] for _ in self.rules]
+        for indexes, info in matched:
+            for index in indexes:
+                instances[index].append(info)
+
+        result = {}
+        for rule, infos in zip(self.rules, instances):
+            if not infos:
+                result[rule.name] = {"running": False, "instances": 0}
+                continue
+            pids = sorted(info["pid"] for info in infos)
+            result[rule.name] = {
+                "running": True,
+                "instances": len(infos),
+                "pid": pids[0],
+                "pids": pids[:MAX_LISTED_PIDS],
+                "cpu_percent": round(sum(info["cpu_percent"] or 0 for info in infos), 2),
+                "memory_percent": round(sum(info["memory_percent"] or 0 for info in infos), 3)
+            }
+        return result
@@ -0,0 +1,452 @@
+"""
+Tabela de processos incremental
+Mantém os objetos psutil.Process entre os ciclos, amostrando CPU e memória apenas
+dos processos vivos. No Linux pode assinar o proc connector (netlink) para receber
+fork, exec e exit do kernel: a tabela é atualizada por eventos, sem listar /proc a
+cada ciclo, e processos que nascem e morrem entre dois ciclos passam a ser contados
+"""
+
+import time
+import errno
+import socket
+import struct
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import psutil
+
+from netwatch import netlink_supported, NLMSG_HEADER, NLMSG_ALIGN
+from procmatch import ProcessMatcher
+
+logger = logging.getLogger("MonitoringAgent")
+
+NETLINK_CONNECTOR = 11
+
+# Canal do proc connector (linux/connector.h) e operações de assinatura (linux/cn_proc.h)
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+NLMSG_DONE = 3
+
+# Eventos de processo relevantes
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+
+# cn_msg: idx, val, seq, ack, len, flags; proc_event: what, cpu, timestamp_ns
+CN_MSG_HEADER = struct.Struct("=IIIIHH")
+PROC_EVENT_HEADER = struct.Struct("=IIQ")
+# fork: parent_pid, parent_tgid, child_pid, child_tgid; exec/exit: process_pid, process_tgid
+FORK_EVENT = struct.Struct("=iiii")
+PID_EVENT = struct.Struct("=ii")
+
+
+class ProcConnector:
+    """Assinatura dos eventos fork/exec/exit do proc connector"""
+
+    def __init__(self, on_fork, on_exec, on_exit, on_lost):
+        """
+        Inicializa a assinatura
+
+        Args:
+            on_fork: Chamado com o pid de cada novo processo (threads são ignoradas)
+            on_exec: Chamado com o pid de cada processo que executou outro programa
+            on_exit: Chamado com o pid de cada processo encerrado
+            on_lost: Chamado quando o kernel descarta eventos (a tabela deve ser revarrida)
+        """
+        self.on_fork = on_fork
+        self.on_exec = on_exec
+        self.on_exit = on_exit
+        self.on_lost = on_lost
+        self.active = False
+        self.error: Optional[str] = None
+        self.events: Dict[str, int] = {"fork": 0, "exec": 0, "exit": 0, "lost": 0}
+
+        self._socket: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _control(self, sock: socket.socket, operation: int) -> None:
+        """Envia uma operação de assinatura (listen/ignore) ao canal do proc connector"""
+        payload = struct.pack("=I", operation)
+        cn_msg = CN_MSG_HEADER.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0) + payload
+        header = NLMSG_HEADER.pack(NLMSG_HEADER.size + len(cn_msg), NLMSG_DONE, 0, 0, 0)
+        sock.send(header + cn_msg)
+
+    def start(self) -> bool:
+        """
+        Abre o socket netlink, assina os eventos e inicia a thread de leitura
+
+        Returns:
+            True se a tabela passa a ser atualizada por eventos, False se deve varrer /proc
+        """
+        if not netlink_supported():
+            self.error = "netlink indisponível nesta plataforma"
+            return False
+
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+            sock.bind((0, CN_IDX_PROC))
+            self._control(sock, PROC_CN_MCAST_LISTEN)
+            # Buffer maior para rajadas de fork em servidores de build
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            sock.settimeout(0.5)
+        except OSError as e:
+            self.error = str(e)
+            logger.warning(f"Não foi possível assinar o proc connector (requer CAP_NET_ADMIN): {e}")
+            return False
+
+        self._socket = sock
+        self._stopped.clear()
+        self.active = True
+        self._thread = threading.Thread(target=self._run, name="proc-connector", daemon=True)
+        self._thread.start()
+        logger.info("Tabela de processos atualizada por eventos do proc connector")
+        return True
+
+    def stop(self) -> None:
+        """Cancela a assinatura, encerra a thread de leitura e fecha o socket"""
+        self._stopped.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        if self._socket:
+            try:
+                self._control(self._socket, PROC_CN_MCAST_IGNORE)
+            except OSError:
+                pass
+            self._socket.close()
+            self._socket = None
+        self.active = False
+
+    def _run(self) -> None:
+        """Lê eventos do kernel até stop()"""
+        while not self._stopped.is_set():
+            try:
+                data = self._socket.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                # ENOBUFS: o kernel descartou eventos; a tabela é revarrida no próximo ciclo
+                if e.errno == errno.ENOBUFS:
+                    self.events["lost"] += 1
+                    self.on_lost()
+                    continue
+                if not self._stopped.is_set():
+                    self.error = str(e)
+                    self.active = False
+                    self.on_lost()
+                    logger.warning(f"Leitura do proc connector interrompida, voltando à varredura: {e}")
+                return
+
+            for what, pid in self._parse(data):
+                if what == PROC_EVENT_FORK:
+                    self.events["fork"] += 1
+                    self.on_fork(pid)
+                elif what == PROC_EVENT_EXEC:
+                    self.events["exec"] += 1
+                    self.on_exec(pid)
+                elif what == PROC_EVENT_EXIT:
+                    self.events["exit"] += 1
+                    self.on_exit(pid)
+
+    @staticmethod
+    def _parse(data: bytes):
+        """Extrai (evento, pid) das mensagens do datagrama, ignorando threads"""
+        offset = 0
+        while offset + NLMSG_HEADER.size <= len(data):
+            length = NLMSG_HEADER.unpack_from(data, offset)[0]
+            if length < NLMSG_HEADER.size:
+                break
+            body = offset + NLMSG_HEADER.size + CN_MSG_HEADER.size
+            if body + PROC_EVENT_HEADER.size <= offset + length:
+                what = PROC_EVENT_HEADER.unpack_from(data, body)[0]
+                event = body + PROC_EVENT_HEADER.size
+                if what == PROC_EVENT_FORK:
+                    _, _, child_pid, child_tgid = FORK_EVENT.unpack_from(data, event)
+                    if child_pid == child_tgid:
+                        yield what, child_tgid
+                elif what in (PROC_EVENT_EXEC, PROC_EVENT_EXIT):
+                    pid, tgid = PID_EVENT.unpack_from(data, event)
+                    if pid == tgid:
+                        yield what, tgid
+            offset += (length + NLMSG_ALIGN - 1) & ~(NLMSG_ALIGN - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado da assinatura para as estatísticas do agente"""
+        return {"active": self.active, "events": dict(self.events), "error": self.error}
+
+
+class _Entry:
+    """Processo acompanhado pela tabela"""
+
+    __slots__ = ("process", "info", "first_seen", "matches", "lower_name", "create_time")
+
+    def __init__(self, process, name: str, username: Optional[str], first_seen: float,
+                 create_time: Optional[float] = None):
+        self.process = process
+        # Identifica o processo junto com o pid: muda quando o pid é reaproveitado
+        self.create_time = create_time
+        # Reaproveitado a cada ciclo: só status, CPU e memória mudam
+        self.info: Dict[str, Any] = {
+            "pid": process.pid,
+            "name": name,
+            "username": username,
+            "status": None,
+            "cpu_percent": 0.0,
+            "memory_percent": 0.0
+        }
+        self.first_seen = first_seen
+        self.lower_name = name.lower()
+        # Regras de processos monitorados que casam com o pid, guardadas entre os ciclos
+        self.matches: Tuple[int, ...] = ()
+
+
+class ProcessTable:
+    """Processos vivos entre ciclos, atualizados por varredura ou pelo proc connector"""
+
+    def __init__(self, use_connector: bool = False, resync_interval: float = 300,
+                 matcher: Optional[ProcessMatcher] = None):
+        """
+        Inicializa a tabela
+
+        Args:
+            use_connector: Assina o proc connector no start() (Linux, requer CAP_NET_ADMIN)
+            resync_interval: Período da varredura completa de segurança com o proc connector ativo
+            matcher: Regras de processos monitorados, aplicadas a cada pid novo
+        """
+        self.use_connector = use_connector
+        self.resync_interval = resync_interval
+        self.connector: Optional[ProcConnector] = None
+        self.matcher = matcher
+        self.watched: Dict[str, Any] = {}
+        self._rematch = False
+
+        self._entries: Dict[int, _Entry] = {}
+        self._born: Dict[int, float] = {}
+        self._exited = set()
+        self._execed = set()
+        self._resync = True
+        self._last_scan = 0.0
+        self._last_sample: Optional[float] = None
+        # _lock protege o que os eventos do proc connector alteram; _pass_lock serializa as
+        # passadas (ciclo, comandos, recarga) sem segurar a thread do connector durante a passada
+        self._lock = threading.Lock()
+        self._pass_lock = threading.Lock()
+
+        # Totais desde o início e valores do último ciclo
+        self.spawned = 0
+        self.exited = 0
+        self.short_lived = 0
+        self._reported = (0, 0, 0)
+        self.churn: Dict[str, Any] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ProcessTable":
+        """
+        Cria a tabela a partir da seção metrics.processes da configuração
+
+        Args:
+            config: Seção metrics.processes
+        """
+        return cls(
+            bool(config.get("proc_connector", False)),
+            float(config.get("resync_interval", 300)),
+            ProcessMatcher.from_config(config.get("watch_processes", []))
+        )
+
+    @property
+    def event_driven(self) -> bool:
+        """Indica se a tabela está sendo atualizada por eventos do kernel"""
+        return bool(self.connector and self.connector.active)
+
+    def set_matcher(self, matcher: Optional[ProcessMatcher]) -> None:
+        """Troca as regras de processos monitorados; os pids já conhecidos são casados de novo no próximo ciclo"""
+        with self._pass_lock:
+            self.matcher = matcher
+            self._rematch = True
+
+    def start(self) -> bool:
+        """Assina o proc connector quando configurado; sem ele a tabela varre os pids a cada ciclo"""
+        if not self.use_connector:
+            return False
+        self.connector = ProcConnector(self._on_fork, self._on_exec, self._on_exit, self._on_lost)
+        return self.connector.start()
+
+    def stop(self) -> None:
+        """Cancela a assinatura do proc connector"""
+        if self.connector:
+            self.connector.stop()
+
+    def _on_fork(self, pid: int) -> None:
+        with self._lock:
+            self.spawned += 1
+            self._born[pid] = time.time()
+
+    def _on_exec(self, pid: int) -> None:
+        with self._lock:
+            self._execed.add(pid)
+
+    def _on_exit(self, pid: int) -> None:
+        with self._lock:
+            self.exited += 1
+            # Nasceu e morreu entre dois ciclos: nunca seria visto por uma varredura
+            if self._born.pop(pid, None) is not None:
+                self.short_lived += 1
+            elif pid in self._entries:
+                self._exited.add(pid)
+
+    def _on_lost(self) -> None:
+        with self._lock:
+            self._resync = True
+
+    def _track(self, pid: int, now: float) -> None:
+        """Passa a acompanhar um processo (nome e usuário são lidos uma única vez)"""
+        try:
+            process = psutil.Process(pid)
+            name = process.name()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return
+        try:
+            username = process.username()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            username = None
+        try:
+            create_time = process.create_time()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            create_time = None
+        entry = _Entry(process, name, username, now, create_time)
+        if self.matcher:
+            entry.matches = self.matcher.match(process, name, username)
+        self._entries[pid] = entry
+
+    def sample(self) -> List[Dict[str, Any]]:
+        """
+        Atualiza a tabela e amostra os processos vivos
+
+        Returns:
+            Lista de {pid, name, username, status, cpu_percent, memory_percent}; o uso de CPU
+            é a média desde o ciclo anterior (0 no primeiro ciclo de cada processo). Os
+            dicionários são reaproveitados entre ciclos e não devem ser alterados
+        """
+        with self._pass_lock:
+            return self._sample()
+
+    def _sample(self) -> List[Dict[str, Any]]:
+        """Passada da tabela; chamada com _pass_lock"""
+        now = time.time()
+        with self._lock:
+            born, self._born = self._born, {}
+            exited, self._exited = self._exited, set()
+            execed, self._execed = self._execed, set()
+            resync = self._resync or not self.event_driven or now - self._last_scan >= self.resync_interval
+            self._resync = False
+
+        if resync:
+            pids = set(psutil.pids())
+            new = pids.difference(self._entries)
+            gone = set(self._entries).difference(pids)
+            # Pid reaproveitado entre duas varreduras: mesmo número, outro processo
+            reused = {pid for pid in pids.intersection(self._entries) if self._reused(self._entries[pid])}
+            gone |= reused
+            new |= reused
+            if not self.event_driven and self._last_sample is not None:
+                # Sem eventos, nascimentos e mortes só são percebidos pela diferença entre varreduras
+                with self._lock:
+                    self.spawned += len(new)
+                    self.exited += len(gone)
+            self._last_scan = now
+        else:
+            new = set(born).difference(self._entries)
+            gone = exited
+
+        for pid in gone:
+            self._entries.pop(pid, None)
+        for pid in execed.intersection(self._entries):
+            # Outro programa no mesmo pid: nome e usuário são lidos de novo
+            del self._entries[pid]
+            new.add(pid)
+        for pid in new:
+            self._track(pid, now)
+        if self._rematch:
+            self._rematch = False
+            for entry in self._entries.values():
+                entry.matches = self.matcher.match(entry.process, entry.info["name"], entry.info["username"]) \
+                    if self.matcher else ()
+
+        processes = []
+        matched = []
+        for pid, entry in list(self._entries.items()):
+            process = entry.process
+            info = entry.info
+            try:
+                with process.oneshot():
+                    info["status"] = process.status()
+                    info["cpu_percent"] = process.cpu_percent(None)
+                    info["memory_percent"] = process.memory_percent()
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                del self._entries[pid]
+                continue
+            except psutil.AccessDenied:
+                # Continua contado, como o process_iter fazia: só os campos negados ficam nulos
+                info["cpu_percent"] = None
+                info["memory_percent"] = None
+            processes.append(info)
+            if entry.matches:
+                matched.append((entry.matches, info))
+
+        self.watched = self.matcher.summarize(matched) if self.matcher else {}
+        self._update_churn(now)
+        return processes
+
+    @staticmethod
+    def _reused(entry: _Entry) -> bool:
+        """Indica se o pid do processo acompanhado passou a pertencer a outro processo"""
+        if entry.create_time is None:
+            return False
+        try:
+            return psutil.Process(entry.process.pid).create_time() != entry.create_time
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return False
+
+    def running(self, names: Tuple[str, ...]) -> bool:
+        """
+        Indica se algum processo acompanhado tem no nome um dos trechos (sem diferenciar maiúsculas)
+
+        Responde pela tabela da última passada, sem percorrer os processos do sistema.
+
+        Args:
+            names: Trechos em minúsculas
+        """
+        with self._pass_lock:
+            return any(part in entry.lower_name for entry in self._entries.values() for part in names)
+
+    def _update_churn(self, now: float) -> None:
+        """Calcula nascimentos, mortes e processos de vida curta desde o ciclo anterior"""
+        elapsed = now - self._last_sample if self._last_sample is not None else None
+        self._last_sample = now
+        with self._lock:
+            totals = (self.spawned, self.exited, self.short_lived)
+        spawned, exited, short_lived = (total - reported for total, reported in zip(totals, self._reported))
+        self._reported = totals
+        self.churn = {
+            "mode": "connector" if self.event_driven else "scan",
+            "spawned": spawned,
+            "exited": exited,
+            "spawn_rate": round(spawned / elapsed, 2) if elapsed else None,
+            # Só o proc connector vê processos que vivem menos que um ciclo
+            "short_lived": short_lived if self.event_driven else None
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado da tabela para as estatísticas do agente"""
+        with self._lock:
+            spawned, exited, short_lived = self.spawned, self.exited, self.short_lived
+        return {
+            "tracked": len(self._entries),
+            "spawned": spawned,
+            "exited": exited,
+            "short_lived": short_lived,
+            "connector": self.connector.snapshot() if self.connector else None
+        }
@@ -0,0 +1,80 @@
+"""
+Agendamento dos ciclos de coleta
+Cada host recebe uma fase estável dentro do intervalo, derivada do hostname, para
+que a frota publique distribuída ao longo do intervalo em vez de no mesmo segundo
+"""
+
+import time
+import hashlib
+from typing import Optional
+
+
+def phase_offset(key: str, interval: float) -> float:
+    """
+    Calcula a fase estável de um host dentro do intervalo
+
+    Args:
+        key: Identificador estável do host (normalmente o hostname)
+        interval: Intervalo de coleta em segundos
+
+    Returns:
+        Deslocamento em segundos no intervalo [0, interval)
+    """
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    fraction = int.from_bytes(digest[:8], "big") / float(1 << 64)
+    return fraction * interval
+
+
+class TickScheduler:
+    """Calcula deadlines alinhados a uma grade de relógio deslocada pela fase do host"""
+
+    def __init__(self, interval: float, phase: float = 0.0):
+        """
+        Inicializa o agendador
+
+        Args:
+            interval: Intervalo entre ciclos em segundos
+            phase: Deslocamento da grade em segundos
+        """
+        self.interval = float(interval)
+        self.phase = float(phase) % self.interval
+        self.missed_ticks = 0
+
+    def retune(self, interval: float) -> None:
+        """
+        Troca o intervalo mantendo a posição relativa do host na grade
+
+        Args:
+            interval: Novo intervalo entre ciclos em segundos
+        """
+        interval = float(interval)
+        self.phase = (self.phase / self.interval * interval) % interval
+        self.interval = interval
+
+    def next_deadline(self, now: Optional[float] = None) -> float:
+        """
+        Retorna o próximo instante da grade estritamente posterior a now
+
+        Deadlines perdidos (ciclo mais longo que o intervalo) são pulados,
+        mantendo a cadência do host em vez de acumular atraso.
+        """
+        now = time.time() if now is None else now
+        slots = int((now - self.phase) // self.interval) + 1
+        return self.phase + slots * self.interval
+
+    def advance(self, deadline: float, now: Optional[float] = None) -> float:
+        """
+        Calcula o deadline seguinte a partir do atual, contabilizando ciclos perdidos
+
+        Args:
+            deadline: Deadline do ciclo que acabou de rodar
+            now: Instante atual
+        """
+        now = time.time() if now is None else now
+        following = deadline + self.interval
+        if following > now:
+            return following
+
+        upcoming = self.next_deadline(now)
+        self.missed_ticks += int(round((upcoming - following) / self.interval))
+        return upcoming
@@ -0,0 +1,167 @@
+"""
+Verificação do estado de serviços do sistema
+Consulta systemctl (Linux) ou sc (Windows) em um pool de threads com timeout,
+guardando o resultado por um TTL para não disparar processos a cada ciclo
+"""
+
+import os
+import time
+import logging
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger("MonitoringAgent")
+
+# Evita abrir uma janela de console a cada consulta quando o agente roda com pythonw
+_CREATION_FLAGS = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+
+
+def find_install_path(paths: List[str]) -> Optional[str]:
+    """
+    Retorna o primeiro caminho de instalação existente
+
+    Args:
+        paths: Caminhos candidatos
+
+    Returns:
+        Caminho encontrado ou None
+    """
+    for path in paths or []:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class ServiceProber:
+    """Cache com TTL do estado de serviços, atualizado em segundo plano"""
+
+    def __init__(self, ttl: float = 60, timeout: float = 5, max_workers: int = 2):
+        """
+        Inicializa o verificador
+
+        Args:
+            ttl: Validade em segundos do estado de cada serviço
+            timeout: Tempo máximo em segundos de cada consulta
+            max_workers: Consultas simultâneas
+        """
+        self.ttl = ttl
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="service-probe")
+        self._services: Dict[str, str] = {}
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def set_services(self, services: Dict[str, str]) -> None:
+        """
+        Define os serviços verificados e agenda a primeira consulta de cada um
+
+        Args:
+            services: Dicionário {nome: nome do serviço no sistema (unidade systemd ou serviço Windows)}
+        """
+        with self._lock:
+            self._services = dict(services)
+            self._results = {name: result for name, result in self._results.items() if name in services}
+        for name in services:
+            self._schedule(name)
+
+    def status(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o último estado conhecido do serviço, agendando nova consulta se expirado
+
+        Só bloqueia (até o timeout) quando o serviço ainda não tem nenhum resultado.
+
+        Args:
+            name: Nome do serviço registrado em set_services
+
+        Returns:
+            Dicionário com active, state, checked_at e error, ou None se não registrado
+        """
+        with self._lock:
+            if name not in self._services:
+                return None
+            result = self._results.get(name)
+
+        if result is None or time.time() - result["checked_at"] >= self.ttl:
+            future = self._schedule(name)
+            if result is None and future is not None:
+                try:
+                    future.result(timeout=self.timeout + 1)
+                except Exception:
+                    pass
+                with self._lock:
+                    result = self._results.get(name)
+
+        return dict(result) if result else {"active": False, "state": "unknown", "checked_at": None, "error": None}
+
+    def _schedule(self, name: str) -> Optional[Future]:
+        """Agenda uma consulta do serviço, a menos que já exista uma em andamento"""
+        with self._lock:
+            service = self._services.get(name)
+            if service is None:
+                return None
+            future = self._pending.get(name)
+            if future is not None and not future.done():
+                return future
+            try:
+                future = self._executor.submit(self._probe, name, service)
+            except RuntimeError:
+                # Pool encerrado durante o desligamento
+                return None
+            self._pending[name] = future
+            return future
+
+    def _probe(self, name: str, service: str) -> None:
+        """Executa a consulta ao gerenciador de serviços e guarda o resultado"""
+        error = None
+        try:
+            if os.name == 'nt':
+                state = self._query_windows(service)
+                active = state == "running"
+            else:
+                state = self._query_systemd(service)
+                active = state == "active"
+        except subprocess.TimeoutExpired:
+            state, active, error = "unknown", False, f"timeout após {self.timeout}s"
+        except Exception as e:
+            state, active, error = "unknown", False, str(e)
+
+        if error:
+            logger.debug(f"Erro ao verificar serviço {name} ({service}): {error}")
+
+        with self._lock:
+            self._results[name] = {
+                "active": active,
+                "state": state,
+                "checked_at": time.time(),
+                "error": error
+            }
+
+    def _query_systemd(self, unit: str) -> str:
+        """Consulta o estado de uma unidade systemd (active, inactive, failed...)"""
+        completed = subprocess.run(
+            ["systemctl", "is-active", unit],
+            capture_output=True, text=True, timeout=self.timeout
+        )
+        # is-active retorna código diferente de zero para unidades inativas; a saída traz o estado
+        return completed.stdout.strip() or "unknown"
+
+    def _query_windows(self, service: str) -> str:
+        """Consulta o estado de um serviço Windows (running, stopped...)"""
+        completed = subprocess.run(
+            ["sc", "query", service],
+            capture_output=True, text=True, timeout=self.timeout, creationflags=_CREATION_FLAGS
+        )
+        for line in completed.stdout.splitlines():
+            # "        STATE              : 4  RUNNING"
+            if "STATE" in line and ":" in line:
+                fields = line.split(":", 1)[1].split()
+                if len(fields) >= 2:
+                    return fields[1].lower()
+        return "not_found" if completed.returncode else "unknown"
+
+    def shutdown(self) -> None:
+        """Encerra o pool de consultas sem aguardar as pendentes"""
+        self._executor.shutdown(wait=False)
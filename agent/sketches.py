@@ -0,0 +1,164 @@
+"""
+Sketches de quantis em streaming
+Implementa o DDSketch (Masson, Rim e Lee, 2019): buckets logarítmicos com erro relativo
+garantido, memória limitada e mesclagem exata entre sketches com a mesma precisão.
+Com o NumPy instalado, a inclusão de muitos valores de uma vez é vetorizada.
+"""
+
+import math
+from typing import Dict, Any, Iterable, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # NumPy é opcional: sem ele, os valores são incluídos um a um
+    np = None
+
+# Quantis do resumo enviado no payload
+SUMMARY_QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+
+# A partir deste número de valores, add_many usa o caminho vetorizado (quando há NumPy)
+VECTORIZE_MIN = 32
+
+
+class DDSketch:
+    """Sketch de quantis com erro relativo limitado e mesclável"""
+
+    __slots__ = ("relative_accuracy", "min_value", "max_bins", "gamma", "_log_gamma",
+                 "bins", "zero_count", "count", "minimum", "maximum")
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-3, max_bins: int = 1024):
+        """
+        Inicializa o sketch
+
+        Args:
+            relative_accuracy: Erro relativo máximo dos quantis (0.01 = 1%)
+            min_value: Valores até este limite caem no bucket de zero
+            max_bins: Limite de buckets; acima dele os buckets mais baixos são fundidos
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy deve estar entre 0 e 1")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_bins = max(2, int(max_bins))
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value: float) -> None:
+        """Inclui um valor"""
+        self.count += 1
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def add_many(self, values: Sequence[float]) -> None:
+        """Inclui vários valores (vetorizado com NumPy a partir de VECTORIZE_MIN valores)"""
+        if np is None or len(values) < VECTORIZE_MIN:
+            for value in values:
+                self.add(value)
+            return
+
+        data = np.asarray(values, dtype=np.float64)
+        self.count += int(data.size)
+        self.minimum = min(self.minimum, float(data.min()))
+        self.maximum = max(self.maximum, float(data.max()))
+
+        small = data <= self.min_value
+        self.zero_count += int(np.count_nonzero(small))
+        keys = np.ceil(np.log(data[~small]) / self._log_gamma).astype(np.int64)
+        unique, counts = np.unique(keys, return_counts=True)
+        bins = self.bins
+        for key, count in zip(unique.tolist(), counts.tolist()):
+            bins[key] = bins.get(key, 0) + count
+        if len(bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self) -> None:
+        """Funde os buckets mais baixos no menor bucket mantido (preserva os quantis altos)"""
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins
+        target = keys[excess]
+        self.bins[target] += sum(self.bins.pop(key) for key in keys[:excess])
+
+    def merge(self, other: "DDSketch") -> None:
+        """
+        Incorpora outro sketch (mesma precisão), como se os valores tivessem sido incluídos aqui
+
+        Args:
+            other: Sketch a incorporar
+        """
+        if not math.isclose(other.gamma, self.gamma):
+            raise ValueError("Só é possível mesclar sketches com a mesma precisão relativa")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estima um quantil
+
+        Args:
+            q: Quantil entre 0 e 1
+
+        Returns:
+            Valor estimado (None sem observações)
+        """
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.minimum
+        if q >= 1:
+            return self.maximum
+
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return self.minimum
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.minimum), self.maximum)
+        return self.maximum
+
+    def summary(self) -> Dict[str, Any]:
+        """Resumo compacto para o payload: contagem, p50, p90, p99 e máximo"""
+        result: Dict[str, Any] = {"count": self.count}
+        for name, q in SUMMARY_QUANTILES:
+            value = self.quantile(q)
+            result[name] = round(value, 2) if value is not None else None
+        result["max"] = round(self.maximum, 2) if self.count else None
+        return result
+
+
+def summarize(values: Iterable[float], relative_accuracy: float = 0.01) -> Dict[str, Any]:
+    """
+    Resumo de quantis de um conjunto de valores
+
+    Args:
+        values: Valores (por exemplo, o percentual de cada núcleo)
+        relative_accuracy: Erro relativo máximo dos quantis
+
+    Returns:
+        {count, p50, p90, p99, max}
+    """
+    sketch = DDSketch(relative_accuracy)
+    sketch.add_many(values if isinstance(values, Sequence) else list(values))
+    return sketch.summary()
@@ -0,0 +1,174 @@
+"""
+Telemetria do próprio agente
+Histogramas de latência com buckets fixos para cada coletor e etapa de publicação,
+além do consumo de recursos do processo, enviados em agent_stats a cada payload
+"""
+
+import os
+import time
+import threading
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple
+
+import psutil
+
+# Limites superiores dos buckets em milissegundos; o último bucket acumula o excedente
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Histograma cumulativo de latências com buckets fixos"""
+
+    def __init__(self, bounds_ms=BUCKET_BOUNDS_MS):
+        """
+        Inicializa o histograma
+
+        Args:
+            bounds_ms: Limites superiores dos buckets em milissegundos, em ordem crescente
+        """
+        self.bounds_ms = tuple(bounds_ms)
+        self.buckets = array('L', [0] * (len(self.bounds_ms) + 1))
+        self.count = 0
+        self.sum_ms = 0.0
+        self.last_ms = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Registra uma duração"""
+        ms = seconds * 1000.0
+        self.buckets[bisect_left(self.bounds_ms, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.last_ms = ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna os contadores em formato compacto (buckets não cumulativos)"""
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 3),
+            "last_ms": round(self.last_ms, 3),
+            "buckets": self.buckets.tolist()
+        }
+
+
+class AgentTelemetry:
+    """Latências por etapa e consumo de recursos do processo do agente"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._process = psutil.Process(os.getpid())
+        # Referência (instante, tempo de CPU) do percentual de CPU do processo, avançada só pelo ciclo;
+        # não usa Process.cpu_percent, cuja referência seria consumida também por snapshots e diagnósticos
+        self._cpu_baseline = self._cpu_reading()
+
+        self.publishes = 0
+        self.publish_failures = 0
+        self.payload_bytes_total = 0
+        self.last_payload_bytes = 0
+
+    def observe(self, name: str, seconds: float) -> None:
+        """
+        Registra a duração de uma etapa
+
+        Args:
+            name: Etapa (ex.: collector.processes, publish)
+            seconds: Duração em segundos
+        """
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, name: str):
+        """Mede a duração do bloco e a registra na etapa informada"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def record_publish(self, payload_bytes: Optional[int], success: bool) -> None:
+        """
+        Contabiliza uma tentativa de publicação
+
+        Args:
+            payload_bytes: Tamanho do corpo da mensagem, se chegou a ser serializado
+            success: Resultado da publicação
+        """
+        with self._lock:
+            if success:
+                self.publishes += 1
+            else:
+                self.publish_failures += 1
+            if payload_bytes is not None:
+                self.payload_bytes_total += payload_bytes
+                self.last_payload_bytes = payload_bytes
+
+    def _cpu_reading(self) -> Optional[Tuple[float, float]]:
+        """Instante e tempo de CPU (user + system) do processo"""
+        try:
+            cpu_times = self._process.cpu_times()
+        except (psutil.Error, OSError):
+            return None
+        return time.monotonic(), cpu_times.user + cpu_times.system
+
+    def process_usage(self, advance: bool = True) -> Dict[str, Any]:
+        """
+        Retorna o consumo de recursos do processo do agente
+
+        Args:
+            advance: Avança a referência do percentual de CPU (só o ciclo normal); snapshots e
+                diagnósticos leem o percentual desde o último ciclo sem alterá-la
+        """
+        usage: Dict[str, Any] = {}
+        try:
+            with self._process.oneshot():
+                cpu_times = self._process.cpu_times()
+                now = time.monotonic()
+                usage["rss_mb"] = round(self._process.memory_info().rss / (1024**2), 2)
+                usage["cpu_user_s"] = round(cpu_times.user, 3)
+                usage["cpu_system_s"] = round(cpu_times.system, 3)
+                busy = cpu_times.user + cpu_times.system
+                with self._lock:
+                    baseline = self._cpu_baseline
+                    if advance:
+                        self._cpu_baseline = (now, busy)
+                # Percentual de um núcleo, como Process.cpu_percent
+                elapsed = now - baseline[0] if baseline else 0
+                usage["cpu_percent"] = round(100 * max(0.0, busy - baseline[1]) / elapsed, 1) if elapsed > 0 else 0.0
+                usage["threads"] = self._process.num_threads()
+                if hasattr(self._process, "num_fds"):
+                    usage["open_fds"] = self._process.num_fds()
+                elif hasattr(self._process, "num_handles"):
+                    usage["open_handles"] = self._process.num_handles()
+        except (psutil.Error, OSError):
+            pass
+        return usage
+
+    def snapshot(self, advance: bool = True) -> Dict[str, Any]:
+        """
+        Retorna a seção compacta de telemetria para agent_stats
+
+        Args:
+            advance: Repassado a process_usage (False fora do ciclo normal)
+        """
+        with self._lock:
+            timings = {name: histogram.snapshot() for name, histogram in sorted(self._histograms.items())}
+            publish = {
+                "published": self.publishes,
+                "failures": self.publish_failures,
+                "payload_bytes_total": self.payload_bytes_total,
+                "last_payload_bytes": self.last_payload_bytes
+            }
+        return {
+            "uptime": round(time.time() - self.started_at, 1),
+            "process": self.process_usage(advance),
+            "publish": publish,
+            "bucket_bounds_ms": list(BUCKET_BOUNDS_MS),
+            "timings": timings
+        }
@@ -0,0 +1,495 @@
+"""
+Transportes de publicação dos dados coletados
+Cada transporte só sabe abrir, enviar um lote de mensagens e fechar: AMQP
+(RabbitMQ), fila em memória, arquivo JSON lines segmentado ou stdout. Acima deles,
+o BatchPublisher concentra o que é comum: agrupamento em lotes, reconexão pela
+ReconnectPolicy e um reenvio imediato quando uma conexão estabelecida cai
+"""
+
+import os
+import sys
+import json
+import abc
+import time
+import queue
+import logging
+from typing import Dict, Any, List, Optional, Callable
+
+import pika
+
+from backoff import ReconnectPolicy
+
+logger = logging.getLogger("MonitoringAgent")
+
+# Transportes aceitos em transport.type
+TRANSPORT_TYPES = ("amqp", "inprocess", "file", "stdout")
+
+# Resultado de BatchPublisher.publish: lote enviado agora, mensagem guardada no lote ou lote perdido
+PUBLISH_SENT = "sent"
+PUBLISH_QUEUED = "queued"
+PUBLISH_FAILED = "failed"
+
+
+def _describe(error: Exception) -> str:
+    """Mensagem da exceção; algumas do pika não têm texto, então usa o nome da classe"""
+    return str(error) or type(error).__name__
+
+
+class Transport(abc.ABC):
+    """Interface dos transportes de dados"""
+
+    name = "base"
+
+    @property
+    def is_open(self) -> bool:
+        return True
+
+    def encode(self, data: Dict[str, Any]) -> Any:
+        """Serializa o payload no formato enviado pelo transporte"""
+        return json.dumps(data)
+
+    def open(self) -> None:
+        """Abre o transporte; falhas são sinalizadas por exceção"""
+
+    @abc.abstractmethod
+    def publish(self, messages: List[Any]) -> None:
+        """Envia um lote de mensagens já serializadas; falhas são sinalizadas por exceção"""
+
+    def poll(self) -> None:
+        """Processa eventos pendentes do transporte (heartbeats, avisos do broker)"""
+
+    def close(self) -> None:
+        """Fecha o transporte, ignorando erros"""
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Contadores específicos do transporte para agent_stats"""
+        return {}
+
+
+class AmqpTransport(Transport):
+    """Publicação em uma fila do RabbitMQ por uma conexão persistente"""
+
+    name = "amqp"
+
+    def __init__(self, parameters: Callable[[], pika.ConnectionParameters], queue_name: str,
+                 on_blocked: Optional[Callable] = None, on_unblocked: Optional[Callable] = None,
+                 queue_arguments: Optional[Dict[str, Any]] = None):
+        """
+        Inicializa o transporte
+
+        Args:
+            parameters: Função que monta os parâmetros de conexão (lidos a cada reconexão)
+            queue_name: Fila de dados
+            on_blocked: Callback do pika para connection.blocked
+            on_unblocked: Callback do pika para connection.unblocked
+            queue_arguments: Argumentos de declaração da fila (ex.: x-max-priority)
+        """
+        self._parameters = parameters
+        self.queue_name = queue_name
+        self.queue_arguments = queue_arguments
+        self._on_blocked = on_blocked
+        self._on_unblocked = on_unblocked
+        self._connection = None
+        self._channel = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._channel is not None and self._channel.is_open
+
+    def open(self) -> None:
+        connection = pika.BlockingConnection(self._parameters())
+        try:
+            if self._on_blocked:
+                connection.add_on_connection_blocked_callback(self._on_blocked)
+            if self._on_unblocked:
+                connection.add_on_connection_unblocked_callback(self._on_unblocked)
+            channel = connection.channel()
+            channel.queue_declare(queue=self.queue_name, durable=True, arguments=self.queue_arguments)
+        except Exception:
+            self._connection = connection
+            self.close()
+            raise
+        self._connection = connection
+        self._channel = channel
+
+    def publish(self, messages: List[Any]) -> None:
+        properties = pika.BasicProperties(
+            delivery_mode=2,  # Mensagem persistente
+            content_type='application/json'
+        )
+        for message in messages:
+            self._channel.basic_publish(exchange='', routing_key=self.queue_name, body=message, properties=properties)
+
+    def poll(self) -> None:
+        if self._connection is not None:
+            self._connection.process_data_events(time_limit=0)
+
+    def close(self) -> None:
+        connection = self._connection
+        self._connection = None
+        self._channel = None
+        if connection is not None:
+            try:
+                if connection.is_open:
+                    connection.close()
+            except Exception as e:
+                logger.debug(f"Erro ao fechar conexão de publicação: {e}")
+
+
+class InProcessTransport(Transport):
+    """Fila em memória para embutir o agente ou medir a coleta sem broker"""
+
+    name = "inprocess"
+
+    def __init__(self, max_messages: int = 1000, encoding: str = "none"):
+        """
+        Inicializa o transporte
+
+        Args:
+            max_messages: Mensagens retidas; ao encher, as mais antigas são descartadas
+            encoding: "none" entrega o próprio dicionário (sem cópia); "json" serializa como os demais
+        """
+        if encoding not in ("none", "json"):
+            raise ValueError(f"Codificação não suportada no transporte inprocess: {encoding}")
+        self.encoding = encoding
+        self.queue: queue.Queue = queue.Queue(maxsize=max(1, max_messages))
+        self.overflowed = 0
+
+    def encode(self, data: Dict[str, Any]) -> Any:
+        return data if self.encoding == "none" else json.dumps(data)
+
+    def publish(self, messages: List[Any]) -> None:
+        for message in messages:
+            while True:
+                try:
+                    self.queue.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.overflowed += 1
+                    except queue.Empty:
+                        pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"queued": self.queue.qsize(), "overflowed": self.overflowed}
+
+
+class FileTransport(Transport):
+    """Arquivos JSON lines append-only em segmentos, para coleta sem rede"""
+
+    name = "file"
+    SEGMENT_PREFIX = "segment-"
+    SEGMENT_SUFFIX = ".jsonl"
+
+    def __init__(self, directory: str, segment_max_bytes: int = 64 * 1024 * 1024,
+                 max_segments: int = 16, fsync: bool = True):
+        """
+        Inicializa o transporte
+
+        Args:
+            directory: Diretório dos segmentos
+            segment_max_bytes: Tamanho a partir do qual um novo segmento é iniciado
+            max_segments: Segmentos mantidos; os mais antigos são removidos (0 = sem limite)
+            fsync: Força a gravação em disco a cada lote
+        """
+        self.directory = directory
+        self.segment_max_bytes = max(1, segment_max_bytes)
+        self.max_segments = max(0, max_segments)
+        self.fsync = fsync
+        self._file = None
+        self._size = 0
+        self._last_stamp = 0
+        self.segments_rotated = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._file is not None and not self._file.closed
+
+    def _segments(self) -> List[str]:
+        """Segmentos existentes, do mais antigo para o mais novo"""
+        names = [
+            name for name in os.listdir(self.directory)
+            if name.startswith(self.SEGMENT_PREFIX) and name.endswith(self.SEGMENT_SUFFIX)
+        ]
+        return sorted(names)
+
+    def open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self._segments()
+        # Continua o segmento mais recente enquanto ele tiver espaço
+        if segments:
+            stamp = segments[-1][len(self.SEGMENT_PREFIX):-len(self.SEGMENT_SUFFIX)]
+            if stamp.isdigit():
+                self._last_stamp = max(self._last_stamp, int(stamp))
+            path = os.path.join(self.directory, segments[-1])
+            if os.path.getsize(path) < self.segment_max_bytes:
+                self._open_segment(path)
+                return
+        self._rotate()
+
+    def _open_segment(self, path: str) -> None:
+        self._file = open(path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+
+    def _rotate(self) -> None:
+        """Fecha o segmento atual, inicia um novo e remove os excedentes"""
+        if self._file is not None:
+            self._file.close()
+            self.segments_rotated += 1
+        # Nome pelo instante em ms, sempre crescente para manter a ordem mesmo com rotações no mesmo ms
+        self._last_stamp = max(int(time.time() * 1000), self._last_stamp + 1)
+        name = f"{self.SEGMENT_PREFIX}{self._last_stamp:013d}{self.SEGMENT_SUFFIX}"
+        self._open_segment(os.path.join(self.directory, name))
+
+        if self.max_segments:
+            for old in self._segments()[:-self.max_segments]:
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except OSError as e:
+                    logger.warning(f"Erro ao remover segmento antigo {old}: {e}")
+
+    def publish(self, messages: List[Any]) -> None:
+        chunk = "".join(f"{message}\n" for message in messages)
+        self._file.write(chunk)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._size += len(chunk.encode("utf-8"))
+        if self._size >= self.segment_max_bytes:
+            self._rotate()
+
+    def close(self) -> None:
+        file, self._file = self._file, None
+        if file is not None:
+            try:
+                file.close()
+            except OSError as e:
+                logger.debug(f"Erro ao fechar segmento: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "segment": os.path.basename(self._file.name) if self.is_open else None,
+            "segment_bytes": self._size,
+            "segments_rotated": self.segments_rotated
+        }
+
+
+class StdoutTransport(Transport):
+    """Uma mensagem JSON por linha na saída padrão (os logs vão para stderr)"""
+
+    name = "stdout"
+
+    def __init__(self, stream=None):
+        self._stream = stream
+
+    def publish(self, messages: List[Any]) -> None:
+        stream = self._stream or sys.stdout
+        stream.write("".join(f"{message}\n" for message in messages))
+        stream.flush()
+
+
+def build_transport(kind: str, config: Dict[str, Any], amqp_parameters: Callable[[], pika.ConnectionParameters],
+                    amqp_queue: str, on_blocked: Optional[Callable] = None, on_unblocked: Optional[Callable] = None,
+                    default_directory: str = "data/outbox") -> Transport:
+    """
+    Cria o transporte configurado
+
+    Args:
+        kind: Um de TRANSPORT_TYPES
+        config: Seção transport da configuração
+        amqp_parameters: Função que monta os parâmetros de conexão do RabbitMQ
+        amqp_queue: Fila de dados do RabbitMQ
+        on_blocked: Callback de connection.blocked (AMQP)
+        on_unblocked: Callback de connection.unblocked (AMQP)
+        default_directory: Diretório dos segmentos quando transport.file.directory não é informado
+
+    Returns:
+        Transporte ainda fechado
+    """
+    if kind == "amqp":
+        return AmqpTransport(amqp_parameters, amqp_queue, on_blocked, on_unblocked)
+    if kind == "inprocess":
+        inprocess_config = config.get("inprocess", {})
+        return InProcessTransport(
+            int(inprocess_config.get("max_messages", 1000)),
+            inprocess_config.get("encoding", "none")
+        )
+    if kind == "file":
+        file_config = config.get("file", {})
+        return FileTransport(
+            file_config.get("directory") or default_directory,
+            int(float(file_config.get("segment_max_mb", 64)) * 1024 * 1024),
+            int(file_config.get("max_segments", 16)),
+            bool(file_config.get("fsync", True))
+        )
+    if kind == "stdout":
+        return StdoutTransport()
+    raise ValueError(f"Transporte não suportado: {kind} (use {', '.join(TRANSPORT_TYPES)})")
+
+
+class BatchPublisher:
+    """Camada comum aos transportes: lotes, reconexão com backoff e reenvio após queda"""
+
+    def __init__(self, transport: Transport, policy: ReconnectPolicy, batch_size: int = 1,
+                 batch_max_delay: float = 0.0, retry_on_disconnect: bool = True,
+                 on_state: Optional[Callable[[str, Optional[str]], None]] = None):
+        """
+        Inicializa o publicador
+
+        Args:
+            transport: Transporte de destino
+            policy: Política de reconexão do transporte
+            batch_size: Mensagens acumuladas antes de cada envio
+            batch_max_delay: Idade máxima em segundos do lote antes do envio (0 = sem limite)
+            retry_on_disconnect: Reconecta e reenvia o lote uma vez quando uma conexão aberta falha
+            on_state: Chamado com (estado, erro) em connecting, connected, error e closed
+        """
+        self.transport = transport
+        self.policy = policy
+        self.batch_size = max(1, batch_size)
+        self.batch_max_delay = max(0.0, batch_max_delay)
+        self.retry_on_disconnect = retry_on_disconnect
+        self._on_state = on_state
+
+        self._batch: List[Any] = []
+        self._batch_started: Optional[float] = None
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+
+    @property
+    def connected(self) -> bool:
+        return self.transport.is_open
+
+    def encode(self, data: Dict[str, Any]) -> Any:
+        """Serializa o payload para o transporte"""
+        return self.transport.encode(data)
+
+    def publish(self, message: Any) -> str:
+        """
+        Adiciona a mensagem ao lote e o envia se estiver completo ou vencido
+
+        Returns:
+            PUBLISH_SENT se o lote foi enviado agora, PUBLISH_QUEUED se a mensagem aguarda
+            o fechamento do lote e PUBLISH_FAILED se o lote enviado agora falhou (as
+            mensagens dele são descartadas)
+        """
+        self._batch.append(message)
+        if self._batch_started is None:
+            self._batch_started = time.monotonic()
+        if len(self._batch) >= self.batch_size or self._batch_expired():
+            return PUBLISH_SENT if self.flush() else PUBLISH_FAILED
+        return PUBLISH_QUEUED
+
+    def _batch_expired(self) -> bool:
+        return (self.batch_max_delay > 0 and self._batch_started is not None
+                and time.monotonic() - self._batch_started >= self.batch_max_delay)
+
+    def flush(self) -> bool:
+        """
+        Envia o lote pendente
+
+        Returns:
+            True se o lote foi entregue ao transporte (ou estava vazio)
+        """
+        if not self._batch:
+            return True
+        batch, self._batch, self._batch_started = self._batch, [], None
+
+        for attempt in range(2):
+            was_open = self.transport.is_open
+            if not self._ensure_open():
+                break
+            try:
+                self.transport.publish(batch)
+            except Exception as e:
+                self.failures += 1
+                reason = _describe(e)
+                self._close("error", reason)
+                # Conexão que caiu desde o último envio (ex.: reinício do broker): reconecta uma vez já
+                if was_open and attempt == 0 and self.retry_on_disconnect:
+                    logger.warning("Falha ao enviar pelo transporte %s (%s); reconectando para reenviar",
+                                   self.transport.name, reason)
+                    continue
+                delay = self.policy.record_failure(e)
+                logger.error(f"Erro ao enviar dados pelo transporte {self.transport.name}: {reason}. "
+                             f"Nova tentativa em {delay:.1f}s")
+                break
+            self.sent += len(batch)
+            self.batches += 1
+            return True
+
+        self.dropped += len(batch)
+        logger.warning(f"{len(batch)} mensagem(ns) descartada(s) pelo transporte {self.transport.name} "
+                       f"({self.dropped} desde o início)")
+        return False
+
+    def _ensure_open(self) -> bool:
+        """Abre o transporte se necessário, respeitando o backoff da política"""
+        if self.transport.is_open:
+            return True
+
+        self.transport.close()
+        if not self.policy.allow():
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Reconexão do transporte %s adiada por %.1fs", self.transport.name, self.policy.wait_time())
+            return False
+
+        self._notify("connecting")
+        try:
+            self.transport.open()
+        except Exception as e:
+            delay = self.policy.record_failure(e)
+            logger.error(f"Erro ao abrir o transporte {self.transport.name}: {_describe(e)}. Nova tentativa em {delay:.1f}s")
+            self._close("error", _describe(e))
+            return False
+
+        self.policy.record_success()
+        self._notify("connected")
+        return True
+
+    def poll(self) -> None:
+        """Processa eventos do transporte e envia o lote se ele venceu"""
+        if self.transport.is_open:
+            try:
+                self.transport.poll()
+            except Exception as e:
+                logger.error(f"Erro na conexão do transporte {self.transport.name}: {_describe(e)}")
+                self.policy.record_failure(e)
+                self._close("error", _describe(e))
+        if self._batch and self._batch_expired():
+            self.flush()
+
+    def _close(self, state: str = "closed", error: Optional[str] = None) -> None:
+        self.transport.close()
+        self._notify(state, error)
+
+    def _notify(self, state: str, error: Optional[str] = None) -> None:
+        if self._on_state:
+            self._on_state(state, error)
+
+    def close(self) -> None:
+        """Envia o lote pendente, se possível, e fecha o transporte"""
+        if self._batch:
+            self.flush()
+        self._close()
+
+    def pending(self) -> int:
+        """Mensagens aguardando o fechamento do lote"""
+        return len(self._batch)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna os contadores para as métricas do próprio agente"""
+        result = {
+            "type": self.transport.name,
+            "connected": self.transport.is_open,
+            "sent": self.sent,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped,
+            "pending": len(self._batch)
+        }
+        result.update(self.transport.snapshot())
+        return result
@@ -89,7 +89,8 @@ RABBITMQ_USER=admin
 RABBITMQ_PASSWORD=a1b23fec99VMB
 RABBITMQ_VHOST=/
 RABBITMQ_QUEUE_DATA=agent_data
-RABBITMQ_QUEUE_COMMANDS=agent_commands
+RABBITMQ_EXCHANGE_COMMANDS=agent_commands.direct
+RABBITMQ_QUEUE_COMMAND_RESULTS=agent_command_results
 
 # Configurações do PostgreSQL
 POSTGRES_HOST=localhost
@@ -1,5 +1,5 @@
 import { query } from "../services/postgres.js"
-import { sendCommand } from "../services/rabbitmq.js"
+import { sendCommand, requestCommand } from "../services/rabbitmq.js"
 
 // Enviar comando para atualizar ASN
 export const sendUpdateAsnCommand = async (req, res, next) => {
@@ -8,7 +8,7 @@ export const sendUpdateAsnCommand = async (req, res, next) => {
     const { force } = req.body
 
     // Verificar se o agente existe
-    const agentResult = await query("SELECT agent_id FROM agents WHERE agent_id = $1", [agentId])
+    const agentResult = await query("SELECT agent_id, hostname FROM agents WHERE agent_id = $1", [agentId])
 
     if (agentResult.rows.length === 0) {
       return res.status(404).json({
@@ -26,15 +26,20 @@ export const sendUpdateAsnCommand = async (req, res, next) => {
     )
 
     const commandId = commandResult.rows[0].command_id
+    const { hostname } = agentResult.rows[0]
 
     // Enviar o comando para o RabbitMQ
-    await sendCommand(agentId, "update_asn", {
+    await sendCommand(agentId, hostname, "update_asn", {
       force: !!force,
       command_id: commandId,
     })
 
-    // Atualizar o status do comando para 'sent'
-    await query("UPDATE agent_commands SET sent_at = NOW(), status = $1 WHERE command_id = $2", ["sent", commandId])
+    // Atualizar o status do comando para 'sent' (a resposta do agente pode já tê-lo finalizado)
+    await query("UPDATE agent_commands SET sent_at = NOW(), status = $1 WHERE command_id = $2 AND status = $3", [
+      "sent",
+      commandId,
+      "pending",
+    ])
 
     res.status(200).json({
       status: "success",
@@ -96,3 +101,59 @@ export const getCommandHistory = async (req, res, next) => {
     next(error)
   }
 }
+
+// Obter um snapshot ao vivo do agente, sem gravá-lo nas tabelas de métricas
+export const getLiveSnapshot = async (req, res, next) => {
+  try {
+    const { agentId } = req.params
+    const { sections, max_age: maxAge, timeout } = req.query
+
+    // Verificar se o agente existe
+    const agentResult = await query("SELECT agent_id, hostname FROM agents WHERE agent_id = $1", [agentId])
+
+    if (agentResult.rows.length === 0) {
+      return res.status(404).json({
+        status: "error",
+        message: "Agente não encontrado",
+      })
+    }
+
+    const commandData = {}
+    if (sections) {
+      commandData.sections = sections.split(",")
+    }
+    if (maxAge !== undefined) {
+      commandData.max_age = Number.parseFloat(maxAge)
+    }
+
+    let reply
+    try {
+      reply = await requestCommand(
+        agentId,
+        agentResult.rows[0].hostname,
+        "collect_now",
+        commandData,
+        Number.parseInt(timeout) || 5000,
+      )
+    } catch (error) {
+      return res.status(504).json({
+        status: "error",
+        message: error.message,
+      })
+    }
+
+    if (reply.status !== "completed") {
+      return res.status(502).json({
+        status: "error",
+        message: reply.error || "Falha ao coletar snapshot",
+      })
+    }
+
+    res.status(200).json({
+      status: "success",
+      data: reply.result,
+    })
+  } catch (error) {
+    next(error)
+  }
+}
@@ -1,11 +1,14 @@
 import express from "express"
-import { sendUpdateAsnCommand, getCommandHistory } from "../controllers/commandController.js"
+import { sendUpdateAsnCommand, getCommandHistory, getLiveSnapshot } from "../controllers/commandController.js"
 
 const router = express.Router()
 
 // Rota para enviar comando de atualização de ASN
 router.post("/update-asn/:agentId", sendUpdateAsnCommand)
 
+// Rota para obter um snapshot ao vivo do agente
+router.get("/snapshot/:agentId", getLiveSnapshot)
+
 // Rota para obter o histórico de comandos de um agente
 router.get("/history/:agentId", getCommandHistory)
 
@@ -1,5 +1,5 @@
-import { getChannel } from "./rabbitmq.js"
-import { processAgentData } from "./postgres.js"
+import { getChannel, getCommandResultsQueue, getAlertsQueue } from "./rabbitmq.js"
+import { processAgentData, processAgentAlert, completeAgentCommand } from "./postgres.js"
 import { logger } from "../utils/logger.js"
 
 export const startConsumer = async () => {
@@ -32,6 +32,49 @@ export const startConsumer = async () => {
       { noAck: false }, // Modo de confirmação manual
     )
 
+    // Configurar o consumidor para a fila de resultados de comandos
+    await channel.consume(
+      getCommandResultsQueue(),
+      async (msg) => {
+        if (msg) {
+          try {
+            const reply = JSON.parse(msg.content.toString())
+            const commandId = msg.properties.correlationId || reply.command_id
+
+            if (commandId) {
+              await completeAgentCommand(commandId, reply)
+            } else {
+              logger.warn("Resultado de comando sem identificador descartado:", reply)
+            }
+
+            channel.ack(msg)
+          } catch (error) {
+            channel.nack(msg, false, false)
+            logger.error("Erro ao processar resultado de comando:", error)
+          }
+        }
+      },
+      { noAck: false },
+    )
+
+    // Configurar o consumidor para a fila de alertas (eventos firing/resolved avaliados nos agentes)
+    await channel.consume(
+      getAlertsQueue(),
+      async (msg) => {
+        if (msg) {
+          try {
+            const event = JSON.parse(msg.content.toString())
+            await processAgentAlert(event)
+            channel.ack(msg)
+          } catch (error) {
+            channel.nack(msg, false, false)
+            logger.error("Erro ao processar alerta:", error)
+          }
+        }
+      },
+      { noAck: false },
+    )
+
     logger.info("Consumidor de mensagens iniciado com sucesso")
   } catch (error) {
     logger.error("Erro ao iniciar consumidor de mensagens:", error)
@@ -49,6 +49,23 @@ export const query = async (text, params) => {
   }
 }
 
+export const completeAgentCommand = async (commandId, reply) => {
+  try {
+    // Registrar o resultado devolvido pelo agente
+    await query(
+      `UPDATE agent_commands
+       SET status = $1, acknowledged_at = NOW(), result = $2
+       WHERE command_id = $3`,
+      [reply.status === "failed" ? "failed" : "completed", reply, commandId],
+    )
+    logger.info(`Comando ${commandId} finalizado com status ${reply.status}`)
+    return true
+  } catch (error) {
+    logger.error(`Erro ao registrar resultado do comando ${commandId}:`, error)
+    throw error
+  }
+}
+
 export const processAgentData = async (data) => {
   try {
     // Chamar o procedimento armazenado para processar os dados do agente
@@ -60,3 +77,15 @@ export const processAgentData = async (data) => {
     throw error
   }
 }
+
+export const processAgentAlert = async (event) => {
+  try {
+    // Registrar ou encerrar o alerta avaliado no agente
+    await query("CALL process_agent_alert($1)", [event])
+    logger.info(`Alerta ${event.rule} (${event.event}) recebido de ${event.hostname}`)
+    return true
+  } catch (error) {
+    logger.error("Erro ao processar alerta do agente:", error)
+    throw error
+  }
+}
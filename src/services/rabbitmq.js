@@ -1,9 +1,16 @@
 import amqplib from "amqplib"
+import { randomUUID } from "crypto"
 import { logger } from "../utils/logger.js"
 
 let connection
 let channel
 
+// Pseudo-fila de direct reply-to do RabbitMQ, usada para respostas RPC sem fila dedicada
+const DIRECT_REPLY_QUEUE = "amq.rabbitmq.reply-to"
+
+// Requisições RPC aguardando resposta, indexadas por correlationId
+const pendingReplies = new Map()
+
 export const connectRabbitMQ = async () => {
   try {
     const url = `amqp://${process.env.RABBITMQ_USER}:${process.env.RABBITMQ_PASSWORD}@${process.env.RABBITMQ_HOST}:${process.env.RABBITMQ_PORT}${process.env.RABBITMQ_VHOST}`
@@ -13,7 +20,16 @@ export const connectRabbitMQ = async () => {
 
     // Garantir que as filas existam
     await channel.assertQueue(process.env.RABBITMQ_QUEUE_DATA, { durable: true })
-    await channel.assertQueue(process.env.RABBITMQ_QUEUE_COMMANDS, { durable: true })
+    // Comandos vão por um exchange direct com o hostname como routing key; cada agente liga a ele a própria fila
+    await channel.assertExchange(getCommandsExchange(), "direct", { durable: true })
+    await channel.assertQueue(getCommandResultsQueue(), { durable: true })
+    await channel.assertQueue(getAlertsQueue(), {
+      durable: true,
+      arguments: { "x-max-priority": getAlertsMaxPriority() },
+    })
+
+    // Consumir respostas RPC neste canal (precisa ocorrer antes de publicar requisições)
+    await channel.consume(DIRECT_REPLY_QUEUE, handleDirectReply, { noAck: true })
 
     logger.info("Conexão com RabbitMQ estabelecida com sucesso")
 
@@ -36,6 +52,27 @@ export const connectRabbitMQ = async () => {
   }
 }
 
+const handleDirectReply = (msg) => {
+  if (!msg) {
+    return
+  }
+
+  const pending = pendingReplies.get(msg.properties.correlationId)
+  if (!pending) {
+    logger.debug("Resposta RPC sem requisição pendente descartada")
+    return
+  }
+
+  pendingReplies.delete(msg.properties.correlationId)
+  clearTimeout(pending.timer)
+
+  try {
+    pending.resolve(JSON.parse(msg.content.toString()))
+  } catch (error) {
+    pending.reject(error)
+  }
+}
+
 export const getChannel = () => {
   if (!channel) {
     throw new Error("Canal RabbitMQ não inicializado")
@@ -43,20 +80,36 @@ export const getChannel = () => {
   return channel
 }
 
-export const sendCommand = async (agentId, commandType, commandData = {}) => {
+// Exchange de comandos (routing key = hostname do agente)
+export const getCommandsExchange = () => process.env.RABBITMQ_EXCHANGE_COMMANDS || "agent_commands.direct"
+
+// Fila onde os agentes publicam o resultado dos comandos (via reply_to)
+export const getCommandResultsQueue = () => process.env.RABBITMQ_QUEUE_COMMAND_RESULTS || "agent_command_results"
+
+// Fila de eventos de alerta avaliados nos agentes; a prioridade máxima precisa ser a mesma declarada por eles
+export const getAlertsQueue = () => process.env.RABBITMQ_QUEUE_ALERTS || "agent_alerts"
+export const getAlertsMaxPriority = () => Number.parseInt(process.env.RABBITMQ_ALERTS_MAX_PRIORITY || "10", 10)
+
+export const sendCommand = async (agentId, hostname, commandType, commandData = {}) => {
   try {
     const channel = getChannel()
     const message = {
       agent_id: agentId,
+      hostname,
       command_type: commandType,
       command_data: commandData,
       timestamp: new Date().toISOString(),
     }
 
-    const result = await channel.sendToQueue(
-      process.env.RABBITMQ_QUEUE_COMMANDS,
+    const result = await channel.publish(
+      getCommandsExchange(),
+      hostname,
       Buffer.from(JSON.stringify(message)),
-      { persistent: true },
+      {
+        persistent: true,
+        replyTo: getCommandResultsQueue(),
+        correlationId: commandData.command_id !== undefined ? String(commandData.command_id) : undefined,
+      },
     )
 
     logger.info(`Comando enviado para o agente ${agentId}:`, { commandType, commandData })
@@ -66,3 +119,34 @@ export const sendCommand = async (agentId, commandType, commandData = {}) => {
     throw error
   }
 }
+
+// Envia um comando e aguarda a resposta do agente via direct reply-to
+export const requestCommand = async (agentId, hostname, commandType, commandData = {}, timeoutMs = 5000) => {
+  const channel = getChannel()
+  const correlationId = randomUUID()
+  const message = {
+    agent_id: agentId,
+    hostname,
+    command_type: commandType,
+    command_data: commandData,
+    timestamp: new Date().toISOString(),
+  }
+
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      pendingReplies.delete(correlationId)
+      reject(new Error(`Tempo esgotado aguardando resposta do agente ${agentId}`))
+    }, timeoutMs)
+
+    pendingReplies.set(correlationId, { resolve, reject, timer })
+
+    // Mensagem transitória que expira junto com a requisição
+    channel.publish(getCommandsExchange(), hostname, Buffer.from(JSON.stringify(message)), {
+      replyTo: DIRECT_REPLY_QUEUE,
+      correlationId,
+      expiration: String(timeoutMs),
+    })
+
+    logger.debug(`Requisição ${commandType} enviada para o agente ${agentId}`, { correlationId })
+  })
+}